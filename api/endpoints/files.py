@@ -2,10 +2,15 @@
 File handling endpoints for uploads, downloads, and file info.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, status
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import FormData, UploadFile
+from starlette.types import Message
 
 from core.database import get_db
+from core.settings import settings
 from models.api import FileUploadResponse, MultipleFileUploadResponse
 from services.auth import check_rate_limit, get_api_key
 from services.file_service import FileService
@@ -13,20 +18,85 @@ from services.file_service import FileService
 router = APIRouter()
 file_service = FileService()
 
+# Room for multipart boundaries and part headers on top of the file bytes
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _upload_body(field: str, multiple: bool = False) -> Dict[str, Any]:
+    """OpenAPI request body of a multipart upload parsed by the endpoint itself."""
+    file_schema = {"type": "string", "format": "binary"}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": [field],
+        "properties": {field: {"type": "array", "items": file_schema} if multiple else file_schema},
+    }}}}}
+
+
+async def _upload_form(request: Request, max_files: int) -> FormData:
+    """
+    Parse a multipart upload, refusing bodies larger than ``max_files`` uploads.
+    
+    The form is parsed here rather than by FastAPI so that an oversized
+    Content-Length is refused before any of the body is read; the body is
+    also counted as it arrives in case the header understates it. The
+    header is required since the rate limit charges uploads by it.
+    """
+    limit = max_files * settings.upload_max_size + MULTIPART_OVERHEAD
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload too large. Maximum size: {settings.upload_max_size} bytes per file"
+    )
+    if "content-length" not in request.headers:
+        raise HTTPException(
+            status_code=status.HTTP_411_LENGTH_REQUIRED,
+            detail="Uploads require a Content-Length header"
+        )
+    try:
+        content_length = int(request.headers["content-length"])
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Content-Length header"
+        )
+    if content_length > limit:
+        raise too_large
+    
+    received = 0
+    
+    async def receive() -> Message:
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise too_large
+        return message
+    
+    return await Request(request.scope, receive).form(max_files=max_files)
+
 
-@router.post("/upload", response_model=FileUploadResponse)
+@router.post("/upload", response_model=FileUploadResponse, openapi_extra=_upload_body("file"))
 async def upload_file(
     request: Request,
-    file: UploadFile,
     api_key: str = Depends(get_api_key),
     rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
 ) -> FileUploadResponse:
     """
-    Upload a single file (image/audio/video).
+    Upload a single file (image/audio/video) in the `file` form field.
     """
-    # Use file_service to upload the file
-    file_info = await file_service.upload_file(db, file, api_key)
+    form = await _upload_form(request, max_files=1)
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No file uploaded in the 'file' field"
+            )
+        # Use file_service to upload the file
+        file_info = await file_service.upload_file(db, file, api_key)
+    finally:
+        await form.close()
     
     return FileUploadResponse(
         success=True,
@@ -34,18 +104,30 @@ async def upload_file(
     )
 
 
-@router.post("/upload-multiple", response_model=MultipleFileUploadResponse)
+@router.post(
+    "/upload-multiple", response_model=MultipleFileUploadResponse,
+    openapi_extra=_upload_body("files", multiple=True)
+)
 async def upload_multiple_files(
     request: Request,
-    files: list[UploadFile],
     api_key: str = Depends(get_api_key),
     rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
 ) -> MultipleFileUploadResponse:
     """
-    Upload multiple files (image/audio/video).
+    Upload multiple files (image/audio/video) in the `files` form field.
     """
-    successful_uploads, failed_uploads = await file_service.upload_multiple_files(db, files, api_key)
+    form = await _upload_form(request, max_files=settings.upload_max_files)
+    try:
+        files = [file for file in form.getlist("files") if isinstance(file, UploadFile)]
+        if not files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No files uploaded in the 'files' field"
+            )
+        successful_uploads, failed_uploads = await file_service.upload_multiple_files(db, files, api_key)
+    finally:
+        await form.close()
     
     if not successful_uploads:
         raise HTTPException(
@@ -2,29 +2,222 @@
 Job management endpoints for video composition.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import aclosing
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from fastapi import (
+    APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect,
+    status
+)
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.database import get_db
+from core.api_keys import AuthContext
+from core.database import db_manager, get_db
+from core.events import job_events
+from core.settings import settings
 from models.api import (
-    JobListQuery, JobListResponse, JobResponse, JobSubmissionResponse,
+    BatchCompositionRequest, BatchItemResult, BatchSubmissionResponse, JobListQuery,
+    JobListResponse, JobResponse, JobStatus, JobSubmissionResponse, QueueStatsResponse,
     VideoCompositionRequest
 )
-from services.auth import check_rate_limit, get_api_key
+from services.auth import (
+    charge_rate_limit, check_rate_limit, composition_cost, get_api_key, get_auth_context
+)
+from services.cost_model import cost_model
+from services.job_queue import JobQueue
 from services.job_service import JobService
-from services.video_service import VideoCompositionService
+from services.progress_store import progress_store
+from services.submission_dedup import submission_dedup
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 job_service = JobService()
-video_service = VideoCompositionService()
+job_queue = JobQueue()
+
+FINISHED_EVENTS = {JobStatus.COMPLETED.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value}
+
+
+async def _current_job(db: AsyncSession, job_id: str, api_key: str) -> Optional[JobResponse]:
+    """Get a job from its live copy in Redis, falling back to the database."""
+    try:
+        job = await progress_store.get(job_id, api_key)
+    except Exception as e:
+        logger.warning(f"Failed to read live state of job {job_id}: {e}")
+        job = None
+    if not job:
+        job = await job_service.get_job(db, job_id, api_key)
+    return job
+
+
+def _job_etag(job: JobResponse) -> str:
+    """Weak ETag identifying a version of a job's state."""
+    version = f"{job.status.value}:{job.progress}:{job.current_step}:{job.updated_at.isoformat()}"
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()[:20]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+async def _reusable_job(
+    db: AsyncSession, job_id: str, api_key: str, replay: bool
+) -> Optional[JobResponse]:
+    """
+    Get an earlier job for a repeated submission if it can stand in for a new one.
+    
+    In-flight jobs and completed jobs whose output still exists are reused;
+    idempotent replays return the job whatever its outcome.
+    """
+    job = await job_service.get_job(db, job_id, api_key)
+    if not job or replay:
+        return job
+    if job.status in (JobStatus.PENDING, JobStatus.QUEUED, JobStatus.PROCESSING):
+        return job
+    if job.status == JobStatus.COMPLETED and job.output_file and Path(job.output_file).exists():
+        return job
+    return None
+
+
+def _job_fields(composition_request: VideoCompositionRequest) -> dict:
+    """Build the job record fields for a composition request."""
+    # Create job title from scenes
+    scene_names = list(composition_request.scenes.keys())
+    title = f"Composition: {', '.join(scene_names[:3])}"
+    if len(scene_names) > 3:
+        title += f" and {len(scene_names) - 3} more scenes"
+    
+    total_duration = composition_request.get_total_duration()
+    return {
+        "title": title,
+        "description": f"Video composition with {len(composition_request.scenes)} scenes, "
+        f"total duration: {total_duration:.1f}s",
+        "composition_config": composition_request.model_dump(mode="json"),
+        "priority": composition_request.priority,
+        "webhook_url": (
+            str(composition_request.webhook_url) if composition_request.webhook_url else None
+        ),
+    }
+
+
+def _validation_error(error: ValidationError) -> str:
+    """Summarize a validation error in one line."""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'body'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def _active_limit_error(auth: AuthContext) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"Active job limit reached ({auth.active_job_limit} queued or processing); "
+        "retry when some have finished"
+    )
+
+
+async def _remember_submission(
+    api_key: str, idempotency_key: Optional[str], fingerprint: Optional[str], job_id: str
+) -> None:
+    """Map an idempotency key onto the job that now stands for its submission."""
+    if not idempotency_key or not fingerprint:
+        return
+    try:
+        await submission_dedup.remember(api_key, idempotency_key, fingerprint, job_id)
+    except Exception as e:
+        logger.warning(f"Failed to record idempotency key for job {job_id}: {e}")
+
+
+async def _forget_submission(api_key: str, fingerprint: Optional[str], job_id: str) -> None:
+    """Stop mapping identical submissions onto a job that was refused or failed."""
+    if not fingerprint:
+        return
+    try:
+        await submission_dedup.forget(api_key, fingerprint, job_id)
+    except Exception as e:
+        logger.warning(f"Failed to drop submission fingerprint of job {job_id}: {e}")
+
+
+def _duplicate_response(job: JobResponse) -> JobSubmissionResponse:
+    return JobSubmissionResponse(
+        success=True,
+        job=job,
+        deduplicated=True,
+        message="Identical composition already submitted; returning the existing job"
+    )
+
+
+async def _watch_job(
+    job_id: str, events: asyncio.Queue, job: JobResponse
+) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield a job's current state, then its events until it finishes.
+    
+    None is yielded when the stream has been idle for the keepalive
+    interval. The subscription is released when iteration stops.
+    """
+    try:
+        yield {"event": job.status.value, "data": job.model_dump(mode="json")}
+        if job.status.value in FINISHED_EVENTS:
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), settings.job_events_keepalive)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if event is None:
+                return  # Event stream lost; clients reconnect and get the current state
+            yield event
+            if event["event"] in FINISHED_EVENTS:
+                return
+    finally:
+        await job_events.unsubscribe(job_id, events)
+
+
+async def _subscribe(db: AsyncSession, job_id: str, api_key: str):
+    """Subscribe to a job's events, then read its state so no update is missed."""
+    try:
+        events = await job_events.subscribe(job_id)
+    except Exception as e:
+        logger.error(f"Failed to subscribe to events of job {job_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job events are temporarily unavailable"
+        )
+    try:
+        job = await _current_job(db, job_id, api_key)
+    except Exception:
+        await job_events.unsubscribe(job_id, events)
+        raise
+    if not job:
+        await job_events.unsubscribe(job_id, events)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return events, job
 
 
 @router.post("/compose", response_model=JobSubmissionResponse)
 async def submit_composition_job(
     request: Request,
     composition_request: VideoCompositionRequest,
-    api_key: str = Depends(get_api_key),
-    rate_limit_info: dict = Depends(check_rate_limit),
+    auth: AuthContext = Depends(get_auth_context),
     db: AsyncSession = Depends(get_db)
 ) -> JobSubmissionResponse:
     """
@@ -57,6 +250,15 @@ async def submit_composition_job(
       "webhook_url": null,
       "metadata": {}
     }
+    
+    Repeated submissions of the same composition return the job the first
+    one created while it is in flight or its output is still available.
+    Send an `Idempotency-Key` header to make retries return the original
+    job whatever its outcome.
+    
+    New jobs are charged against the rate limit by estimated render time,
+    and are refused while the API key has `max_active_jobs_per_key` jobs
+    queued or processing.
     """
     # Validate request
     if not composition_request.scenes:
@@ -65,65 +267,342 @@ async def submit_composition_job(
             detail="At least one scene is required"
         )
     
-    # Create job title from scenes
-    scene_names = list(composition_request.scenes.keys())
-    title = f"Composition: {', '.join(scene_names[:3])}"
-    if len(scene_names) > 3:
-        title += f" and {len(scene_names) - 3} more scenes"
+    api_key = auth.api_key
     
-    # Calculate estimated duration
-    total_duration = composition_request.get_total_duration()
-    description = f"Video composition with {len(composition_request.scenes)} scenes, total duration: {total_duration:.1f}s"
+    # Return the existing job for a repeated submission
+    idempotency_key = request.headers.get("idempotency-key")
+    fingerprint = None
+    try:
+        fingerprint = await submission_dedup.fingerprint(db, api_key, composition_request)
+        existing_id, replay = await submission_dedup.find(api_key, fingerprint, idempotency_key)
+        if existing_id:
+            existing = await _reusable_job(db, existing_id, api_key, replay)
+            if existing:
+                if not replay:
+                    await _remember_submission(api_key, idempotency_key, fingerprint, existing.id)
+                return _duplicate_response(existing)
+            await submission_dedup.forget(
+                api_key, fingerprint, existing_id, idempotency_key if replay else None
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning(f"Submission deduplication unavailable: {e}")
+    
+    estimate = cost_model.estimate(composition_request)
+    await charge_rate_limit(request, auth, composition_cost(estimate.cpu_seconds))
     
     # Convert the request to a job
-    job = await job_service.create_job(
-        db=db,
-        api_key=api_key,
-        title=title,
-        description=description,
-        composition_config=composition_request.dict(),
-        priority=composition_request.priority,
-        webhook_url=str(composition_request.webhook_url) if composition_request.webhook_url else None
-    )
+    total_duration = composition_request.get_total_duration()
+    job = await job_service.create_job(db=db, api_key=api_key, **_job_fields(composition_request))
+    
+    # Identical submissions racing this one settle on a single job
+    if fingerprint:
+        try:
+            owner = await submission_dedup.claim(api_key, fingerprint, job.id)
+            if owner != job.id:
+                existing = await job_service.get_job(db, owner, api_key)
+                if existing:
+                    await job_service.delete_job(db, job.id, api_key)
+                    await _remember_submission(api_key, idempotency_key, fingerprint, existing.id)
+                    return _duplicate_response(existing)
+                # The owner was deleted; take the fingerprint over
+                await submission_dedup.forget(api_key, fingerprint, owner)
+                await submission_dedup.claim(api_key, fingerprint, job.id)
+        except Exception as e:
+            logger.warning(f"Failed to record submission fingerprint for job {job.id}: {e}")
     
-    # TODO: Enqueue job for processing with video service
-    # This would typically involve:
-    # 1. Add job to Redis queue
-    # 2. Background worker picks up job
-    # 3. Worker calls video_service.compose_video()
-    # 4. Worker updates job status and progress
+    # Hand the job to the render workers; mark it queued first so a worker
+    # that dequeues it immediately can claim it
+    await job_service.update_job_status(db, job.id, api_key, JobStatus.QUEUED)
+    try:
+        queue_eta = await job_queue.eta(job.priority)
+        queued = await job_queue.enqueue(job.id, job.priority, api_key, estimate)
+    except Exception as e:
+        logger.error(f"Failed to enqueue job {job.id}: {e}")
+        await job_service.fail_job(db, job.id, "Job queue unavailable")
+        # Let identical retries submit a new job instead of getting the failed one
+        await _forget_submission(api_key, fingerprint, job.id)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Job queue unavailable, please retry later"
+        )
+    if not queued:
+        await job_service.delete_job(db, job.id, api_key)
+        await _forget_submission(api_key, fingerprint, job.id)
+        raise _active_limit_error(auth)
+    job.status = JobStatus.QUEUED
+    await _remember_submission(api_key, idempotency_key, fingerprint, job.id)
     
     return JobSubmissionResponse(
         success=True,
         job=job,
+        estimate=estimate,
+        queue_eta_seconds=queue_eta,
         message=f"Video composition job submitted successfully. Total duration: {total_duration:.1f}s"
     )
 
 
+@router.post("/compose/batch", response_model=BatchSubmissionResponse)
+async def submit_composition_batch(
+    request: Request,
+    batch: BatchCompositionRequest,
+    auth: AuthContext = Depends(get_auth_context),
+    db: AsyncSession = Depends(get_db)
+) -> BatchSubmissionResponse:
+    """
+    Submit many video composition jobs in one request.
+    
+    Each entry of `compositions` has the `POST /compose` format. Entries
+    are validated independently: invalid ones are reported in `results`
+    while the rest are created in a single transaction and queued in one
+    round-trip. Batch entries are not deduplicated.
+    
+    Each valid entry is charged against the rate limit by its estimated
+    render time. Entries beyond what a full rate limit bucket can pay for,
+    or beyond the API key's active job limit, are refused individually.
+    """
+    api_key = auth.api_key
+    if len(batch.compositions) > settings.compose_batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.compose_batch_max_items} compositions per batch"
+        )
+    
+    results = [BatchItemResult(index=index, success=False) for index in range(len(batch.compositions))]
+    accepted = []
+    for result, config in zip(results, batch.compositions):
+        try:
+            composition_request = VideoCompositionRequest.model_validate(config)
+        except ValidationError as e:
+            result.error = _validation_error(e)
+            continue
+        if not composition_request.scenes:
+            result.error = "At least one scene is required"
+            continue
+        accepted.append((result, composition_request))
+    
+    # A charge is capped at the whole bucket, so beyond the first entry
+    # (charged like a single /compose) only admit what a full bucket can pay for
+    estimates = []
+    cost = 0.0
+    for index, (_, composition_request) in enumerate(accepted):
+        estimate = cost_model.estimate(composition_request)
+        item_cost = composition_cost(estimate.cpu_seconds)
+        if estimates and cost + item_cost > auth.rate_limit:
+            for refused_result, _ in accepted[index:]:
+                refused_result.error = "Batch exceeds the rate limit; submit this composition again later"
+            accepted = accepted[:index]
+            break
+        estimates.append(estimate)
+        cost += item_cost
+    await charge_rate_limit(request, auth, max(cost, 1.0))
+    
+    if accepted:
+        jobs = await job_service.create_jobs(
+            db, api_key, [_job_fields(composition_request) for _, composition_request in accepted]
+        )
+        try:
+            queue_etas = {
+                priority: await job_queue.eta(priority)
+                for priority in {job.priority for job in jobs}
+            }
+            queued = await job_queue.enqueue_many([
+                (job.id, job.priority, api_key, estimate) for job, estimate in zip(jobs, estimates)
+            ])
+        except Exception as e:
+            logger.error(f"Failed to enqueue batch of {len(jobs)} jobs: {e}")
+            await job_service.fail_jobs(db, [job.id for job in jobs], "Job queue unavailable")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Job queue unavailable, please retry later"
+            )
+        
+        refused = [job.id for job, was_queued in zip(jobs, queued) if not was_queued]
+        if refused:
+            await job_service.delete_jobs(db, refused)
+        for (result, _), job, estimate, was_queued in zip(accepted, jobs, estimates, queued):
+            result.estimate = estimate
+            if not was_queued:
+                result.error = f"Active job limit reached ({auth.active_job_limit} queued or processing)"
+                continue
+            result.success = True
+            result.job = job
+            result.queue_eta_seconds = queue_etas[job.priority]
+    
+    submitted = sum(result.success for result in results)
+    return BatchSubmissionResponse(
+        success=submitted > 0,
+        results=results,
+        submitted=submitted,
+        failed=len(results) - submitted,
+        message=f"Submitted {submitted} of {len(results)} compositions"
+    )
+
+
 @router.get("/jobs/{job_id}", response_model=JobResponse)
 async def get_job_status(
     job_id: str,
+    request: Request,
+    response: Response,
+    wait: Optional[float] = Query(
+        default=None, ge=0, le=settings.job_status_max_wait,
+        description="Seconds to wait for the job to change before responding"
+    ),
     api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
-) -> JobResponse:
+):
     """
     Get the status and details of a specific job.
+    
+    Jobs being rendered are served from their live copy in Redis, so
+    polling does not touch the database.
+    
+    Responses carry an ETag; send it back in `If-None-Match` to get
+    `304 Not Modified` while the job is unchanged. With `wait`, the
+    request is held until the job differs from that version (or, without
+    `If-None-Match`, until its next change), or until `wait` seconds pass.
     """
-    job = await job_service.get_job(db, job_id, api_key)
+    if_none_match = request.headers.get("if-none-match")
     
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job not found"
-        )
+    # Subscribe before reading so a change in between is not missed
+    events = None
+    if wait:
+        try:
+            events = await job_events.subscribe(job_id)
+        except Exception as e:
+            logger.warning(f"Failed to subscribe to events of job {job_id}; not waiting: {e}")
     
+    try:
+        job = await _current_job(db, job_id, api_key)
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
+            )
+        
+        if events is not None:
+            # Release the pooled connection while waiting
+            await db.rollback()
+            baseline = if_none_match or _job_etag(job)
+            deadline = time.monotonic() + wait
+            while job.status.value not in FINISHED_EVENTS and _etag_matches(baseline, _job_etag(job)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(events.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event is None:
+                    break  # Event stream lost; answer with what we have
+                job = await _current_job(db, job_id, api_key) or job
+    finally:
+        if events is not None:
+            await job_events.unsubscribe(job_id, events)
+    
+    etag = _job_etag(job)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
     return job
 
 
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit),
+    db: AsyncSession = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Stream job updates as Server-Sent Events.
+    
+    The first event is the current job state, named after its status.
+    Then `progress` events carry progress, current_step and total_steps,
+    and each status change sends the full job under the new status name.
+    The stream ends after `completed`, `failed` or `cancelled`, which
+    include the output metadata.
+    """
+    events, job = await _subscribe(db, job_id, api_key)
+    # The session lives as long as the stream; return its connection to the pool
+    await db.rollback()
+    
+    async def event_stream():
+        sequence = 0
+        async with aclosing(_watch_job(job_id, events, job)) as updates:
+            async for event in updates:
+                if await request.is_disconnected():
+                    break
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                sequence += 1
+                data = json.dumps(event["data"], default=str)
+                yield f"id: {sequence}\nevent: {event['event']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    """
+    Stream job updates over a WebSocket.
+    
+    Sends the same events as `/jobs/{job_id}/events` as JSON messages of
+    the form `{"event": ..., "data": ...}`, then closes once the job
+    finishes.
+    """
+    try:
+        api_key = (await get_auth_context(websocket)).api_key
+        async with db_manager.get_session() as db:
+            events, job = await _subscribe(db, job_id, api_key)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+    
+    async with aclosing(_watch_job(job_id, events, job)) as updates:
+        try:
+            await websocket.accept()
+            async for event in updates:
+                await websocket.send_json(event or {"event": "keepalive", "data": None})
+            await websocket.close()
+        except WebSocketDisconnect:
+            pass
+
+
+@router.get("/queue/stats", response_model=QueueStatsResponse)
+async def get_queue_stats(
+    api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit)
+) -> QueueStatsResponse:
+    """
+    Get queue depth and waiting times per priority.
+    
+    Depths and waits cover every tenant, but the per-tenant breakdown only
+    includes the caller, identified by `tenant` (an opaque hash of the API
+    key).
+    """
+    tenant = job_queue.tenant_id(api_key)
+    return QueueStatsResponse(
+        tenant=tenant,
+        priorities=await job_queue.stats(tenant=tenant)
+    )
+
+
 @router.get("/jobs", response_model=JobListResponse)
 async def list_jobs(
     query: JobListQuery = Depends(),
     api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
 ) -> JobListResponse:
     """
@@ -147,6 +626,7 @@ async def list_jobs(
 async def delete_job(
     job_id: str,
     api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -160,6 +640,11 @@ async def delete_job(
             detail="Job not found"
         )
     
+    try:
+        await progress_store.discard(job_id)
+    except Exception as e:
+        logger.warning(f"Failed to discard live state of job {job_id}: {e}")
+    
     return {"success": True, "message": "Job deleted successfully"}
 
 
@@ -168,6 +653,7 @@ async def delete_job(
 async def download_job_result(
     job_id: str,
     api_key: str = Depends(get_api_key),
+    rate_limit_info: dict = Depends(check_rate_limit),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -202,71 +688,3 @@ async def download_job_result(
         "format": job.output_format
     }
 
-
-# Endpoint for processing job (would be called by background worker)
-@router.post("/jobs/{job_id}/process")
-async def process_job(
-    job_id: str,
-    api_key: str = Depends(get_api_key),
-    db: AsyncSession = Depends(get_db)
-):
-    """
-    Process a job (internal endpoint for background workers).
-    """
-    job = await job_service.get_job(db, job_id, api_key)
-    
-    if not job:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Job not found"
-        )
-    
-    if job.status != "pending":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Job cannot be processed. Current status: {job.status}"
-        )
-    
-    try:
-        # Update job status to processing
-        await job_service.update_job_status(db, job_id, api_key, "processing")
-        
-        # Parse composition config
-        import json
-        composition_config = json.loads(job.composition_config) if isinstance(job.composition_config, str) else job.composition_config
-        
-        # Create progress callback
-        async def progress_callback(message: str, progress: float):
-            # Update job progress in database
-            # This would be implemented in job_service
-            pass
-        
-        # Process the video composition
-        output_path = await video_service.compose_video(
-            scenes=composition_config["scenes"],
-            output_format=composition_config["output_format"],
-            quality=composition_config["quality"],
-            fps=composition_config["fps"],
-            composition_settings=composition_config["composition_settings"],
-            progress_callback=progress_callback
-        )
-        
-        # Update job with results
-        await job_service.update_job_status(db, job_id, api_key, "completed")
-        # TODO: Update job with output_file, output_size, etc.
-        
-        return {
-            "success": True,
-            "message": "Job processed successfully",
-            "output_file": str(output_path)
-        }
-        
-    except Exception as e:
-        # Update job status to failed
-        await job_service.update_job_status(db, job_id, api_key, "failed")
-        # TODO: Store error message in job
-        
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Job processing failed: {str(e)}"
-        )
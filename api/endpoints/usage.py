@@ -0,0 +1,58 @@
+"""
+API usage analytics endpoints.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api_keys import AuthContext
+from core.database import get_db
+from core.settings import settings
+from models.api import UsageResponse
+from services.auth import check_rate_limit, get_auth_context
+from services.usage_service import UsageService
+
+router = APIRouter()
+usage_service = UsageService()
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(
+    start: Optional[datetime] = Query(None, description="Start of the period (default: 24 hours before end)"),
+    end: Optional[datetime] = Query(None, description="End of the period (default: now)"),
+    interval: int = Query(60, ge=1, le=1440, description="Minutes per entry of the series"),
+    endpoint: Optional[str] = Query(None, description="Only this route path, e.g. /jobs/{job_id}"),
+    auth: AuthContext = Depends(get_auth_context),
+    rate_limit_info: dict = Depends(check_rate_limit),
+    db: AsyncSession = Depends(get_db)
+) -> UsageResponse:
+    """
+    Get API usage of the authenticated API key per endpoint and over time.
+
+    Usage is recorded per minute; naive datetimes are taken as UTC.
+    Requests from the last few seconds may not be included yet.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    if end - start > timedelta(days=settings.usage_query_max_days):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Usage can be queried for at most {settings.usage_query_max_days} days at a time"
+        )
+
+    return await usage_service.get_usage(
+        db, auth.tenant_id, start, end, interval_minutes=interval, endpoint=endpoint
+    )
@@ -0,0 +1,198 @@
+"""
+Precomputed index of API keys and their quotas.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import string
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from core.redis import redis_manager
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def hash_api_key(api_key: str) -> str:
+    """SHA-256 of an API key, the form keys are stored and indexed under."""
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _is_key_hash(field: str) -> bool:
+    return len(field) == 64 and all(c in string.hexdigits for c in field)
+
+
+@dataclass(frozen=True)
+class AuthContext:
+    """A validated API key with everything derived from it."""
+
+    api_key: str
+    key_hash: str  # SHA-256 of the key
+    tenant_id: str  # Short hash identifying the key in Redis keys and file ownership
+    weight: float  # Scheduling weight
+    active_job_limit: int  # Queued and processing jobs allowed (0 = unlimited)
+    rate_limit: int  # Rate limit tokens per window
+
+    @classmethod
+    def build(
+        cls, api_key: str, quota: Optional[Dict[str, Any]] = None, key_hash: Optional[str] = None
+    ) -> "AuthContext":
+        """
+        Derive a key's context, with ``quota`` overriding the configured defaults.
+
+        Keys stored in Redis are only known by ``key_hash``; their contexts
+        are built with an empty ``api_key`` that ``ApiKeyIndex.resolve``
+        fills in from the presented key.
+        """
+        quota = quota or {}
+        key_hash = key_hash or hash_api_key(api_key)
+        return cls(
+            api_key=api_key,
+            key_hash=key_hash,
+            tenant_id=key_hash[:16],
+            weight=float(quota.get("weight", settings.tenant_weights.get(api_key, 1.0))),
+            active_job_limit=int(quota.get(
+                "active_job_limit",
+                settings.tenant_active_job_limits.get(api_key, settings.max_active_jobs_per_key)
+            )),
+            rate_limit=int(quota.get("rate_limit", settings.rate_limit_requests)),
+        )
+
+
+class ApiKeyIndex:
+    """
+    Immutable map of valid API keys to their precomputed contexts.
+
+    Keys come from ``settings.api_keys`` plus the Redis hash at
+    ``api_key_index_prefix``, whose fields are SHA-256 hashes of API keys
+    (never the keys themselves) and values JSON quota overrides
+    (``weight``, ``active_job_limit``, ``rate_limit``). The map is keyed
+    by hash too. Writers bump ``<prefix>:version``; the index polls it and
+    swaps in a rebuilt map when it changes, so a lookup never locks and
+    costs one hash and one dict lookup.
+    """
+
+    def __init__(self, prefix: Optional[str] = None):
+        self.prefix = prefix or settings.api_key_index_prefix
+        self._keys: Mapping[str, AuthContext] = self._build({})
+        self._version: Optional[str] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    @property
+    def version_name(self) -> str:
+        return f"{self.prefix}:version"
+
+    @staticmethod
+    def _build(stored: Dict[str, str]) -> Mapping[str, AuthContext]:
+        keys = {}
+        for api_key in settings.api_keys:
+            auth = AuthContext.build(api_key)
+            keys[auth.key_hash] = auth
+        for field, quota in stored.items():
+            try:
+                quota = json.loads(quota) if quota else None
+                # Fields written before keys were stored hashed are the raw keys
+                auth = (
+                    AuthContext.build("", quota, key_hash=field) if _is_key_hash(field)
+                    else AuthContext.build(field, quota)
+                )
+                keys[auth.key_hash] = auth
+            except (TypeError, ValueError, AttributeError) as e:
+                logger.warning(f"Ignoring API key with invalid quota in Redis: {e}")
+        return MappingProxyType(keys)
+
+    def resolve(self, api_key: str) -> Optional[AuthContext]:
+        """Get the context of a valid API key, or None if the key is not valid."""
+        key_hash = hash_api_key(api_key)
+        auth = self._keys.get(key_hash)
+        if auth is None or auth.api_key == api_key:
+            return auth
+        return replace(auth, api_key=api_key)
+
+    def context(self, api_key: str) -> AuthContext:
+        """Get a key's context, deriving it for keys outside the index (e.g. revoked ones)."""
+        return self.resolve(api_key) or AuthContext.build(api_key)
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Rebuild the index if the keys stored in Redis changed.
+
+        Returns:
+            bool: True if the index was rebuilt
+        """
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        async with redis_manager.redis.pipeline(transaction=True) as pipe:
+            pipe.get(self.version_name)
+            pipe.hgetall(self.prefix)
+            version, stored = await pipe.execute()
+        if not force and version == self._version:
+            return False
+        self._keys = self._build(stored)
+        self._version = version
+        logger.info(f"Loaded {len(self._keys)} API keys")
+        return True
+
+    async def _reload_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.api_key_reload_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.warning(f"Failed to reload API keys: {e}")
+
+    async def initialize(self) -> None:
+        """Load keys stored in Redis and keep the index up to date."""
+        try:
+            await self.reload(force=True)
+        except Exception as e:
+            logger.warning(f"Failed to load API keys from Redis; using configured keys only: {e}")
+            self._keys = self._build({})
+        if settings.api_key_reload_interval > 0 and not self._reload_task:
+            self._reload_task = asyncio.create_task(self._reload_loop())
+
+    async def close(self) -> None:
+        """Stop reloading the index."""
+        if self._reload_task:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+            self._reload_task = None
+
+    async def store(self, api_key: str, quota: Optional[Dict[str, Any]] = None) -> None:
+        """Add or update a key in Redis; every index picks it up on its next reload."""
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        async with redis_manager.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.prefix, api_key)  # A plaintext field left from before hashing
+            pipe.hset(self.prefix, hash_api_key(api_key), json.dumps(quota or {}))
+            pipe.incr(self.version_name)
+            await pipe.execute()
+
+    async def revoke(self, api_key: str) -> None:
+        """Remove a key stored in Redis (configured keys stay valid)."""
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        async with redis_manager.redis.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.prefix, hash_api_key(api_key), api_key)
+            pipe.incr(self.version_name)
+            await pipe.execute()
+
+
+# Global API key index
+api_key_index = ApiKeyIndex()
+
+
+# Startup function for FastAPI
+async def initialize_api_keys():
+    """Load API keys on application startup."""
+    await api_key_index.initialize()
+
+
+# Shutdown function for FastAPI
+async def close_api_keys():
+    """Stop reloading API keys on application shutdown."""
+    await api_key_index.close()
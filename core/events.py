@@ -0,0 +1,139 @@
+"""
+Job event fan-out over Redis pub/sub.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Set
+
+from redis.asyncio.client import PubSub
+
+from core.redis import redis_manager
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobEventBroker:
+    """
+    Deliver job events published by workers to watchers in this process.
+
+    All watchers share one pub/sub connection: a job's channel is
+    subscribed while at least one local watcher follows it. Each watcher
+    gets a bounded queue; when a slow watcher falls behind, its oldest
+    events are dropped, since every event carries the full current state.
+    """
+
+    def __init__(self):
+        self._pubsub: Optional[PubSub] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._watchers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def channel(job_id: str) -> str:
+        """Pub/sub channel for a job's events."""
+        return f"{settings.job_events_prefix}:{job_id}"
+
+    @property
+    def _control_channel(self) -> str:
+        # Keeps the connection in subscribed mode while no job is watched
+        return f"{settings.job_events_prefix}:_"
+
+    @staticmethod
+    def message(event: str, data: Any) -> str:
+        """Encode an event for publishing."""
+        return json.dumps({"event": event, "data": data}, default=str)
+
+    async def _start(self) -> None:
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        self._pubsub = redis_manager.redis.pubsub(ignore_subscribe_messages=True)
+        # Watchers left over from a lost connection are resubscribed
+        await self._pubsub.subscribe(
+            self._control_channel, *[self.channel(job_id) for job_id in self._watchers]
+        )
+        self._listener = asyncio.create_task(self._listen(self._pubsub))
+
+    async def _listen(self, pubsub: PubSub) -> None:
+        prefix = f"{settings.job_events_prefix}:"
+        try:
+            while self._pubsub is pubsub:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if not message or message.get("type") != "message":
+                    continue
+                job_id = message["channel"][len(prefix):]
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, json.JSONDecodeError):
+                    continue
+                for queue in self._watchers.get(job_id, ()):
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(event)
+        except Exception as e:
+            logger.error(f"Job event listener stopped: {e}")
+            # Wake watchers so they can fall back or reconnect
+            for queues in self._watchers.values():
+                for queue in queues:
+                    if queue.full():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+            if self._pubsub is pubsub:
+                self._pubsub = None
+                await pubsub.aclose()
+
+    async def subscribe(self, job_id: str) -> asyncio.Queue:
+        """
+        Start following a job's events.
+
+        Returns:
+            asyncio.Queue: Receives ``{"event", "data"}`` dicts, or None if
+            the event stream was lost
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.job_events_queue_size)
+        async with self._lock:
+            if self._pubsub is None:
+                await self._start()
+            watchers = self._watchers.setdefault(job_id, set())
+            if not watchers:
+                await self._pubsub.subscribe(self.channel(job_id))
+            watchers.add(queue)
+        return queue
+
+    async def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        """Stop following a job's events."""
+        async with self._lock:
+            watchers = self._watchers.get(job_id)
+            if watchers is None:
+                return
+            watchers.discard(queue)
+            if not watchers:
+                del self._watchers[job_id]
+                if self._pubsub is not None:
+                    try:
+                        await self._pubsub.unsubscribe(self.channel(job_id))
+                    except Exception as e:
+                        logger.warning(f"Failed to unsubscribe from job {job_id}: {e}")
+
+    async def close(self) -> None:
+        """Stop the listener and close the pub/sub connection."""
+        pubsub, self._pubsub = self._pubsub, None
+        if self._listener:
+            # The listener exits at its next poll once it is detached
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        if pubsub is not None:
+            await pubsub.aclose()
+        self._watchers.clear()
+
+
+# Global job event broker instance
+job_events = JobEventBroker()
+
+
+# Shutdown function for FastAPI
+async def close_job_events():
+    """Close the job event subscription on application shutdown."""
+    await job_events.close()
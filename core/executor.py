@@ -0,0 +1,80 @@
+"""
+Executor for blocking render work that must not run on the event loop.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from core.settings import settings
+
+
+class RenderExecutor:
+    """Thread pool for blocking decode/encode calls made during composition."""
+
+    def __init__(self):
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def max_workers(self) -> int:
+        """Get the configured pool size (defaults to the concurrent job limit)."""
+        return max(1, settings.render_executor_workers or settings.max_concurrent_jobs)
+
+    def initialize(self) -> None:
+        """Create the worker pool."""
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="render",
+        )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the worker pool."""
+        if self.executor:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking callable in the pool and await its result."""
+        if not self.executor:
+            self.initialize()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs)
+        )
+
+    @staticmethod
+    def progress_reporter(
+        progress_callback: Optional[Callable],
+    ) -> Callable[[str, float], None]:
+        """
+        Wrap an async progress callback so it can be called from pool threads.
+
+        Must be called on the event loop; the returned function schedules the
+        callback back onto that loop without waiting for it.
+        """
+        if not progress_callback:
+            return lambda message, progress: None
+
+        loop = asyncio.get_running_loop()
+
+        def report(message: str, progress: float) -> None:
+            asyncio.run_coroutine_threadsafe(progress_callback(message, progress), loop)
+
+        return report
+
+
+# Global render executor instance
+render_executor = RenderExecutor()
+
+
+# Startup function for FastAPI
+def initialize_render_executor():
+    """Initialize the render executor on application startup."""
+    render_executor.initialize()
+
+
+# Shutdown function for FastAPI
+def close_render_executor():
+    """Shut down the render executor on application shutdown."""
+    render_executor.shutdown(wait=False)
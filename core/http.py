@@ -0,0 +1,68 @@
+"""
+Shared HTTP client for outbound requests (media downloads, webhooks).
+"""
+
+import asyncio
+from typing import Optional
+
+import aiohttp
+
+from core.settings import settings
+
+
+class HTTPClientManager:
+    """Process-wide pooled aiohttp session."""
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+
+    async def initialize(self) -> None:
+        """Create the pooled session."""
+        connector = aiohttp.TCPConnector(
+            limit=settings.http_pool_size,
+            limit_per_host=settings.http_pool_per_host,
+            ttl_dns_cache=settings.http_dns_cache_ttl,
+            keepalive_timeout=settings.http_keepalive_timeout,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.http_total_timeout or None,
+            connect=settings.http_connect_timeout,
+            sock_read=settings.http_read_timeout,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            raise_for_status=False,
+        )
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Get the pooled session, creating it on first use."""
+        if not self.session or self.session.closed:
+            async with self._lock:
+                # Concurrent first callers must not each create a session
+                if not self.session or self.session.closed:
+                    await self.initialize()
+        return self.session
+
+    async def close(self) -> None:
+        """Close the session and its pooled connections."""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+
+# Global HTTP client manager instance
+http_manager = HTTPClientManager()
+
+
+# Startup function for FastAPI
+async def initialize_http_client():
+    """Initialize the HTTP client on application startup."""
+    await http_manager.initialize()
+
+
+# Shutdown function for FastAPI
+async def close_http_client():
+    """Close the HTTP client on application shutdown."""
+    await http_manager.close()
@@ -3,6 +3,8 @@ Redis configuration and cache management.
 """
 
 import json
+import time
+from dataclasses import dataclass
 from typing import Any, Optional
 
 import redis.asyncio as redis
@@ -10,6 +12,64 @@ from redis.asyncio import Redis
 
 from core.settings import settings
 
+# Token bucket holding up to `limit` tokens, refilled at limit / window.
+# Refill, check and spend happen in one call, so concurrent requests
+# cannot overdraw the bucket.
+# KEYS: bucket hash
+# ARGV: limit, window (ms), now (ms), cost
+# Returns: allowed (0/1), tokens left, ms until full, ms until `cost` is available
+RATE_LIMIT_SCRIPT = """
+local limit, window = tonumber(ARGV[1]), tonumber(ARGV[2])
+local now, cost = tonumber(ARGV[3]), tonumber(ARGV[4])
+local rate = limit / window
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local last = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+local full_in = math.ceil((limit - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', math.max(now, last))
+redis.call('PEXPIRE', KEYS[1], full_in + 1000)
+local retry_in = 0
+if allowed == 0 then
+    retry_in = math.ceil((cost - tokens) / rate)
+end
+return {allowed, math.floor(tokens), full_in, retry_in}
+"""
+
+
+@dataclass
+class RateLimitResult:
+    """Outcome of a rate limit check."""
+
+    allowed: bool
+    remaining: int
+    reset_after: float  # Seconds until the limit is fully restored
+    retry_after: float  # Seconds until a denied request would be allowed
+
+
+async def check_token_bucket(
+    client: Redis, key: str, limit: int, window: int, cost: int = 1
+) -> RateLimitResult:
+    """
+    Spend ``cost`` from a token bucket of ``limit`` tokens per ``window`` seconds.
+
+    Takes one round-trip and is atomic in Redis.
+    """
+    allowed, remaining, reset_after, retry_after = await client.eval(
+        RATE_LIMIT_SCRIPT, 1, key, limit, window * 1000, int(time.time() * 1000), cost
+    )
+    return RateLimitResult(
+        allowed=bool(allowed),
+        remaining=int(remaining),
+        reset_after=int(reset_after) / 1000,
+        retry_after=int(retry_after) / 1000,
+    )
+
 
 class RedisManager:
     """Redis connection and cache manager."""
@@ -114,69 +174,6 @@ class RedisManager:
         except json.JSONDecodeError:
             return value
 
-    # Rate limiting helpers
-    async def rate_limit_check(
-        self,
-        key: str,
-        limit: int,
-        window: int,
-    ) -> tuple[bool, int, int]:
-        """
-        Check rate limit for a key.
-        
-        Returns:
-            tuple: (is_allowed, current_count, remaining_time)
-        """
-        if not self.redis:
-            await self.initialize()
-
-        current = await self.redis.get(key)
-        
-        if current is None:
-            # First request
-            await self.redis.setex(key, window, 1)
-            return True, 1, window
-        
-        current_count = int(current)
-        
-        if current_count >= limit:
-            # Rate limit exceeded
-            ttl = await self.redis.ttl(key)
-            return False, current_count, ttl
-        
-        # Increment counter
-        new_count = await self.redis.incr(key)
-        ttl = await self.redis.ttl(key)
-        
-        return True, new_count, ttl
-
-    # Job queue helpers
-    async def enqueue_job(self, queue_name: str, job_data: dict) -> bool:
-        """Add job to queue."""
-        if not self.redis:
-            await self.initialize()
-        return await self.redis.lpush(queue_name, json.dumps(job_data, default=str))
-
-    async def dequeue_job(self, queue_name: str, timeout: int = 0) -> Optional[dict]:
-        """Get job from queue."""
-        if not self.redis:
-            await self.initialize()
-        
-        result = await self.redis.brpop(queue_name, timeout=timeout)
-        if result:
-            _, job_data = result
-            try:
-                return json.loads(job_data)
-            except json.JSONDecodeError:
-                return None
-        return None
-
-    async def get_queue_length(self, queue_name: str) -> int:
-        """Get queue length."""
-        if not self.redis:
-            await self.initialize()
-        return await self.redis.llen(queue_name)
-
 
 # Global Redis manager instance
 redis_manager = RedisManager()
@@ -2,8 +2,9 @@
 Application settings with environment variable support.
 """
 
+import tempfile
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel, Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -25,6 +26,12 @@ class Settings(BaseSettings):
     api_keys: List[str] = Field(
         default_factory=list, description="List of valid API keys"
     )
+    api_key_index_prefix: str = Field(
+        default="auth:keys", description="Redis hash of additional API key hashes and their quotas"
+    )
+    api_key_reload_interval: float = Field(
+        default=30, description="Seconds between checks for API key changes in Redis (0 = load once)"
+    )
     secret_key: str = Field(
         default="change-this-secret-key", description="Secret key for encryption"
     )
@@ -50,6 +57,12 @@ class Settings(BaseSettings):
     upload_max_size: int = Field(
         default=104857600, description="Maximum upload size in bytes (100MB)"
     )
+    upload_chunk_size: int = Field(
+        default=1048576, description="Upload streaming chunk size in bytes (1MB)"
+    )
+    upload_max_files: int = Field(
+        default=20, description="Maximum files per multiple file upload"
+    )
     upload_dir: Path = Field(
         default=Path("./uploads"), description="Upload directory path"
     )
@@ -57,6 +70,73 @@ class Settings(BaseSettings):
         default=Path("./outputs"), description="Output directory path"
     )
 
+    # Outbound HTTP Client
+    http_pool_size: int = Field(
+        default=100, description="Maximum pooled outbound HTTP connections"
+    )
+    http_pool_per_host: int = Field(
+        default=8, description="Maximum pooled connections per remote host"
+    )
+    http_keepalive_timeout: float = Field(
+        default=30, description="Idle keep-alive time for pooled connections in seconds"
+    )
+    http_dns_cache_ttl: int = Field(
+        default=300, description="DNS cache TTL in seconds"
+    )
+    http_connect_timeout: float = Field(
+        default=10, description="Connect timeout in seconds"
+    )
+    http_read_timeout: float = Field(
+        default=60, description="Socket read timeout in seconds"
+    )
+    http_total_timeout: float = Field(
+        default=0, description="Total request timeout in seconds (0 = none)"
+    )
+
+    # Source Download Configuration
+    download_max_concurrency: int = Field(
+        default=8, description="Concurrent source downloads per job"
+    )
+    download_max_per_host: int = Field(
+        default=4, description="Concurrent source downloads per remote host"
+    )
+    download_max_total_bytes: int = Field(
+        default=2147483648,
+        description="Maximum bytes downloaded per job (2GB, 0 = unlimited)",
+    )
+
+    # Media Download Cache
+    media_cache_dir: Path = Field(
+        default=Path(tempfile.gettempdir()) / "video-composition-api" / "media",
+        description="Downloaded media cache directory (outside the source tree by default)",
+    )
+    media_cache_max_bytes: int = Field(
+        default=10737418240, description="Media cache size budget in bytes (10GB)"
+    )
+    media_cache_fresh_seconds: int = Field(
+        default=300,
+        description="Reuse cached media without revalidation for this long "
+        "unless the origin sends Cache-Control",
+    )
+    media_cache_shared: bool = Field(
+        default=False,
+        description="Media cache directory is shared between nodes "
+        "(coordinate downloads with Redis locks)",
+    )
+    media_cache_lock_timeout: int = Field(
+        default=300, description="Shared media cache download lock timeout in seconds"
+    )
+
+    # Rendered Segment Cache
+    segment_cache_dir: Path = Field(
+        default=Path(tempfile.gettempdir()) / "video-composition-api" / "segments",
+        description="Rendered scene segment cache directory (outside the source tree by default)",
+    )
+    segment_cache_max_bytes: int = Field(
+        default=5368709120,
+        description="Segment cache size budget in bytes (5GB, 0 disables the cache)",
+    )
+
     # Job Configuration
     job_timeout: int = Field(
         default=3600, description="Job timeout in seconds (1 hour)"
@@ -64,14 +144,119 @@ class Settings(BaseSettings):
     max_concurrent_jobs: int = Field(
         default=5, description="Maximum concurrent jobs"
     )
+    render_executor_workers: int = Field(
+        default=0,
+        description="Threads for blocking render work (0 = max_concurrent_jobs)",
+    )
+    job_queue_prefix: str = Field(
+        default="queue:jobs", description="Redis key prefix for per-priority job queues"
+    )
+    worker_poll_timeout: int = Field(
+        default=5, description="Seconds a worker waits for a queued job per dequeue"
+    )
+    worker_poll_interval: float = Field(
+        default=0.5, description="Seconds between queue polls while the queues are empty"
+    )
+    job_lease_timeout: int = Field(
+        default=60,
+        description="Seconds a dequeued job stays leased without a worker heartbeat",
+    )
+    job_lease_heartbeat: int = Field(
+        default=15, description="Seconds between worker lease renewals"
+    )
+    job_reaper_interval: int = Field(
+        default=30, description="Seconds between scans for expired job leases"
+    )
+    job_aging_seconds: int = Field(
+        default=120,
+        description="Waiting time after which a queued job is scheduled one priority "
+        "higher (0 = strict priority)",
+    )
+    urgent_reserved_fraction: float = Field(
+        default=0.2, ge=0, le=1,
+        description="Fraction of each worker's job slots reserved for urgent jobs",
+    )
+    tenant_weights: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Scheduling weight per API key (default 1)",
+    )
+    max_active_jobs_per_key: int = Field(
+        default=1000,
+        description="Maximum queued and processing jobs per API key (0 = unlimited)",
+    )
+    tenant_active_job_limits: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Active job limit per API key (default max_active_jobs_per_key)",
+    )
+    render_cpu_seconds_per_megapixel: float = Field(
+        default=0.01,
+        description="Calibration for render cost estimates: CPU-seconds per output megapixel-frame",
+    )
+    worker_cpu_budget: float = Field(
+        default=0,
+        description="Estimated CPU-seconds of render work a worker admits at once "
+        "(0 = 600 per CPU core)",
+    )
+    worker_memory_budget: int = Field(
+        default=0,
+        description="Estimated render memory in bytes a worker admits at once "
+        "(0 = 75% of physical memory)",
+    )
+    compose_dedup_prefix: str = Field(
+        default="compose", description="Redis key prefix for submission deduplication"
+    )
+    compose_dedup_ttl: int = Field(
+        default=3600,
+        description="Seconds an identical composition request reuses the job it created",
+    )
+    idempotency_key_ttl: int = Field(
+        default=86400, description="Seconds an Idempotency-Key is remembered"
+    )
+    compose_batch_max_items: int = Field(
+        default=1000, description="Maximum compositions accepted by one batch submission"
+    )
+    job_progress_prefix: str = Field(
+        default="jobs:progress", description="Redis key prefix for live job progress"
+    )
+    job_progress_interval: float = Field(
+        default=2.0, description="Seconds between batched flushes of job progress to the database"
+    )
+    job_progress_flush_batch: int = Field(
+        default=500, description="Maximum jobs whose progress is flushed in one database write"
+    )
+    job_events_prefix: str = Field(
+        default="jobs:events", description="Redis pub/sub channel prefix for job events"
+    )
+    job_events_queue_size: int = Field(
+        default=100, description="Events buffered per watcher before the oldest are dropped"
+    )
+    job_events_keepalive: int = Field(
+        default=15, description="Seconds between keepalives on idle job event streams"
+    )
+    job_status_max_wait: int = Field(
+        default=60, description="Longest long-poll wait accepted by the job status endpoint"
+    )
+    job_progress_ttl: int = Field(
+        default=3600, description="Seconds the live copy of a job is kept in Redis after its last update"
+    )
 
     # Rate Limiting
     rate_limit_requests: int = Field(
-        default=100, description="Rate limit requests per window"
+        default=100, description="Rate limit tokens per window (a plain request costs 1)"
     )
     rate_limit_window: int = Field(
         default=3600, description="Rate limit window in seconds (1 hour)"
     )
+    rate_limit_read_cost: float = Field(
+        default=0.05, description="Rate limit tokens charged per read request"
+    )
+    rate_limit_render_second_cost: float = Field(
+        default=1.0,
+        description="Rate limit tokens charged per estimated render CPU-second of a composition",
+    )
+    rate_limit_upload_megabyte_cost: float = Field(
+        default=0.1, description="Rate limit tokens charged per uploaded megabyte"
+    )
 
     # Webhook Configuration
     webhook_secret: Optional[str] = Field(
@@ -88,6 +273,30 @@ class Settings(BaseSettings):
     health_check_timeout: int = Field(
         default=30, description="Health check timeout in seconds"
     )
+    usage_log_enabled: bool = Field(
+        default=True, description="Record per-request API usage in the database"
+    )
+    usage_log_buffer_size: int = Field(
+        default=10000,
+        description="Usage records buffered in memory before the oldest are dropped",
+    )
+    usage_log_flush_interval: float = Field(
+        default=1.0, description="Seconds between bulk writes of buffered usage records"
+    )
+    usage_log_flush_batch: int = Field(
+        default=1000,
+        description="Usage records per bulk insert; a full batch is written without waiting",
+    )
+    usage_log_retention_days: int = Field(
+        default=7,
+        description="Days raw usage records are kept (0 = forever); per-minute rollups are kept",
+    )
+    usage_log_prune_interval: int = Field(
+        default=3600, description="Seconds between deletions of expired raw usage records"
+    )
+    usage_query_max_days: int = Field(
+        default=31, description="Longest period accepted by the usage endpoint"
+    )
 
     # Video Processing Defaults
     default_video_quality: str = Field(
@@ -103,6 +312,26 @@ class Settings(BaseSettings):
 
     # FFmpeg Configuration
     ffmpeg_binary: str = Field(default="ffmpeg", description="FFmpeg binary path")
+    ffprobe_binary: Optional[str] = Field(
+        default=None, description="FFprobe binary path (defaults to next to ffmpeg)"
+    )
+    probe_max_concurrency: int = Field(
+        default=4, description="Maximum concurrent ffprobe processes"
+    )
+    probe_timeout: int = Field(default=30, description="FFprobe timeout in seconds")
+    probe_keyframe_window: int = Field(
+        default=30, description="Seconds of video scanned to estimate keyframe interval"
+    )
+
+    # Rendering
+    render_engine: str = Field(
+        default="moviepy",
+        description="Default render engine (moviepy, ffmpeg or ffmpeg_segmented)",
+    )
+    render_segment_workers: int = Field(
+        default=0,
+        description="Segments rendered in parallel per job (0 = CPU count)",
+    )
 
     @field_validator("api_keys", mode="before")
     @classmethod
@@ -128,7 +357,7 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in v.split(",") if origin.strip()]
         return v
 
-    @field_validator("upload_dir", "output_dir", mode="before")
+    @field_validator("upload_dir", "output_dir", "media_cache_dir", "segment_cache_dir", mode="before")
     @classmethod
     def ensure_path(cls, v):
         """Ensure path values are Path objects."""
@@ -140,6 +369,8 @@ class Settings(BaseSettings):
         """Create necessary directories if they don't exist."""
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.media_cache_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_cache_dir.mkdir(parents=True, exist_ok=True)
 
     @property
     def is_development(self) -> bool:
@@ -0,0 +1,310 @@
+"""
+Buffered API usage logging written to the database in bulk.
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.api_keys import AuthContext
+from core.database import db_manager
+from core.settings import settings
+from models.database import USAGE_LATENCY_BUCKETS, ApiKeyUsage, ApiKeyUsageRollup
+
+logger = logging.getLogger(__name__)
+
+INSERT_STATEMENT = insert(ApiKeyUsage.__table__)
+
+_rollups = ApiKeyUsageRollup.__table__
+ROLLUP_KEY = ("api_key", "minute", "endpoint", "method")
+ROLLUP_TOTALS = tuple(column.name for column in _rollups.columns if column.name not in ROLLUP_KEY)
+_latency_bounds = [bound for bound, _ in USAGE_LATENCY_BUCKETS]
+
+# Routes whose request bodies are file uploads; other bodies are not counted
+UPLOAD_ROUTES = frozenset({"/upload", "/upload-multiple"})
+
+
+def _rollup_statement(dialect: str):
+    """Upsert adding a batch's per-minute totals onto the stored ones."""
+    statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(_rollups)
+    return statement.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={name: _rollups.c[name] + statement.excluded[name] for name in ROLLUP_TOTALS},
+    )
+
+
+def rollup(records: List[Tuple[Dict[str, Any], str]]) -> List[Dict[str, Any]]:
+    """Sum usage records into per-minute totals for each key, endpoint and method."""
+    totals: Dict[tuple, Dict[str, Any]] = {}
+    for row, route in records:
+        minute = row["created_at"].replace(second=0, microsecond=0)
+        key = (row["api_key"], minute, route, row["method"])
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = dict(zip(ROLLUP_KEY, key), **{name: 0 for name in ROLLUP_TOTALS})
+        total["request_count"] += 1
+        if row["response_status"] >= 400:
+            total["error_count"] += 1
+        if row["response_status"] >= 500:
+            total["server_error_count"] += 1
+        total["response_time_total"] += row["response_time"]
+        total[USAGE_LATENCY_BUCKETS[bisect.bisect_left(_latency_bounds, row["response_time"])][1]] += 1
+        total["uploaded_bytes"] += row["file_size_uploaded"]
+        total["processing_time_total"] += row["processing_time"] or 0.0
+    return list(totals.values())
+
+
+async def record_processing(
+    db: AsyncSession, tenant_id: str, processing_time: float, endpoint: str = "/compose"
+) -> None:
+    """
+    Add a job's render seconds to the usage rollups of the tenant that submitted it.
+
+    Renders finish long after their request was logged, so the time is added
+    to the current minute of the submitting route without counting a request.
+    """
+    if not settings.usage_log_enabled or processing_time <= 0:
+        return
+    total = {name: 0 for name in ROLLUP_TOTALS}
+    total.update(
+        api_key=tenant_id,
+        minute=datetime.now(timezone.utc).replace(second=0, microsecond=0),
+        endpoint=endpoint,
+        method="POST",
+        processing_time_total=processing_time,
+    )
+    await db.execute(_rollup_statement(db.get_bind().dialect.name), [total])
+    await db.commit()
+
+
+def client_ip(connection: HTTPConnection) -> str:
+    """Extract the client IP address, preferring proxy headers."""
+    forwarded_for = connection.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+
+    real_ip = connection.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+
+    if connection.client:
+        return connection.client.host
+
+    return "unknown"
+
+
+class UsageLogger:
+    """
+    In-memory ring buffer of usage records flushed by a background task.
+
+    Requests only append to the buffer. Every ``usage_log_flush_interval``
+    seconds, or as soon as ``usage_log_flush_batch`` records are waiting,
+    the buffer is drained into ``api_key_usage`` with one multi-row INSERT
+    per batch, and the batch's per-minute totals are added to
+    ``api_key_usage_rollups`` in the same transaction. When the database
+    falls behind and the buffer fills up, the oldest records are dropped
+    rather than slowing requests down.
+
+    Raw records older than ``usage_log_retention_days`` are deleted every
+    ``usage_log_prune_interval`` seconds; the rollups are what usage
+    queries read.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self._buffer: Deque[Tuple[Dict[str, Any], str]] = deque(maxlen=capacity or settings.usage_log_buffer_size)
+        self._wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self._dropped_reported = 0
+        self._pruned_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def record(
+        self,
+        auth: AuthContext,
+        connection: HTTPConnection,
+        response_status: int,
+        response_time: float,
+        file_size_uploaded: int = 0,
+        processing_time: Optional[float] = None
+    ) -> None:
+        """Buffer one usage record; never blocks or touches the database."""
+        if not settings.usage_log_enabled:
+            return
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1  # The append below evicts the oldest record
+        user_agent = connection.headers.get("user-agent")
+        route = connection.scope.get("route")
+        row = {
+            "id": str(uuid.uuid4()),
+            "api_key": auth.tenant_id,  # Hashed for privacy
+            "endpoint": connection.url.path[:100],
+            "method": connection.scope.get("method", "GET"),
+            "response_status": response_status,
+            "response_time": response_time,
+            "user_agent": user_agent[:500] if user_agent else None,
+            "ip_address": client_ip(connection)[:45],
+            "file_size_uploaded": file_size_uploaded,
+            "processing_time": processing_time,
+            "created_at": datetime.now(timezone.utc),
+        }
+        # Rollups group by route template so job IDs in paths do not split them
+        self._buffer.append((row, getattr(route, "path", row["endpoint"])[:100]))
+        if len(self._buffer) >= settings.usage_log_flush_batch:
+            self._wakeup.set()
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Write up to ``usage_log_flush_batch`` buffered records in one INSERT
+        and add them to the per-minute rollups.
+
+        Returns:
+            int: Number of records written
+        """
+        records: List[Tuple[Dict[str, Any], str]] = []
+        while self._buffer and len(records) < settings.usage_log_flush_batch:
+            records.append(self._buffer.popleft())
+        if not records:
+            return 0
+
+        try:
+            await db.execute(INSERT_STATEMENT, [row for row, _ in records])
+            await db.execute(_rollup_statement(db.get_bind().dialect.name), rollup(records))
+            await db.commit()
+        except Exception:
+            # Put the records back for the next flush; if new ones filled the
+            # buffer meanwhile, the newest are the ones that get dropped
+            room = self._buffer.maxlen - len(self._buffer)
+            self.dropped += max(0, len(records) - room)
+            self._buffer.extendleft(reversed(records[:room]))
+            raise
+        return len(records)
+
+    async def prune(self, db: AsyncSession) -> int:
+        """
+        Delete raw usage records past ``usage_log_retention_days``.
+
+        Returns:
+            int: Number of records deleted
+        """
+        if settings.usage_log_retention_days <= 0:
+            return 0
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.usage_log_retention_days)
+        result = await db.execute(delete(ApiKeyUsage).where(ApiKeyUsage.created_at < cutoff))
+        await db.commit()
+        return result.rowcount or 0
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.usage_log_flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self._flush_pending()
+
+    async def _flush_pending(self) -> None:
+        if self.dropped != self._dropped_reported:
+            logger.warning(f"Dropped {self.dropped - self._dropped_reported} API usage records")
+            self._dropped_reported = self.dropped
+        if self._buffer:
+            try:
+                async with db_manager.get_session() as db:
+                    while await self.flush(db) >= settings.usage_log_flush_batch:
+                        pass
+            except Exception as e:
+                logger.warning(f"Failed to write API usage records: {e}")
+
+        now = time.monotonic()
+        if self._pruned_at is None or now - self._pruned_at >= settings.usage_log_prune_interval:
+            self._pruned_at = now
+            try:
+                async with db_manager.get_session() as db:
+                    pruned = await self.prune(db)
+                if pruned:
+                    logger.info(f"Deleted {pruned} expired API usage records")
+            except Exception as e:
+                logger.warning(f"Failed to delete expired API usage records: {e}")
+
+    async def start(self) -> None:
+        """Start flushing buffered records in the background."""
+        if settings.usage_log_enabled and not self._flush_task:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Stop the background flush and write what is still buffered."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self._flush_pending()
+
+
+class UsageLoggingMiddleware:
+    """ASGI middleware recording every authenticated HTTP request in the usage log."""
+
+    def __init__(self, app: ASGIApp, usage: Optional[UsageLogger] = None):
+        self.app = app
+        self.usage = usage if usage is not None else usage_logger
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.usage_log_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        # Endpoints store the resolved API key in request.state, which lives
+        # in this dict; create it up front so every copy of the scope shares it
+        state = scope.setdefault("state", {})
+        response_status = 500
+        start_time = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            auth = state.get("auth")
+            if isinstance(auth, AuthContext):
+                connection = HTTPConnection(scope)
+                file_size = 0
+                if getattr(scope.get("route"), "path", None) in UPLOAD_ROUTES:
+                    try:
+                        file_size = int(connection.headers.get("content-length") or 0)
+                    except ValueError:
+                        pass
+                self.usage.record(
+                    auth, connection, response_status, time.perf_counter() - start_time, file_size
+                )
+
+
+# Global usage logger
+usage_logger = UsageLogger()
+
+
+# Startup function for FastAPI
+async def initialize_usage_logger():
+    """Start writing API usage records on application startup."""
+    await usage_logger.start()
+
+
+# Shutdown function for FastAPI
+async def close_usage_logger():
+    """Write remaining API usage records on application shutdown."""
+    await usage_logger.close()
@@ -13,9 +13,14 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
 
-from api.endpoints import files, health, jobs
+from api.endpoints import files, health, jobs, usage
+from core.api_keys import close_api_keys, initialize_api_keys
 from core.database import create_tables
+from core.events import close_job_events
+from core.executor import close_render_executor, initialize_render_executor
+from core.http import close_http_client, initialize_http_client
 from core.settings import settings
+from core.usage import UsageLoggingMiddleware, close_usage_logger, initialize_usage_logger
 from models.api import ErrorResponse
 
 
@@ -48,6 +53,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     except Exception as e:
         logger.warning(f"Redis connection failed: {e}")
     
+    # Load API keys added in Redis and watch for changes
+    await initialize_api_keys()
+    
+    # Start writing buffered API usage records
+    await initialize_usage_logger()
+    
+    # Create the pooled HTTP client used for media downloads
+    await initialize_http_client()
+    
+    # Start the render executor for blocking video work
+    initialize_render_executor()
+    
     # Create necessary directories
     settings.create_directories()
     logger.info("Application startup complete")
@@ -58,6 +75,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     logger.info("Shutting down Video Composition API...")
     if hasattr(app.state, 'redis'):
         await app.state.redis.close()
+    await close_job_events()
+    await close_api_keys()
+    await close_usage_logger()
+    await close_http_client()
+    close_render_executor()
     logger.info("Application shutdown complete")
 
 
@@ -81,6 +103,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record per-key API usage without touching the database on the request path
+app.add_middleware(UsageLoggingMiddleware)
+
 # Add trusted host middleware in production
 if not settings.debug:
     app.add_middleware(
@@ -99,7 +124,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             success=False,
             message=exc.detail,
             error_code=f"HTTP_{exc.status_code}"
-        ).dict()
+        ).model_dump(mode="json"),
+        headers=getattr(exc, "headers", None)
     )
 
 
@@ -112,7 +138,7 @@ async def value_error_handler(request: Request, exc: ValueError):
             success=False,
             message=str(exc),
             error_code="VALUE_ERROR"
-        ).dict()
+        ).model_dump(mode="json")
     )
 
 
@@ -128,7 +154,7 @@ async def general_exception_handler(request: Request, exc: Exception):
             message="An unexpected error occurred",
             error_code="INTERNAL_SERVER_ERROR",
             error_details={"type": type(exc).__name__} if settings.debug else None
-        ).dict()
+        ).model_dump(mode="json")
     )
 
 
@@ -182,6 +208,7 @@ async def rate_limit_headers_middleware(request: Request, call_next):
 app.include_router(health.router, tags=["Health & Info"])
 app.include_router(files.router, tags=["File Management"])
 app.include_router(jobs.router, tags=["Job Management"])
+app.include_router(usage.router, tags=["Usage"])
 
 
 # Additional endpoints
@@ -76,6 +76,13 @@ class VideoFormat(str, Enum):
     GIF = "gif"
 
 
+class RenderEngine(str, Enum):
+    """Render engines available for composition."""
+    MOVIEPY = "moviepy"
+    FFMPEG = "ffmpeg"
+    FFMPEG_SEGMENTED = "ffmpeg_segmented"  # Parallel per-scene segments joined by concat
+
+
 # Base response models
 class BaseResponse(BaseModel):
     """Base response model."""
@@ -143,6 +150,7 @@ class CompositionSettings(BaseModel):
     watermark_url: Optional[str] = Field(None, description="URL to watermark image")
     watermark_position: str = Field(default="bottom-right", description="Watermark position")
     watermark_opacity: float = Field(default=0.5, ge=0, le=1, description="Watermark opacity")
+    render_engine: Optional[RenderEngine] = Field(None, description="Render engine override (defaults to server setting)")
     
     @field_validator('background_color')
     @classmethod
@@ -277,6 +285,8 @@ class JobResponse(BaseModel):
     output_format: Optional[str] = None
     output_size: Optional[int] = None
     duration: Optional[float] = None
+    segment_count: Optional[int] = None
+    segment_cache_hits: Optional[int] = None
     
     # Error information
     error_message: Optional[str] = None
@@ -303,9 +313,107 @@ class JobListResponse(BaseResponse):
     per_page: int = 50
 
 
+class RenderCostEstimate(BaseModel):
+    """Estimated render work for a composition."""
+    cpu_seconds: float = Field(..., description="Estimated CPU time to render")
+    memory_bytes: int = Field(..., description="Estimated peak memory while rendering")
+    frames: int
+    output_pixels: int
+    transitions: int = 0
+
+
 class JobSubmissionResponse(BaseResponse):
     """Job submission response."""
     job: JobResponse
+    estimate: Optional[RenderCostEstimate] = None
+    queue_eta_seconds: Optional[float] = Field(
+        None, description="Estimated wait before rendering starts (null when no workers are running)"
+    )
+    deduplicated: bool = Field(
+        False, description="True when an identical earlier submission's job was returned"
+    )
+
+
+class BatchCompositionRequest(BaseModel):
+    """Several composition requests submitted together."""
+    compositions: List[Dict[str, Any]] = Field(
+        ..., min_length=1, description="Composition requests in the POST /compose format"
+    )
+
+
+class BatchItemResult(BaseModel):
+    """Outcome of one composition in a batch submission."""
+    index: int = Field(..., description="Position of the composition in the batch")
+    success: bool
+    job: Optional[JobResponse] = None
+    estimate: Optional[RenderCostEstimate] = None
+    queue_eta_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class BatchSubmissionResponse(BaseResponse):
+    """Batch submission response."""
+    results: List[BatchItemResult]
+    submitted: int
+    failed: int
+
+
+class TenantQueueStats(BaseModel):
+    """Waiting jobs for one tenant within a priority."""
+    depth: int
+    oldest_wait: float = Field(..., description="Seconds the oldest job has waited")
+    virtual_time: float = Field(..., description="Fair-share position (lower runs sooner)")
+
+
+class PriorityQueueStats(BaseModel):
+    """Waiting jobs for one priority."""
+    depth: int
+    oldest_wait: float = Field(..., description="Seconds the oldest job has waited")
+    tenants: Dict[str, TenantQueueStats] = Field(
+        default_factory=dict, description="Waiting jobs of the caller's tenant, if any"
+    )
+
+
+class QueueStatsResponse(BaseResponse):
+    """Job queue statistics response."""
+    tenant: str = Field(..., description="Caller's tenant ID")
+    priorities: Dict[str, PriorityQueueStats]
+
+
+class UsageStats(BaseModel):
+    """API usage totals over a period."""
+    requests: int = 0
+    errors: int = Field(0, description="Responses with a 4xx or 5xx status")
+    server_errors: int = Field(0, description="Responses with a 5xx status")
+    average_response_time: float = Field(0.0, description="Mean seconds to respond")
+    latency_histogram: Dict[str, int] = Field(
+        default_factory=dict,
+        description="Requests per response time bucket, keyed by upper bound in seconds",
+    )
+    uploaded_bytes: int = 0
+    processing_seconds: float = 0.0
+
+
+class EndpointUsage(UsageStats):
+    """API usage of one endpoint."""
+    endpoint: str = Field(..., description="Route path, e.g. /jobs/{job_id}")
+    method: str
+
+
+class UsagePeriod(UsageStats):
+    """API usage within one interval of the requested period."""
+    start: datetime
+
+
+class UsageResponse(BaseResponse):
+    """API usage response."""
+    tenant: str = Field(..., description="Caller's tenant ID")
+    start: datetime
+    end: datetime
+    interval_minutes: int
+    totals: UsageStats
+    endpoints: List[EndpointUsage]
+    series: List[UsagePeriod] = Field(..., description="Usage per interval, oldest first")
 
 
 # System info models
@@ -2,11 +2,12 @@
 Database models.
 """
 
+import math
 import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, ForeignKey, Text, Integer, Float, Boolean, DateTime, func
+from sqlalchemy import String, ForeignKey, Text, Integer, BigInteger, Float, Boolean, DateTime, func
 from sqlalchemy.orm import mapped_column, Mapped
 
 from core.database import Base
@@ -48,6 +49,8 @@ class Job(Base):
     output_format: Mapped[Optional[str]] = mapped_column(String(10))
     output_size: Mapped[Optional[int]] = mapped_column(Integer)  # File size in bytes
     duration: Mapped[Optional[float]] = mapped_column(Float)  # Video duration in seconds
+    segment_count: Mapped[Optional[int]] = mapped_column(Integer)  # Segmented renders only
+    segment_cache_hits: Mapped[Optional[int]] = mapped_column(Integer)
     
     # Error handling
     error_message: Mapped[Optional[str]] = mapped_column(Text)
@@ -129,7 +132,7 @@ class UploadedFile(Base):
     
     # Checksums for integrity
     md5_hash: Mapped[Optional[str]] = mapped_column(String(32))
-    sha256_hash: Mapped[Optional[str]] = mapped_column(String(64))
+    sha256_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
@@ -144,6 +147,26 @@ class UploadedFile(Base):
         return f"<UploadedFile {self.id} - {self.filename}>"
 
 
+class StoredBlob(Base):
+    """Model for content-addressed upload blobs shared between uploaded files."""
+
+    __tablename__ = "stored_blobs"
+
+    sha256_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    file_path: Mapped[str] = mapped_column(String(500), nullable=False)
+    file_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    
+    # Number of UploadedFile rows referencing this blob
+    ref_count: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<StoredBlob {self.sha256_hash} - {self.ref_count} refs>"
+
+
 class JobFile(Base):
     """Association table for jobs and their associated files."""
 
@@ -201,3 +224,50 @@ class ApiKeyUsage(Base):
 
     def __repr__(self) -> str:
         return f"<ApiKeyUsage {self.api_key} - {self.endpoint}>"
+
+
+# Response time histogram of usage rollups: (upper bound in seconds, column)
+USAGE_LATENCY_BUCKETS = (
+    (0.05, "latency_50ms"),
+    (0.1, "latency_100ms"),
+    (0.25, "latency_250ms"),
+    (0.5, "latency_500ms"),
+    (1.0, "latency_1s"),
+    (2.5, "latency_2500ms"),
+    (5.0, "latency_5s"),
+    (math.inf, "latency_inf"),
+)
+
+
+class ApiKeyUsageRollup(Base):
+    """Model for per-minute API usage totals of one key, endpoint and method."""
+
+    __tablename__ = "api_key_usage_rollups"
+
+    api_key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    minute: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    endpoint: Mapped[str] = mapped_column(String(100), primary_key=True)  # Route path template
+    method: Mapped[str] = mapped_column(String(10), primary_key=True)
+
+    # Request counts
+    request_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 4xx and 5xx
+    server_error_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Response times: total seconds and requests per USAGE_LATENCY_BUCKETS bucket
+    response_time_total: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+    latency_50ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_100ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_250ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_500ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_1s: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_2500ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_5s: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    latency_inf: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    # Resource usage
+    uploaded_bytes: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    processing_time_total: Mapped[float] = mapped_column(Float, default=0.0, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ApiKeyUsageRollup {self.api_key} - {self.endpoint} @ {self.minute}>"
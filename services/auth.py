@@ -2,17 +2,18 @@
 Authentication and rate limiting service.
 """
 
-import hashlib
+import math
 import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 import redis.asyncio as redis
-from fastapi import HTTPException, Request, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, HTTPException, Request, status
 
+from core.api_keys import AuthContext, api_key_index
+from core.redis import check_token_bucket
 from core.settings import settings
-from models.database import ApiKeyUsage
+from core.usage import client_ip, usage_logger
 
 
 class AuthService:
@@ -20,63 +21,49 @@ class AuthService:
     
     def __init__(self, redis_client: redis.Redis):
         self.redis = redis_client
-        self.api_keys = set(settings.api_keys)
     
     def validate_api_key(self, api_key: str) -> bool:
         """Validate API key."""
-        return api_key in self.api_keys
+        return api_key_index.resolve(api_key) is not None
     
-    async def check_rate_limit(self, api_key: str) -> tuple[bool, dict]:
+    async def check_rate_limit(self, auth: AuthContext, cost: float = 1.0) -> tuple[bool, dict]:
         """
-        Check rate limit for API key.
+        Check rate limit for API key, spending ``cost`` tokens if allowed.
+        
+        A cost above the whole limit is charged as the limit, so expensive
+        requests need a full bucket rather than never going through.
         
         Returns:
             tuple: (is_allowed, rate_limit_info)
         """
-        key = f"rate_limit:{api_key}"
-        window_start = int(time.time()) // settings.rate_limit_window
-        
         try:
-            # Get current count
-            current_count = await self.redis.get(f"{key}:{window_start}")
-            current_count = int(current_count) if current_count else 0
-            
-            # Calculate reset time
-            reset_time = (window_start + 1) * settings.rate_limit_window
-            
+            result = await check_token_bucket(
+                self.redis, f"rate_limit:{auth.tenant_id}",
+                auth.rate_limit, settings.rate_limit_window, min(cost, auth.rate_limit)
+            )
             rate_limit_info = {
-                "requests_remaining": max(0, settings.rate_limit_requests - current_count),
-                "requests_limit": settings.rate_limit_requests,
-                "window_reset_time": datetime.fromtimestamp(reset_time),
-                "window_duration": settings.rate_limit_window
+                "requests_remaining": result.remaining,
+                "requests_limit": auth.rate_limit,
+                "window_reset_time": datetime.fromtimestamp(time.time() + result.reset_after),
+                "window_duration": settings.rate_limit_window,
+                "retry_after": math.ceil(result.retry_after)
             }
-            
-            if current_count >= settings.rate_limit_requests:
-                return False, rate_limit_info
-            
-            # Increment counter
-            pipe = self.redis.pipeline()
-            pipe.incr(f"{key}:{window_start}")
-            pipe.expire(f"{key}:{window_start}", settings.rate_limit_window)
-            await pipe.execute()
-            
-            rate_limit_info["requests_remaining"] -= 1
-            return True, rate_limit_info
+            return result.allowed, rate_limit_info
             
         except Exception as e:
             # If Redis is down, allow the request but log the error
             import logging
             logging.warning(f"Rate limiting failed: {e}")
             return True, {
-                "requests_remaining": settings.rate_limit_requests,
-                "requests_limit": settings.rate_limit_requests,
+                "requests_remaining": auth.rate_limit,
+                "requests_limit": auth.rate_limit,
                 "window_reset_time": datetime.utcnow() + timedelta(seconds=settings.rate_limit_window),
-                "window_duration": settings.rate_limit_window
+                "window_duration": settings.rate_limit_window,
+                "retry_after": 0
             }
     
-    async def log_api_usage(
+    def log_api_usage(
         self,
-        db: AsyncSession,
         api_key: str,
         request: Request,
         response_status: int,
@@ -84,55 +71,29 @@ class AuthService:
         file_size_uploaded: int = 0,
         processing_time: Optional[float] = None
     ):
-        """Log API usage for analytics and monitoring."""
-        try:
-            # Hash API key for privacy
-            api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
-            
-            usage = ApiKeyUsage(
-                api_key=api_key_hash,
-                endpoint=str(request.url.path),
-                method=request.method,
-                response_status=response_status,
-                response_time=response_time,
-                user_agent=request.headers.get("user-agent"),
-                ip_address=self._get_client_ip(request),
-                file_size_uploaded=file_size_uploaded,
-                processing_time=processing_time
-            )
-            
-            db.add(usage)
-            await db.commit()
-            
-        except Exception as e:
-            # Don't fail the request if logging fails
-            import logging
-            logging.warning(f"Failed to log API usage: {e}")
+        """Buffer an API usage record; it is written to the database in bulk."""
+        usage_logger.record(
+            api_key_index.context(api_key),
+            request,
+            response_status,
+            response_time,
+            file_size_uploaded=file_size_uploaded,
+            processing_time=processing_time
+        )
     
     def _get_client_ip(self, request: Request) -> str:
         """Extract client IP address from request."""
-        # Check for forwarded headers first
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        # Fallback to direct connection
-        if hasattr(request, "client") and request.client:
-            return request.client.host
-        
-        return "unknown"
+        return client_ip(request)
 
 
-# Authentication dependency
-async def get_api_key(request: Request) -> str:
+# Authentication dependencies
+async def get_auth_context(request: Request) -> AuthContext:
     """
-    Extract and validate API key from request.
+    Extract and validate the API key of a request.
     
-    Supports Bearer token in Authorization header.
+    Supports Bearer token in Authorization header. The key is looked up in
+    the precomputed API key index and its context is kept on
+    ``request.state.auth``.
     """
     auth_header = request.headers.get("authorization")
     if not auth_header:
@@ -159,32 +120,54 @@ async def get_api_key(request: Request) -> str:
         )
     
     # Validate API key
-    auth_service = AuthService(None)  # Redis client will be injected
-    if not auth_service.validate_api_key(api_key):
+    auth = api_key_index.resolve(api_key)
+    if auth is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid API key",
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    return api_key
+    request.state.auth = auth
+    return auth
 
 
-# Rate limiting dependency
-async def check_rate_limit(request: Request, api_key: str = None) -> dict:
+async def get_api_key(auth: AuthContext = Depends(get_auth_context)) -> str:
+    """Get the validated API key of a request."""
+    return auth.api_key
+
+
+def request_cost(request: Request) -> float:
     """
-    Check rate limit for the current request.
+    Get the rate limit tokens a request costs.
     
-    Returns rate limit information and raises exception if exceeded.
+    Reads are nearly free; other requests cost one token, or more for
+    large uploads (which must declare their Content-Length). Compositions are charged by estimated render time
+    through ``charge_rate_limit`` instead.
     """
-    if not api_key:
-        api_key = await get_api_key(request)
+    if request.method in ("GET", "HEAD"):
+        return settings.rate_limit_read_cost
+    size = int(request.headers.get("content-length") or 0)
+    return max(1.0, size / (1024 * 1024) * settings.rate_limit_upload_megabyte_cost)
+
+
+def composition_cost(cpu_seconds: float) -> float:
+    """Get the rate limit tokens for compositions of estimated render CPU-seconds."""
+    return max(1.0, cpu_seconds * settings.rate_limit_render_second_cost)
+
+
+async def charge_rate_limit(request: Request, auth: AuthContext, cost: float) -> dict:
+    """
+    Spend ``cost`` rate limit tokens for the current request.
     
+    Returns rate limit information and raises exception if exceeded.
+    """
     # Get Redis client from app state
     redis_client = request.app.state.redis
     auth_service = AuthService(redis_client)
     
-    is_allowed, rate_limit_info = await auth_service.check_rate_limit(api_key)
+    is_allowed, rate_limit_info = await auth_service.check_rate_limit(auth, cost)
+    request.state.rate_limit_info = rate_limit_info
     
     if not is_allowed:
         raise HTTPException(
@@ -194,8 +177,20 @@ async def check_rate_limit(request: Request, api_key: str = None) -> dict:
                 "X-RateLimit-Limit": str(rate_limit_info["requests_limit"]),
                 "X-RateLimit-Remaining": str(rate_limit_info["requests_remaining"]),
                 "X-RateLimit-Reset": str(int(rate_limit_info["window_reset_time"].timestamp())),
-                "Retry-After": str(rate_limit_info["window_duration"])
+                "Retry-After": str(rate_limit_info["retry_after"])
             }
         )
     
     return rate_limit_info
+
+
+# Rate limiting dependency
+async def check_rate_limit(
+    request: Request, auth: AuthContext = Depends(get_auth_context)
+) -> dict:
+    """
+    Check rate limit for the current request, weighted by ``request_cost``.
+    
+    Returns rate limit information and raises exception if exceeded.
+    """
+    return await charge_rate_limit(request, auth, request_cost(request))
@@ -0,0 +1,179 @@
+"""
+Content-addressed storage for uploaded files.
+"""
+
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.settings import settings
+from models.database import StoredBlob
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """
+    Store each distinct upload once, keyed by its SHA-256.
+
+    ``UploadedFile`` rows point at a shared blob whose ``StoredBlob.ref_count``
+    tracks how many rows reference it; the file is unlinked once a transaction
+    dropping the count to zero has committed. Refcount changes are made in the
+    caller's transaction so they commit together with the ``UploadedFile``
+    insert or delete.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        self.root = root or settings.upload_dir
+        self.blob_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def temp_path(self, name: str) -> Path:
+        """Get a staging path for an upload that is still being received."""
+        return self.tmp_dir / name
+
+    def blob_path(self, sha256_hash: str, extension: str) -> Path:
+        """
+        Get a fresh storage path for content with the given hash.
+
+        Every registration of a blob gets its own file, so a new upload never
+        adopts a file left by a released blob that is about to be purged.
+        """
+        name = f"{sha256_hash}.{uuid.uuid4().hex[:12]}{extension}"
+        return self.blob_dir / sha256_hash[:2] / sha256_hash[2:4] / name
+
+    async def _add_reference(self, db: AsyncSession, sha256_hash: str) -> Optional[StoredBlob]:
+        result = await db.execute(
+            update(StoredBlob)
+            .where(StoredBlob.sha256_hash == sha256_hash)
+            .values(ref_count=StoredBlob.ref_count + 1)
+        )
+        if result.rowcount != 1:
+            return None
+        return await db.scalar(
+            select(StoredBlob)
+            .where(StoredBlob.sha256_hash == sha256_hash)
+            .execution_options(populate_existing=True)
+        )
+
+    @staticmethod
+    def _place(temp_path: Path, blob_path: Path) -> None:
+        """Move staged content into a registered blob's place if its file is missing, else drop it."""
+        if blob_path.exists():
+            temp_path.unlink(missing_ok=True)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(temp_path, blob_path)
+
+    async def acquire(
+        self,
+        db: AsyncSession,
+        temp_path: Path,
+        sha256_hash: str,
+        file_size: int
+    ) -> Tuple[StoredBlob, bool]:
+        """
+        Take a reference to the blob for staged content.
+
+        The staged file is moved into the store if the content is new and
+        discarded otherwise.
+
+        Returns:
+            tuple: (blob, created) where created is True for new content
+        """
+        blob = await self._add_reference(db, sha256_hash)
+        if blob:
+            self._place(temp_path, Path(blob.file_path))
+            return blob, False
+
+        blob_path = self.blob_path(sha256_hash, temp_path.suffix)
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(temp_path, blob_path)
+        try:
+            async with db.begin_nested():
+                blob = StoredBlob(
+                    sha256_hash=sha256_hash,
+                    file_path=str(blob_path),
+                    file_size=file_size,
+                    ref_count=1
+                )
+                db.add(blob)
+        except IntegrityError:
+            # Another upload of the same content registered the blob first
+            blob = await self._add_reference(db, sha256_hash)
+            if not blob:
+                raise
+            blob_path.unlink(missing_ok=True)
+            return blob, False
+
+        return blob, True
+
+    async def release(self, db: AsyncSession, sha256_hash: Optional[str], file_path: str) -> Optional[str]:
+        """
+        Drop a file's reference to its blob.
+
+        Nothing is unlinked here, since the caller may still roll back; pass
+        the returned path to ``purge`` once the transaction has committed.
+        Files stored before the blob store existed have no blob row pointing
+        at their path and are always returned.
+
+        Returns:
+            str: Path to purge after commit, or None while the blob is still referenced
+        """
+        blob = None
+        if sha256_hash:
+            blob = await db.scalar(
+                select(StoredBlob).where(
+                    StoredBlob.sha256_hash == sha256_hash,
+                    StoredBlob.file_path == file_path
+                )
+            )
+
+        if blob is None:
+            return file_path
+
+        await db.execute(
+            update(StoredBlob)
+            .where(StoredBlob.sha256_hash == sha256_hash)
+            .values(ref_count=StoredBlob.ref_count - 1)
+        )
+        result = await db.execute(
+            delete(StoredBlob).where(
+                StoredBlob.sha256_hash == sha256_hash,
+                StoredBlob.ref_count <= 0
+            )
+        )
+        return file_path if result.rowcount else None
+
+    async def purge(self, db: AsyncSession, sha256_hash: Optional[str], file_path: str) -> None:
+        """
+        Unlink a blob released in a committed transaction.
+
+        The file is kept if an upload of the same content has registered it
+        again since; a file that is already gone is not an error.
+        """
+        if sha256_hash and await db.scalar(
+            select(StoredBlob.sha256_hash).where(
+                StoredBlob.sha256_hash == sha256_hash,
+                StoredBlob.file_path == file_path
+            )
+        ):
+            return
+        try:
+            Path(file_path).unlink()
+        except FileNotFoundError:
+            return
+        if sha256_hash:
+            logger.info(f"Removed unreferenced blob {sha256_hash}")
+
+    async def discard(self, db: AsyncSession, blob: StoredBlob) -> None:
+        """Remove a newly created blob's file after its insert was rolled back."""
+        await self.purge(db, blob.sha256_hash, blob.file_path)
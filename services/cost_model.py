@@ -0,0 +1,97 @@
+"""
+Render cost estimation for admission control and queue ETAs.
+"""
+
+from core.settings import settings
+from models.api import (
+    MediaType, RenderCostEstimate, RenderEngine, TransitionType, VideoCompositionRequest,
+    VideoFormat
+)
+from services.ffmpeg_engine import FFmpegRenderEngine
+from services.video_service import VideoCompositionService
+
+# Relative encode cost per output pixel by container/codec
+CODEC_FACTORS = {
+    VideoFormat.MP4: 1.0,   # libx264
+    VideoFormat.MOV: 1.0,   # libx264
+    VideoFormat.AVI: 0.6,   # libxvid
+    VideoFormat.WEBM: 2.5,  # libvpx-vp9
+    VideoFormat.GIF: 1.5,   # palettegen + paletteuse
+}
+
+# Decode/scale cost per output pixel relative to encoding
+SOURCE_FACTORS = {
+    MediaType.IMAGE: 0.05,       # decoded once, then looped
+    MediaType.VIDEO: 0.4,
+    MediaType.IMAGE_VIDEO: 0.4,  # assume the more expensive case
+}
+
+# Blending both inputs across the overlap
+TRANSITION_FACTOR = 0.5
+
+# moviepy composites frames in Python rather than in the ffmpeg filter graph
+ENGINE_FACTORS = {
+    RenderEngine.MOVIEPY: 3.0,
+    RenderEngine.FFMPEG: 1.0,
+    RenderEngine.FFMPEG_SEGMENTED: 1.1,  # plus the concat pass
+}
+
+# Frames held in flight by encoder lookahead and filter queues
+BUFFERED_FRAMES = 24
+BASE_MEMORY = 200 * 1024 * 1024
+
+
+class RenderCostModel:
+    """Estimate the CPU time and memory a composition request needs to render."""
+
+    def estimate(self, request: VideoCompositionRequest) -> RenderCostEstimate:
+        """
+        Estimate render cost from output size, frame count, sources,
+        transitions and codec.
+
+        Cost is expressed in estimated CPU-seconds so it can be compared
+        against worker budgets and summed into queue backlogs.
+        """
+        width, height = VideoCompositionService.QUALITY_RESOLUTIONS.get(
+            request.quality, (1920, 1080)
+        )
+        fps = request.fps
+        if request.output_format == VideoFormat.GIF:
+            fps = min(fps, FFmpegRenderEngine.GIF_MAX_FPS)
+        megapixels = width * height / 1_000_000
+        duration = request.get_total_duration()
+        frames = int(duration * fps)
+
+        # Encoding every output frame
+        work = frames * megapixels * CODEC_FACTORS.get(request.output_format, 1.0)
+
+        # Decoding and scaling sources; transitions blend two inputs over the overlap
+        transitions = 0
+        for scene in request.scenes.values():
+            work += scene.duration * fps * megapixels * SOURCE_FACTORS.get(scene.media_type, 0.4)
+            if scene.transition != TransitionType.NONE:
+                transitions += 1
+                work += FFmpegRenderEngine.TRANSITION_DURATION * fps * megapixels * TRANSITION_FACTOR
+        if request.composition_settings.watermark_url:
+            work += frames * megapixels * 0.1
+
+        engine = VideoCompositionService.get_render_engine(request.composition_settings)
+        work *= ENGINE_FACTORS.get(engine, 1.0)
+
+        frame_bytes = width * height * 4
+        memory = BASE_MEMORY + frame_bytes * BUFFERED_FRAMES
+        if engine == RenderEngine.MOVIEPY:
+            # Every clip keeps its own decoded frame alongside the composite
+            memory += frame_bytes * len(request.scenes) * 2
+
+        return RenderCostEstimate(
+            cpu_seconds=round(work * settings.render_cpu_seconds_per_megapixel, 2),
+            memory_bytes=memory,
+            frames=frames,
+            output_pixels=width * height,
+            transitions=transitions
+        )
+
+
+# Shared cost model instance
+cost_model = RenderCostModel()
@@ -0,0 +1,577 @@
+"""
+Native ffmpeg render engine that compiles compositions into a single filtergraph.
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from core.settings import settings
+from models.api import CompositionSettings, SceneData, TransitionType, VideoFormat
+
+if TYPE_CHECKING:
+    from services.segment_cache import SegmentCache
+
+
+class FFmpegRenderEngine:
+    """Render compositions as one ffmpeg ``-filter_complex`` subprocess."""
+
+    # Transitions that overlap the outgoing and incoming scene via xfade
+    XFADE_TRANSITIONS = {
+        TransitionType.CROSSFADE: "fade",
+        TransitionType.SLIDE_LEFT: "slideleft",
+        TransitionType.SLIDE_RIGHT: "slideright",
+        TransitionType.SLIDE_UP: "slideup",
+        TransitionType.SLIDE_DOWN: "slidedown",
+        TransitionType.ZOOM_IN: "zoomin",
+    }
+
+    # Default transition length in seconds (matches the moviepy engine)
+    TRANSITION_DURATION = 0.5
+
+    # Overlay coordinates for watermark positions
+    WATERMARK_MARGIN = 20
+    WATERMARK_POSITIONS = {
+        "top-left": "{m}:{m}",
+        "top-right": "W-w-{m}:{m}",
+        "bottom-left": "{m}:H-h-{m}",
+        "bottom-right": "W-w-{m}:H-h-{m}",
+        "center": "(W-w)/2:(H-h)/2",
+    }
+    # Maximum watermark width as a fraction of the output width
+    WATERMARK_MAX_WIDTH = 0.2
+
+    # Encoder arguments per output format
+    CODEC_ARGS = {
+        VideoFormat.MP4: [
+            "-c:v", "libx264", "-preset", "medium",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart"
+        ],
+        VideoFormat.WEBM: ["-c:v", "libvpx-vp9", "-pix_fmt", "yuv420p"],
+        VideoFormat.AVI: ["-c:v", "libxvid"],
+        VideoFormat.MOV: ["-c:v", "libx264", "-pix_fmt", "yuv420p"],
+    }
+
+    # Frame rate cap for GIF output (matches the moviepy engine)
+    GIF_MAX_FPS = 15
+
+    def __init__(self, ffmpeg_binary: Optional[str] = None):
+        self.ffmpeg_binary = ffmpeg_binary or settings.ffmpeg_binary
+
+    @staticmethod
+    def _format_number(value: float) -> str:
+        """Format a float for use inside a filter expression."""
+        return f"{value:.3f}".rstrip("0").rstrip(".") or "0"
+
+    @staticmethod
+    def _ffmpeg_color(color: str) -> str:
+        """Convert a composition color into ffmpeg color syntax."""
+        if color.startswith("#") and len(color) == 4:
+            # Expand short hex form (#abc -> #aabbcc)
+            return "#" + "".join(c * 2 for c in color[1:])
+        return color.lower()
+
+    def transition_duration(self, previous: SceneData, current: SceneData) -> float:
+        """Get the transition length between two scenes."""
+        # Never let a transition consume more than half of either scene
+        return min(
+            self.TRANSITION_DURATION,
+            previous.duration * 0.5,
+            current.duration * 0.5
+        )
+
+    def _input_args(
+        self,
+        path: Path,
+        is_image: bool,
+        duration: float,
+        fps: int,
+        start: float = 0.0
+    ) -> List[str]:
+        """Build input arguments for a single scene source."""
+        if is_image:
+            return [
+                "-loop", "1", "-framerate", str(fps),
+                "-t", self._format_number(duration), "-i", str(path)
+            ]
+        seek = ["-ss", self._format_number(start)] if start else []
+        return [*seek, "-t", self._format_number(duration), "-i", str(path)]
+
+    def _scene_transitions(self, scenes: Sequence[SceneData]) -> List[Tuple[float, float]]:
+        """
+        Get the transition into each scene.
+
+        Returns:
+            list: (xfade overlap, fade length) per scene; both are 0 for the first scene
+        """
+        transitions = [(0.0, 0.0)]
+        for index in range(1, len(scenes)):
+            scene = scenes[index]
+            duration = self.transition_duration(scenes[index - 1], scene)
+            if scene.transition in self.XFADE_TRANSITIONS:
+                transitions.append((duration, 0.0))
+            elif scene.transition == TransitionType.FADE:
+                transitions.append((0.0, duration))
+            else:
+                transitions.append((0.0, 0.0))
+        return transitions
+
+    def _scene_filter(
+        self,
+        input_label: str,
+        output_label: str,
+        duration: float,
+        resolution: Tuple[int, int],
+        fps: int,
+        background: str,
+        fade_in: float = 0.0,
+        fade_out: float = 0.0
+    ) -> str:
+        """Build the normalisation chain for one scene stream."""
+        width, height = resolution
+        length = self._format_number(duration)
+        filters = [
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color={background}",
+            "setsar=1",
+            "format=yuv420p",
+            # Hold the last frame so short videos fill their scene duration
+            f"tpad=stop_mode=clone:stop_duration={length}",
+            f"trim=duration={length}",
+            "setpts=PTS-STARTPTS",
+            # Constant frame rate last; xfade rejects streams without one
+            f"fps={fps}",
+        ]
+        if fade_in:
+            filters.append(f"fade=t=in:st=0:d={self._format_number(fade_in)}")
+        if fade_out:
+            start = self._format_number(duration - fade_out)
+            filters.append(f"fade=t=out:st={start}:d={self._format_number(fade_out)}")
+        return f"[{input_label}]{','.join(filters)}[{output_label}]"
+
+    def _watermark_filter(
+        self,
+        input_label: str,
+        watermark_label: str,
+        output_label: str,
+        resolution: Tuple[int, int],
+        composition_settings: CompositionSettings
+    ) -> List[str]:
+        """Build filters that overlay the watermark on the composed stream."""
+        max_width = int(resolution[0] * self.WATERMARK_MAX_WIDTH)
+        opacity = self._format_number(composition_settings.watermark_opacity)
+        position = self.WATERMARK_POSITIONS.get(
+            composition_settings.watermark_position,
+            self.WATERMARK_POSITIONS["bottom-right"]
+        ).format(m=self.WATERMARK_MARGIN)
+        return [
+            f"[{watermark_label}]scale='min(iw,{max_width})':-1,format=rgba,"
+            f"colorchannelmixer=aa={opacity}[wm]",
+            f"[{input_label}][wm]overlay={position}:format=auto[{output_label}]",
+        ]
+
+    def _output_args(self, output_format: VideoFormat, fps: int) -> List[str]:
+        """Build encoder arguments for the output format."""
+        if output_format == VideoFormat.GIF:
+            return ["-r", str(min(fps, self.GIF_MAX_FPS))]
+        codec_args = self.CODEC_ARGS.get(output_format, self.CODEC_ARGS[VideoFormat.MP4])
+        return ["-r", str(fps), *codec_args]
+
+    def _finalize_filters(
+        self,
+        graph: List[str],
+        input_label: str,
+        output_format: VideoFormat,
+        fps: int,
+        resolution: Tuple[int, int],
+        composition_settings: CompositionSettings,
+        watermark_index: Optional[int]
+    ) -> None:
+        """Append watermark and output-format filters, ending at ``[out]``."""
+        label = input_label
+        if watermark_index is not None:
+            graph.extend(self._watermark_filter(
+                label, f"{watermark_index}:v", "marked", resolution, composition_settings
+            ))
+            label = "marked"
+
+        if output_format == VideoFormat.GIF:
+            # Generate a palette from the stream itself for better GIF quality
+            gif_fps = min(fps, self.GIF_MAX_FPS)
+            graph.append(
+                f"[{label}]fps={gif_fps},split[gif_a][gif_b];"
+                f"[gif_a]palettegen[palette];[gif_b][palette]paletteuse[out]"
+            )
+        else:
+            graph.append(f"[{label}]null[out]")
+
+    def build_command(
+        self,
+        scene_inputs: Sequence[Tuple[Path, SceneData, bool]],
+        output_path: Path,
+        output_format: VideoFormat,
+        resolution: Tuple[int, int],
+        fps: int,
+        composition_settings: CompositionSettings,
+        watermark_path: Optional[Path] = None
+    ) -> Tuple[List[str], float]:
+        """
+        Compile scenes into a single ffmpeg command.
+
+        Args:
+            scene_inputs: Ordered (media_path, scene_data, is_image) tuples
+            output_path: Destination file
+            output_format: Output video format
+            resolution: Target (width, height)
+            fps: Output frame rate
+            composition_settings: Background and watermark settings
+            watermark_path: Local path of the watermark image, if any
+
+        Returns:
+            tuple: (command arguments, output duration in seconds)
+        """
+        if not scene_inputs:
+            raise ValueError("At least one scene is required")
+
+        background = self._ffmpeg_color(composition_settings.background_color)
+        scenes = [scene for _, scene, _ in scene_inputs]
+        transitions = self._scene_transitions(scenes) + [(0.0, 0.0)]
+
+        input_args: List[str] = []
+        graph: List[str] = []
+
+        for index, (path, scene, is_image) in enumerate(scene_inputs):
+            input_args.extend(self._input_args(path, is_image, scene.duration, fps))
+            graph.append(self._scene_filter(
+                f"{index}:v", f"s{index}", scene.duration, resolution, fps,
+                background, transitions[index][1], transitions[index + 1][1]
+            ))
+
+        # Join scenes: consecutive hard cuts are batched into one concat,
+        # overlapping transitions are chained through xfade.
+        pieces: List[Tuple[str, float]] = [("s0", scenes[0].duration)]
+        join_count = 0
+
+        def collapse() -> Tuple[str, float]:
+            nonlocal join_count
+            if len(pieces) == 1:
+                return pieces[0]
+            join_count += 1
+            label = f"j{join_count}"
+            labels = "".join(f"[{name}]" for name, _ in pieces)
+            graph.append(f"{labels}concat=n={len(pieces)}:v=1:a=0[{label}]")
+            return label, sum(duration for _, duration in pieces)
+
+        for index in range(1, len(scenes)):
+            scene = scenes[index]
+            overlap = transitions[index][0]
+
+            if overlap:
+                label, duration = collapse()
+                xfade = self.XFADE_TRANSITIONS[scene.transition]
+                offset = self._format_number(duration - overlap)
+                join_count += 1
+                joined = f"j{join_count}"
+                graph.append(
+                    f"[{label}][s{index}]xfade=transition={xfade}:"
+                    f"duration={self._format_number(overlap)}:offset={offset}[{joined}]"
+                )
+                pieces[:] = [(joined, duration + scene.duration - overlap)]
+            else:
+                pieces.append((f"s{index}", scene.duration))
+
+        final_label, total_duration = collapse()
+
+        watermark_index = None
+        if watermark_path:
+            watermark_index = len(scene_inputs)
+            input_args.extend(["-i", str(watermark_path)])
+
+        self._finalize_filters(
+            graph, final_label, output_format, fps, resolution,
+            composition_settings, watermark_index
+        )
+
+        command = [
+            self.ffmpeg_binary, "-hide_banner", "-nostdin", "-y",
+            *input_args,
+            "-filter_complex", ";".join(graph),
+            "-map", "[out]",
+            *self._output_args(output_format, fps),
+            "-progress", "pipe:1", "-nostats",
+            str(output_path)
+        ]
+        return command, total_duration
+
+    def build_segment_commands(
+        self,
+        scene_inputs: Sequence[Tuple[Path, SceneData, bool]],
+        work_dir: Path,
+        output_format: VideoFormat,
+        resolution: Tuple[int, int],
+        fps: int,
+        composition_settings: CompositionSettings,
+        watermark_path: Optional[Path] = None,
+        threads: int = 0
+    ) -> List[Tuple[List[str], Path, float]]:
+        """
+        Compile each scene into an independently renderable segment.
+
+        A segment starts where the previous segment's outgoing transition ended
+        and owns the overlap with the next scene, so the segments can be joined
+        with the concat demuxer without re-encoding.
+
+        Returns:
+            list: (command arguments, segment path, segment duration) per scene
+        """
+        if not scene_inputs:
+            raise ValueError("At least one scene is required")
+        if output_format == VideoFormat.GIF:
+            raise ValueError("Segmented rendering does not support GIF output")
+
+        background = self._ffmpeg_color(composition_settings.background_color)
+        scenes = [scene for _, scene, _ in scene_inputs]
+        transitions = self._scene_transitions(scenes) + [(0.0, 0.0)]
+        thread_args = ["-threads", str(threads)] if threads else []
+
+        segments = []
+        for index, (path, scene, is_image) in enumerate(scene_inputs):
+            head, fade_in = transitions[index]
+            overlap, fade_out = transitions[index + 1]
+            length = scene.duration - head
+
+            input_args = self._input_args(path, is_image, length, fps, start=head)
+            graph = [self._scene_filter(
+                "0:v", "s0", length, resolution, fps, background, fade_in, fade_out
+            )]
+            label = "s0"
+            input_count = 1
+
+            if overlap:
+                # Render the head of the next scene into this segment's tail
+                next_path, next_scene, next_is_image = scene_inputs[index + 1]
+                input_args.extend(self._input_args(next_path, next_is_image, overlap, fps))
+                graph.append(self._scene_filter(
+                    "1:v", "n0", overlap, resolution, fps, background
+                ))
+                xfade = self.XFADE_TRANSITIONS[scenes[index + 1].transition]
+                graph.append(
+                    f"[s0][n0]xfade=transition={xfade}:"
+                    f"duration={self._format_number(overlap)}:"
+                    f"offset={self._format_number(length - overlap)}[x0]"
+                )
+                label = "x0"
+                input_count = 2
+
+            watermark_index = None
+            if watermark_path:
+                watermark_index = input_count
+                input_args.extend(["-i", str(watermark_path)])
+
+            self._finalize_filters(
+                graph, label, output_format, fps, resolution,
+                composition_settings, watermark_index
+            )
+
+            segment_path = work_dir / f"segment_{index:05d}.{output_format.value}"
+            command = [
+                self.ffmpeg_binary, "-hide_banner", "-nostdin", "-y",
+                *input_args,
+                "-filter_complex", ";".join(graph),
+                "-map", "[out]",
+                *self._output_args(output_format, fps),
+                *thread_args,
+                "-progress", "pipe:1", "-nostats",
+                str(segment_path)
+            ]
+            segments.append((command, segment_path, length))
+
+        return segments
+
+    def build_concat_command(
+        self,
+        segment_paths: Sequence[Path],
+        list_path: Path,
+        output_path: Path
+    ) -> List[str]:
+        """Write a concat list and build a stream-copy command that joins the segments."""
+        lines = []
+        for segment_path in segment_paths:
+            escaped = str(segment_path.resolve()).replace("'", "'\\''")
+            lines.append(f"file '{escaped}'")
+        list_path.write_text("\n".join(lines) + "\n")
+
+        command = [
+            self.ffmpeg_binary, "-hide_banner", "-nostdin", "-y",
+            "-f", "concat", "-safe", "0", "-i", str(list_path),
+            "-c", "copy",
+        ]
+        if output_path.suffix in (".mp4", ".mov"):
+            command.extend(["-movflags", "+faststart"])
+        command.append(str(output_path))
+        return command
+
+    @staticmethod
+    def _cache_arguments(command: Sequence[str]) -> List[str]:
+        """Strip a segment command of arguments that do not affect its output."""
+        arguments = []
+        skip = False
+        for argument in command[1:-1]:  # binary and output path
+            if skip:
+                skip = False
+            elif argument == "-threads":
+                skip = True
+            else:
+                arguments.append(argument)
+        return arguments
+
+    async def render_segmented(
+        self,
+        scene_inputs: Sequence[Tuple[Path, SceneData, bool]],
+        output_path: Path,
+        output_format: VideoFormat,
+        resolution: Tuple[int, int],
+        fps: int,
+        composition_settings: CompositionSettings,
+        work_dir: Path,
+        watermark_path: Optional[Path] = None,
+        progress_callback: Optional[callable] = None,
+        progress_range: Tuple[float, float] = (0, 100),
+        segment_cache: Optional["SegmentCache"] = None
+    ) -> Tuple[int, int]:
+        """
+        Render scenes as parallel segments and stitch them with the concat demuxer.
+
+        Segments found in ``segment_cache`` are reused instead of rendered,
+        and newly rendered segments are added to it.
+
+        Returns:
+            tuple: (segments served from the cache, total segments)
+        """
+        workers = settings.render_segment_workers or os.cpu_count() or 1
+        workers = max(1, min(workers, len(scene_inputs)))
+        # Split the CPU between concurrently running encoders
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+        segments = self.build_segment_commands(
+            scene_inputs, work_dir, output_format, resolution, fps,
+            composition_settings, watermark_path, threads
+        )
+        total_duration = sum(duration for _, _, duration in segments) or 1.0
+        rendered = [0.0] * len(segments)
+        start, end = progress_range
+        semaphore = asyncio.Semaphore(workers)
+
+        keys: List[Optional[str]] = [None] * len(segments)
+        cached = [False] * len(segments)
+        if segment_cache and segment_cache.enabled:
+            input_paths = [path for path, _, _ in scene_inputs]
+            if watermark_path:
+                input_paths.append(watermark_path)
+            digests = {
+                str(path): await segment_cache.digest(path) for path in set(input_paths)
+            }
+            for index, (command, segment_path, duration) in enumerate(segments):
+                keys[index] = segment_cache.key(self._cache_arguments(command), digests)
+                cached[index] = await segment_cache.get(keys[index], segment_path)
+                if cached[index]:
+                    rendered[index] = duration
+
+        def segment_progress(index: int, duration: float):
+            async def report(message: str, fraction: float):
+                rendered[index] = fraction * duration
+                if progress_callback:
+                    overall = sum(rendered) / total_duration
+                    await progress_callback("Rendering segments", start + (end - start) * overall)
+            return report
+
+        async def render_segment(index: int, command: List[str], segment_path: Path, duration: float):
+            async with semaphore:
+                await self.run(
+                    command, duration, segment_progress(index, duration),
+                    progress_range=(0, 1)
+                )
+            if keys[index]:
+                await segment_cache.put(keys[index], segment_path)
+
+        tasks = [
+            asyncio.create_task(render_segment(index, command, segment_path, duration))
+            for index, (command, segment_path, duration) in enumerate(segments)
+            if not cached[index]
+        ]
+        try:
+            if tasks:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in tasks:
+                if task.done() and not task.cancelled() and task.exception():
+                    raise task.exception()
+        finally:
+            # On failure or cancellation, stop the other segments and wait for
+            # their ffmpeg processes to exit before the caller removes work_dir
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if progress_callback:
+            await progress_callback("Joining segments", end)
+
+        concat_command = self.build_concat_command(
+            [segment_path for _, segment_path, _ in segments],
+            work_dir / "segments.txt",
+            output_path
+        )
+        await self.run(concat_command, total_duration)
+
+        hits = sum(cached)
+        if segment_cache and segment_cache.enabled and hits < len(segments):
+            await segment_cache.evict()
+        return hits, len(segments)
+
+    async def run(
+        self,
+        command: List[str],
+        total_duration: float,
+        progress_callback: Optional[callable] = None,
+        progress_range: Tuple[float, float] = (0, 100)
+    ) -> None:
+        """
+        Run an ffmpeg command, reporting progress from ``-progress`` output.
+
+        Raises:
+            ValueError: If ffmpeg exits with a non-zero status
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        async def read_progress():
+            start, end = progress_range
+            while line := await process.stdout.readline():
+                key, _, value = line.decode(errors="ignore").strip().partition("=")
+                if key != "out_time_us" or not progress_callback or total_duration <= 0:
+                    continue
+                try:
+                    rendered = int(value) / 1_000_000
+                except ValueError:
+                    continue
+                fraction = min(max(rendered / total_duration, 0.0), 1.0)
+                await progress_callback("Rendering with ffmpeg", start + (end - start) * fraction)
+
+        try:
+            _, stderr = await asyncio.gather(read_progress(), process.stderr.read())
+            return_code = await process.wait()
+        except BaseException:
+            # Cancelled (job timeout, shutdown, failed sibling segment) or the
+            # progress callback failed: do not leave ffmpeg rendering unattended
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+
+        if return_code != 0:
+            # The tail of stderr carries the actual ffmpeg error
+            error_tail = stderr.decode(errors="ignore").strip().splitlines()[-5:]
+            raise ValueError(f"ffmpeg exited with code {return_code}: {' '.join(error_tail)}")
@@ -2,6 +2,7 @@
 File upload and management service.
 """
 
+import asyncio
 import hashlib
 import json
 import mimetypes
@@ -17,9 +18,12 @@ from PIL import Image
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.api_keys import api_key_index
 from core.settings import settings
 from models.api import FileInfo, FileType
 from models.database import UploadedFile
+from services.blob_store import BlobStore
+from services.media_probe import media_probe
 
 
 class FileService:
@@ -56,6 +60,8 @@ class FileService:
     def __init__(self):
         self.upload_dir = settings.upload_dir
         self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.media_probe = media_probe
+        self.blob_store = BlobStore(self.upload_dir)
     
     def _get_file_type(self, filename: str, mime_type: str) -> Optional[FileType]:
         """Determine file type from filename and MIME type."""
@@ -109,26 +115,50 @@ class FileService:
             'original_filename': upload_file.filename
         }
     
-    async def _save_file(self, upload_file: UploadFile, file_id: str, api_key: str) -> Path:
-        """Save uploaded file to disk."""
-        # Create directory structure: uploads/{api_key_hash}/{date}/{file_id}
-        api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
-        date_str = datetime.utcnow().strftime('%Y-%m-%d')
+    async def _save_file(
+        self,
+        upload_file: UploadFile,
+        file_id: str,
+        max_size: int
+    ) -> Tuple[Path, str, str, int]:
+        """
+        Copy a parsed upload to a staging path, hashing it in the same pass.
         
-        file_dir = self.upload_dir / api_key_hash / date_str
-        file_dir.mkdir(parents=True, exist_ok=True)
+        The request body has already been received and size-checked by the
+        upload endpoint; this enforces the per-type limit on the file itself.
+        
+        Returns:
+            tuple: (temp_path, md5_hash, sha256_hash, file_size)
         
-        # Generate unique filename
+        Raises:
+            HTTPException: If the upload grows beyond max_size
+        """
         extension = Path(upload_file.filename).suffix.lower()
-        filename = f"{file_id}{extension}"
-        file_path = file_dir / filename
+        file_path = self.blob_store.temp_path(f"{file_id}{extension}")
         
-        # Save file
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await upload_file.read()
-            await f.write(content)
+        # Save file in fixed-size chunks so memory use does not grow with the upload
+        md5_hash = hashlib.md5()
+        sha256_hash = hashlib.sha256()
+        file_size = 0
         
-        return file_path
+        try:
+            async with aiofiles.open(file_path, 'wb') as f:
+                while chunk := await upload_file.read(settings.upload_chunk_size):
+                    file_size += len(chunk)
+                    if file_size > max_size:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File too large. Maximum size: {max_size} bytes"
+                        )
+                    md5_hash.update(chunk)
+                    sha256_hash.update(chunk)
+                    await f.write(chunk)
+        except BaseException:
+            # Remove the partial file on size violations and I/O errors
+            file_path.unlink(missing_ok=True)
+            raise
+        
+        return file_path, md5_hash.hexdigest(), sha256_hash.hexdigest(), file_size
     
     async def _get_file_metadata(self, file_path: Path, file_type: FileType) -> Dict:
         """Extract metadata from uploaded file."""
@@ -151,55 +181,43 @@ class FileService:
     async def _get_image_metadata(self, file_path: Path) -> Dict:
         """Extract image metadata."""
         try:
-            with Image.open(file_path) as img:
-                return {
-                    'width': img.width,
-                    'height': img.height,
-                    'format': img.format,
-                    'mode': img.mode
-                }
+            return await asyncio.to_thread(self._read_image_metadata, file_path)
         except Exception:
             return {}
     
+    @staticmethod
+    def _read_image_metadata(file_path: Path) -> Dict:
+        with Image.open(file_path) as img:
+            return {
+                'width': img.width,
+                'height': img.height,
+                'format': img.format,
+                'mode': img.mode
+            }
+    
+    async def _find_metadata(self, db: AsyncSession, sha256_hash: str) -> Optional[Dict]:
+        """Reuse metadata extracted for an earlier upload of the same content."""
+        existing = await db.scalar(
+            select(UploadedFile.metadata_json)
+            .where(UploadedFile.sha256_hash == sha256_hash)
+            .limit(1)
+        )
+        return json.loads(existing) if existing else None
+    
     async def _get_video_metadata(self, file_path: Path) -> Dict:
-        """Extract video metadata using moviepy."""
+        """Extract video metadata using ffprobe."""
         try:
-            from moviepy.editor import VideoFileClip
-            
-            with VideoFileClip(str(file_path)) as clip:
-                return {
-                    'width': clip.w,
-                    'height': clip.h,
-                    'duration': clip.duration,
-                    'fps': clip.fps
-                }
+            return await self.media_probe.probe(file_path)
         except Exception:
             return {}
     
     async def _get_audio_metadata(self, file_path: Path) -> Dict:
-        """Extract audio metadata."""
+        """Extract audio metadata using ffprobe."""
         try:
-            from moviepy.editor import AudioFileClip
-            
-            with AudioFileClip(str(file_path)) as clip:
-                return {
-                    'duration': clip.duration
-                }
+            return await self.media_probe.probe(file_path)
         except Exception:
             return {}
     
-    async def _calculate_file_hashes(self, file_path: Path) -> Tuple[str, str]:
-        """Calculate MD5 and SHA256 hashes for file integrity."""
-        md5_hash = hashlib.md5()
-        sha256_hash = hashlib.sha256()
-        
-        async with aiofiles.open(file_path, 'rb') as f:
-            while chunk := await f.read(8192):
-                md5_hash.update(chunk)
-                sha256_hash.update(chunk)
-        
-        return md5_hash.hexdigest(), sha256_hash.hexdigest()
-    
     async def upload_file(
         self,
         db: AsyncSession,
@@ -223,26 +241,36 @@ class FileService:
         # Generate file ID
         file_id = str(uuid.uuid4())
         
-        # Save file to disk
-        file_path = await self._save_file(upload_file, file_id, api_key)
+        # Copy the file in chunks, enforcing the size limit for its type
+        max_size = min(settings.upload_max_size, self.SUPPORTED_TYPES[file_type]['max_size'])
+        temp_path, md5_hash, sha256_hash, file_size = await self._save_file(
+            upload_file, file_id, max_size
+        )
         
+        blob = None
+        blob_created = False
         try:
-            # Get file metadata
-            metadata = await self._get_file_metadata(file_path, file_type)
+            # Store content once; repeated uploads only take another reference
+            blob, blob_created = await self.blob_store.acquire(
+                db, temp_path, sha256_hash, file_size
+            )
+            file_path = Path(blob.file_path)
             
-            # Calculate file hashes
-            md5_hash, sha256_hash = await self._calculate_file_hashes(file_path)
+            # Get file metadata
+            metadata = None if blob_created else await self._find_metadata(db, sha256_hash)
+            if metadata is None:
+                metadata = await self._get_file_metadata(file_path, file_type)
             
             # Create database record
             db_file = UploadedFile(
                 id=file_id,
-                api_key=hashlib.sha256(api_key.encode()).hexdigest()[:16],
-                filename=file_path.name,
+                api_key=api_key_index.context(api_key).tenant_id,
+                filename=f"{file_id}{temp_path.suffix}",
                 original_filename=validation_info['original_filename'],
                 file_path=str(file_path),
                 file_type=file_type,
                 mime_type=validation_info['mime_type'],
-                file_size=file_path.stat().st_size,
+                file_size=file_size,
                 metadata_json=json.dumps(metadata) if metadata else None,  # Changed from metadata
                 width=metadata.get('width'),
                 height=metadata.get('height'),
@@ -272,11 +300,14 @@ class FileService:
             )
             
         except Exception as e:
-            # Clean up file if database operation fails
-            try:
-                file_path.unlink()
-            except:
-                pass
+            # Undo the blob reference; remove the blob only if this upload created it
+            await db.rollback()
+            temp_path.unlink(missing_ok=True)
+            if blob_created:
+                try:
+                    await self.blob_store.discard(db, blob)
+                except Exception:
+                    pass
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to process uploaded file: {str(e)}"
@@ -321,12 +352,10 @@ class FileService:
     
     async def get_file(self, db: AsyncSession, file_id: str, api_key: str) -> Optional[UploadedFile]:
         """Get file information by ID and API key."""
-        api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
-        
         result = await db.execute(
             select(UploadedFile).where(
                 UploadedFile.id == file_id,
-                UploadedFile.api_key == api_key_hash
+                UploadedFile.api_key == api_key_index.context(api_key).tenant_id
             )
         )
         
@@ -354,18 +383,20 @@ class FileService:
         if not file_record:
             return False
         
-        # Delete physical file
-        try:
-            file_path = Path(file_record.file_path)
-            if file_path.exists():
-                file_path.unlink()
-        except Exception:
-            pass  # Continue even if file deletion fails
+        # Release the blob, deleting it once no other file references it
+        sha256_hash = file_record.sha256_hash
+        released = await self.blob_store.release(db, sha256_hash, file_record.file_path)
         
         # Delete database record
         await db.delete(file_record)
         await db.commit()
         
+        if released:
+            try:
+                await self.blob_store.purge(db, sha256_hash, released)
+            except Exception:
+                pass  # Continue even if file deletion fails
+        
         return True
     
     async def cleanup_expired_files(self, db: AsyncSession):
@@ -376,12 +407,13 @@ class FileService:
             )
         )
         
+        released = []
         for file_record in expired_files.scalars():
             try:
-                # Delete physical file
-                file_path = Path(file_record.file_path)
-                if file_path.exists():
-                    file_path.unlink()
+                # Release the blob, deleting it once no other file references it
+                path = await self.blob_store.release(db, file_record.sha256_hash, file_record.file_path)
+                if path:
+                    released.append((file_record.sha256_hash, path))
                 
                 # Delete database record
                 await db.delete(file_record)
@@ -391,6 +423,13 @@ class FileService:
                 logging.warning(f"Failed to clean up expired file {file_record.id}: {e}")
         
         await db.commit()
+        
+        for sha256_hash, path in released:
+            try:
+                await self.blob_store.purge(db, sha256_hash, path)
+            except Exception as e:
+                import logging
+                logging.warning(f"Failed to remove expired file {path}: {e}")
     
     def get_supported_formats(self) -> Dict:
         """Get information about supported file formats."""
@@ -0,0 +1,556 @@
+"""
+Redis-backed job queue shared by API and worker processes.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from redis.asyncio import Redis
+
+from core.api_keys import api_key_index
+from core.redis import redis_manager
+from core.settings import settings
+from models.api import JobPriority, RenderCostEstimate
+
+# Base scheduling order, highest priority first
+PRIORITY_ORDER = (JobPriority.URGENT, JobPriority.HIGH, JobPriority.NORMAL)
+
+# Layout, per priority <p> under the queue prefix:
+#   <p>:tenant:<tenant>  list of job payloads for one tenant (oldest at the right)
+#   <p>:tenants          zset of tenants with waiting jobs, scored by pass value
+#   <p>:passes           hash of pass values for tenants that went idle
+#   <p>:weights          hash of tenant weights
+#   <p>:vtime            pass value of the last dispatched job
+#   <p>:waiting          zset of waiting job IDs scored by enqueue time (ms)
+#   <p>:cost             estimated CPU-seconds of waiting work
+# and, per tenant <t>:
+#   active:<t>           set of the tenant's queued and processing job IDs
+#
+# Tenants within a priority are served by stride scheduling: the tenant with
+# the lowest pass goes next and its pass then advances by 1 / weight, so each
+# tenant's share of dispatches is proportional to its weight no matter how
+# many jobs it has queued. Keys are derived from the prefix inside the
+# scripts, so the queue needs a single (non-cluster) Redis.
+PUSH_LUA = """
+local function push(prefix, priority, tenant, job_id, payload, now, weight, front)
+    local base = prefix .. ':' .. priority
+    local list = base .. ':tenant:' .. tenant
+    if front then
+        redis.call('RPUSH', list, payload)
+    else
+        redis.call('LPUSH', list, payload)
+    end
+    redis.call('ZADD', base .. ':waiting', now, job_id)
+    redis.call('INCRBYFLOAT', base .. ':cost', cjson.decode(payload)['cost'] or 0)
+    if weight then
+        redis.call('HSET', base .. ':weights', tenant, weight)
+    end
+    if not redis.call('ZSCORE', base .. ':tenants', tenant) then
+        -- Returning tenants resume at the current virtual time, without
+        -- credit for the time they were idle
+        local vtime = tonumber(redis.call('GET', base .. ':vtime') or '0')
+        local last = tonumber(redis.call('HGET', base .. ':passes', tenant) or '0')
+        redis.call('ZADD', base .. ':tenants', math.max(vtime, last), tenant)
+        redis.call('HDEL', base .. ':passes', tenant)
+    end
+end
+"""
+
+# Admission against the tenant's active job limit happens in the same call,
+# so concurrent submissions cannot exceed it. Returns 0 if the tenant is at
+# its limit.
+# ARGV: prefix, priority, tenant, job id, payload, now (ms), weight,
+#       active job limit (0 = unlimited)
+ENQUEUE_SCRIPT = PUSH_LUA + """
+local active = ARGV[1] .. ':active:' .. ARGV[3]
+local limit = tonumber(ARGV[8])
+if limit > 0 and redis.call('SISMEMBER', active, ARGV[4]) == 0
+    and redis.call('SCARD', active) >= limit then
+    return 0
+end
+redis.call('SADD', active, ARGV[4])
+push(ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5], ARGV[6], ARGV[7], false)
+return 1
+"""
+
+# Rank the allowed priorities by level (aged by waiting time), then take the
+# oldest job of the first tenant in stride order whose next job fits the
+# worker's remaining budget, move it onto the worker's processing list and
+# record the lease. Tenants whose next job is too large are passed over
+# without losing their place, so a partially busy worker still picks up
+# smaller work from other tenants or lower priorities, and the large job
+# goes to the next worker with enough headroom.
+# KEYS: processing list, leases zset, lease owners hash
+# ARGV: prefix, now (ms), aging (ms), lease expiry (ms), worker id,
+#       max cost, max memory (negative = unlimited),
+#       then (priority, base level) pairs for the priorities allowed
+CLAIM_SCRIPT = """
+local prefix, now, aging = ARGV[1], tonumber(ARGV[2]), tonumber(ARGV[3])
+local max_cost, max_memory = tonumber(ARGV[6]), tonumber(ARGV[7])
+local ranked = {}
+for i = 8, #ARGV, 2 do
+    local oldest = redis.call('ZRANGE', prefix .. ':' .. ARGV[i] .. ':waiting', 0, 0, 'WITHSCORES')
+    if oldest[2] then
+        local level = tonumber(ARGV[i + 1])
+        if aging > 0 then
+            level = level + math.floor((now - tonumber(oldest[2])) / aging)
+        end
+        table.insert(ranked, {priority = ARGV[i], level = level, order = i})
+    end
+end
+-- Ties go to the priority listed first
+table.sort(ranked, function(a, b)
+    if a.level ~= b.level then
+        return a.level > b.level
+    end
+    return a.order < b.order
+end)
+
+for _, entry in ipairs(ranked) do
+    local base = prefix .. ':' .. entry.priority
+    local tenants = redis.call('ZRANGE', base .. ':tenants', 0, -1, 'WITHSCORES')
+    if not tenants[1] then
+        -- Waiting entries without a tenant queue are stale
+        redis.call('DEL', base .. ':waiting')
+    end
+    for t = 1, #tenants, 2 do
+        local tenant, pass = tenants[t], tonumber(tenants[t + 1])
+        local list = base .. ':tenant:' .. tenant
+        local next_job = redis.call('LINDEX', list, -1)
+        if not next_job then
+            -- Stale tenant entry
+            redis.call('ZREM', base .. ':tenants', tenant)
+            redis.call('HSET', base .. ':passes', tenant, pass)
+        else
+            local message = cjson.decode(next_job)
+            if (max_cost < 0 or (message['cost'] or 0) <= max_cost)
+                and (max_memory < 0 or (message['memory'] or 0) <= max_memory) then
+                local payload = redis.call('LMOVE', list, KEYS[1], 'RIGHT', 'LEFT')
+                local weight = tonumber(redis.call('HGET', base .. ':weights', tenant) or '1')
+                local next_pass = pass + 1 / math.max(weight, 0.001)
+                if redis.call('LLEN', list) > 0 then
+                    redis.call('ZADD', base .. ':tenants', next_pass, tenant)
+                else
+                    redis.call('ZREM', base .. ':tenants', tenant)
+                    redis.call('HSET', base .. ':passes', tenant, next_pass)
+                end
+                redis.call('SET', base .. ':vtime', pass)
+                local job_id = message['job_id']
+                redis.call('ZREM', base .. ':waiting', job_id)
+                redis.call('INCRBYFLOAT', base .. ':cost', -(message['cost'] or 0))
+                redis.call('ZADD', KEYS[2], ARGV[4], job_id)
+                redis.call('HSET', KEYS[3], job_id, ARGV[5])
+                return payload
+            end
+        end
+    end
+end
+return false
+"""
+
+# Extend an expired lease so only one reaper handles it; returns the owner.
+# KEYS: leases zset, lease owners hash
+# ARGV: job id, now (ms), new expiry (ms)
+TAKEOVER_SCRIPT = """
+local expiry = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not expiry or tonumber(expiry) > tonumber(ARGV[2]) then
+    return false
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return redis.call('HGET', KEYS[2], ARGV[1]) or ''
+"""
+
+# Drop a job from a processing list and its lease, optionally putting it back
+# at the head of its tenant's queue. Jobs not requeued stop counting
+# towards their tenant's active job limit.
+# KEYS: processing list, leases zset, lease owners hash
+# ARGV: job id, prefix[, priority, tenant, payload, now (ms)]
+RELEASE_SCRIPT = PUSH_LUA + """
+for _, payload in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+    local ok, message = pcall(cjson.decode, payload)
+    if ok and message['job_id'] == ARGV[1] then
+        redis.call('LREM', KEYS[1], 1, payload)
+        if not ARGV[3] and message['tenant'] then
+            redis.call('SREM', ARGV[2] .. ':active:' .. message['tenant'], ARGV[1])
+        end
+        break
+    end
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+if ARGV[3] then
+    push(ARGV[2], ARGV[3], ARGV[4], ARGV[1], ARGV[5], ARGV[6], false, true)
+end
+return 1
+"""
+
+
+@dataclass
+class LeasedJob:
+    """A job taken from the queue and held under a lease until acknowledged."""
+
+    job_id: str
+    priority: JobPriority
+    payload: str
+    cost: float = 0
+    memory: int = 0
+
+
+class JobQueue:
+    """
+    Fair, per-priority queues of jobs waiting for a worker.
+
+    Within a priority, tenants (API keys) are served in proportion to their
+    weight. Across priorities, higher priorities go first, but a waiting job
+    gains one priority level per ``job_aging_seconds`` so lower priorities
+    cannot starve.
+
+    Dequeued jobs are moved onto the worker's processing list and leased;
+    the worker renews the lease while it renders and acknowledges the job
+    when done. Leases that expire are reclaimed by ``take_expired_lease``.
+    """
+
+    @staticmethod
+    def tenant_id(api_key: str) -> str:
+        """Get the opaque tenant ID used in queue keys for an API key."""
+        return api_key_index.context(api_key).tenant_id
+
+    @staticmethod
+    def tenant_weight(api_key: str) -> float:
+        """Get the scheduling weight configured for an API key."""
+        return api_key_index.context(api_key).weight
+
+    @staticmethod
+    def active_job_limit(api_key: str) -> int:
+        """Get how many queued and processing jobs an API key may have (0 = unlimited)."""
+        return api_key_index.context(api_key).active_job_limit
+
+    @staticmethod
+    def _active_name(tenant: str) -> str:
+        return f"{settings.job_queue_prefix}:active:{tenant}"
+
+    @staticmethod
+    def _base(priority: JobPriority) -> str:
+        return f"{settings.job_queue_prefix}:{JobPriority(priority).value}"
+
+    @staticmethod
+    def processing_name(worker_id: str) -> str:
+        """Get the Redis key for a worker's processing list."""
+        return f"{settings.job_queue_prefix}:processing:{worker_id}"
+
+    @property
+    def leases_name(self) -> str:
+        return f"{settings.job_queue_prefix}:leases"
+
+    @property
+    def owners_name(self) -> str:
+        return f"{settings.job_queue_prefix}:lease_owners"
+
+    @property
+    def workers_name(self) -> str:
+        return f"{settings.job_queue_prefix}:workers"
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+    @staticmethod
+    def _lease_expiry() -> int:
+        return JobQueue._now_ms() + settings.job_lease_timeout * 1000
+
+    async def _client(self) -> Redis:
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        return redis_manager.redis
+
+    def payload(
+        self,
+        job_id: str,
+        priority: JobPriority,
+        api_key: str,
+        estimate: Optional[RenderCostEstimate] = None
+    ) -> Dict:
+        """Build the queue message for a job."""
+        return {
+            "job_id": job_id,
+            "priority": JobPriority(priority).value,
+            "tenant": self.tenant_id(api_key),
+            "cost": estimate.cpu_seconds if estimate else 0,
+            "memory": estimate.memory_bytes if estimate else 0,
+            "enqueued_at": time.time(),
+        }
+
+    async def enqueue(
+        self,
+        job_id: str,
+        priority: JobPriority,
+        api_key: str,
+        estimate: Optional[RenderCostEstimate] = None
+    ) -> bool:
+        """
+        Add a job to its tenant's queue within its priority.
+
+        Returns:
+            bool: False if the API key is at its active job limit and the job was not queued
+        """
+        client = await self._client()
+        message = self.payload(job_id, priority, api_key, estimate)
+        return bool(await client.eval(
+            ENQUEUE_SCRIPT, 0,
+            settings.job_queue_prefix, message["priority"], message["tenant"], job_id,
+            json.dumps(message), self._now_ms(), self.tenant_weight(api_key),
+            self.active_job_limit(api_key)
+        ))
+
+    async def enqueue_many(
+        self,
+        jobs: Sequence[Tuple[str, JobPriority, str, Optional[RenderCostEstimate]]]
+    ) -> List[bool]:
+        """
+        Add several jobs to the queue in one round-trip.
+
+        Jobs are admitted in order until their API key reaches its active
+        job limit.
+
+        Args:
+            jobs: (job_id, priority, api_key, estimate) for each job
+
+        Returns:
+            list: Whether each job was queued
+        """
+        client = await self._client()
+        now = self._now_ms()
+        async with client.pipeline(transaction=False) as pipe:
+            for job_id, priority, api_key, estimate in jobs:
+                message = self.payload(job_id, priority, api_key, estimate)
+                pipe.eval(
+                    ENQUEUE_SCRIPT, 0,
+                    settings.job_queue_prefix, message["priority"], message["tenant"], job_id,
+                    json.dumps(message), now, self.tenant_weight(api_key),
+                    self.active_job_limit(api_key)
+                )
+            return [bool(queued) for queued in await pipe.execute()]
+
+    async def lease(
+        self,
+        worker_id: str,
+        timeout: float = 0,
+        priorities: Optional[Sequence[JobPriority]] = None,
+        max_cost: Optional[float] = None,
+        max_memory: Optional[int] = None
+    ) -> Optional[LeasedJob]:
+        """
+        Take the next scheduled job under a lease.
+
+        Args:
+            worker_id: Worker that will hold the lease
+            timeout: Seconds to keep polling while no job is available
+            priorities: Restrict to these priorities (default: all)
+            max_cost: Only take jobs whose estimated CPU-seconds fit; larger
+                ones are passed over for the next tenant's or priority's
+            max_memory: Only take jobs whose estimated memory fits
+        """
+        allowed = set(priorities or PRIORITY_ORDER)
+        levels = []
+        for level, priority in enumerate(reversed(PRIORITY_ORDER)):
+            if priority in allowed:
+                levels.extend([priority.value, level])
+
+        client = await self._client()
+        deadline = time.monotonic() + timeout
+        while True:
+            payload = await client.eval(
+                CLAIM_SCRIPT, 3,
+                self.processing_name(worker_id), self.leases_name, self.owners_name,
+                settings.job_queue_prefix, self._now_ms(), settings.job_aging_seconds * 1000,
+                self._lease_expiry(), worker_id,
+                -1 if max_cost is None else max_cost,
+                -1 if max_memory is None else max_memory,
+                *levels
+            )
+            if payload:
+                message = json.loads(payload)
+                return LeasedJob(
+                    job_id=message["job_id"],
+                    priority=JobPriority(message.get("priority", JobPriority.NORMAL)),
+                    payload=payload,
+                    cost=message.get("cost", 0),
+                    memory=message.get("memory", 0)
+                )
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(settings.worker_poll_interval, remaining))
+
+    async def renew(self, job_ids: List[str]) -> None:
+        """Extend the leases of jobs that are still being rendered."""
+        if not job_ids:
+            return
+        client = await self._client()
+        expiry = self._lease_expiry()
+        await client.zadd(self.leases_name, {job_id: expiry for job_id in job_ids}, xx=True)
+
+    async def ack(self, worker_id: str, job: LeasedJob) -> None:
+        """Remove a finished job from the processing list, its lease and its tenant's active jobs."""
+        client = await self._client()
+        tenant = json.loads(job.payload).get("tenant")
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_name(worker_id), 1, job.payload)
+            pipe.zrem(self.leases_name, job.job_id)
+            pipe.hdel(self.owners_name, job.job_id)
+            if tenant:
+                pipe.srem(self._active_name(tenant), job.job_id)
+            await pipe.execute()
+
+    async def expired_leases(self) -> List[str]:
+        """Get IDs of jobs whose lease has expired."""
+        client = await self._client()
+        return await client.zrangebyscore(self.leases_name, "-inf", self._now_ms())
+
+    async def take_expired_lease(self, job_id: str) -> Optional[str]:
+        """
+        Take over an expired lease so no other reaper handles the job.
+
+        Returns:
+            str: ID of the worker that held the lease, or None if it is not expired
+        """
+        client = await self._client()
+        return await client.eval(
+            TAKEOVER_SCRIPT, 2, self.leases_name, self.owners_name,
+            job_id, self._now_ms(), self._lease_expiry()
+        )
+
+    async def release(
+        self,
+        job_id: str,
+        owner: str,
+        requeue_priority: Optional[JobPriority] = None,
+        api_key: Optional[str] = None,
+        estimate: Optional[RenderCostEstimate] = None
+    ) -> None:
+        """
+        Drop a reclaimed job from its former worker, optionally requeueing it.
+
+        Requeued jobs go to the head of their tenant's queue so they are retried next.
+        """
+        client = await self._client()
+        args = [job_id, settings.job_queue_prefix]
+        if requeue_priority is not None and api_key is not None:
+            message = self.payload(job_id, requeue_priority, api_key, estimate)
+            args.extend([
+                message["priority"], message["tenant"], json.dumps(message), self._now_ms()
+            ])
+        await client.eval(
+            RELEASE_SCRIPT, 3,
+            self.processing_name(owner), self.leases_name, self.owners_name,
+            *args
+        )
+
+    async def stats(self, tenant: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Get queue depth and waiting times per priority and tenant.
+
+        Args:
+            tenant: Only break down this tenant's jobs (every tenant if None)
+
+        Returns:
+            dict: Priority value to depth, oldest wait and per-tenant breakdown
+        """
+        client = await self._client()
+        now = time.time()
+        stats = {}
+        for priority in PRIORITY_ORDER:
+            base = self._base(priority)
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.zcard(f"{base}:waiting")
+                pipe.zrange(f"{base}:waiting", 0, 0, withscores=True)
+                if tenant is None:
+                    pipe.zrange(f"{base}:tenants", 0, -1, withscores=True)
+                else:
+                    pipe.zscore(f"{base}:tenants", tenant)
+                depth, oldest, tenants = await pipe.execute()
+            if tenant is not None:
+                tenants = [(tenant, tenants)] if tenants is not None else []
+
+            tenant_stats = {}
+            if tenants:
+                async with client.pipeline(transaction=False) as pipe:
+                    for name, _ in tenants:
+                        pipe.llen(f"{base}:tenant:{name}")
+                        pipe.lindex(f"{base}:tenant:{name}", -1)
+                    results = await pipe.execute()
+                for index, (name, pass_value) in enumerate(tenants):
+                    tenant_depth, head = results[2 * index], results[2 * index + 1]
+                    enqueued_at = json.loads(head)["enqueued_at"] if head else now
+                    tenant_stats[name] = {
+                        "depth": tenant_depth,
+                        "oldest_wait": round(max(0.0, now - enqueued_at), 3),
+                        "virtual_time": pass_value,
+                    }
+
+            stats[priority.value] = {
+                "depth": depth,
+                "oldest_wait": round(max(0.0, now - oldest[0][1] / 1000), 3) if oldest else 0.0,
+                "tenants": tenant_stats,
+            }
+        return stats
+
+    async def register_worker(self, worker_id: str, cores: int) -> None:
+        """Record a live worker and its CPU capacity for queue ETAs."""
+        client = await self._client()
+        await client.hset(
+            self.workers_name, worker_id, json.dumps({"cores": cores, "seen": time.time()})
+        )
+
+    async def unregister_worker(self, worker_id: str) -> None:
+        """Remove a worker that is shutting down."""
+        client = await self._client()
+        await client.hdel(self.workers_name, worker_id)
+
+    async def eta(self, priority: JobPriority) -> Optional[float]:
+        """
+        Estimate how long a newly queued job waits before rendering starts.
+
+        Divides the estimated CPU-seconds queued at the same or higher
+        priority by the CPU cores of live workers.
+
+        Returns:
+            float: Seconds, or None when no workers are running
+        """
+        client = await self._client()
+        ahead = PRIORITY_ORDER[:PRIORITY_ORDER.index(JobPriority(priority)) + 1]
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.workers_name)
+            for queued in ahead:
+                pipe.get(f"{self._base(queued)}:cost")
+            workers, *costs = await pipe.execute()
+
+        cores = 0
+        stale = []
+        cutoff = time.time() - settings.job_lease_timeout
+        for worker_id, info in workers.items():
+            info = json.loads(info)
+            if info["seen"] < cutoff:
+                stale.append(worker_id)
+            else:
+                cores += info["cores"]
+        if stale:
+            await client.hdel(self.workers_name, *stale)
+        if not cores:
+            return None
+
+        backlog = sum(max(0.0, float(cost or 0)) for cost in costs)
+        return round(backlog / cores, 1)
+
+    async def depths(self) -> Dict[str, int]:
+        """Get the number of waiting jobs per priority."""
+        client = await self._client()
+        async with client.pipeline(transaction=False) as pipe:
+            for priority in PRIORITY_ORDER:
+                pipe.zcard(f"{self._base(priority)}:waiting")
+            counts = await pipe.execute()
+        return {priority.value: count for priority, count in zip(PRIORITY_ORDER, counts)}
@@ -3,10 +3,12 @@ Service for job management.
 """
 
 import json
+import uuid
 from datetime import datetime, timedelta
-from typing import List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.api import JobResponse, JobListQuery, JobStatus, JobPriority
@@ -49,6 +51,41 @@ class JobService:
         
         return self._to_job_response(job)
     
+    async def create_jobs(
+        self, db: AsyncSession, api_key: str, jobs: Sequence[Dict[str, Any]]
+    ) -> List[JobResponse]:
+        """
+        Create many job records in one transaction.
+        
+        Each entry takes the keyword arguments of ``create_job``. The jobs
+        are created already queued, ready to be handed to the job queue.
+        """
+        now = datetime.utcnow()
+        records = [
+            Job(
+                id=str(uuid.uuid4()),
+                api_key=api_key,
+                title=entry.get("title") or "Untitled Composition",
+                description=entry.get("description"),
+                composition_config=json.dumps(entry["composition_config"]),
+                priority=entry.get("priority", JobPriority.NORMAL),
+                webhook_url=entry.get("webhook_url"),
+                status=JobStatus.QUEUED,
+                progress=0.0,
+                retry_count=0,
+                max_retries=3,
+                webhook_sent=False,
+                created_at=now,
+                updated_at=now,
+                expires_at=now + timedelta(days=7)
+            )
+            for entry in jobs
+        ]
+        db.add_all(records)
+        await db.commit()
+        
+        return [self._to_job_response(job) for job in records]
+    
     async def get_job(self, db: AsyncSession, job_id: str, api_key: str) -> Optional[JobResponse]:
         """Retrieve a job by ID and API key."""
         result = await db.execute(
@@ -102,6 +139,8 @@ class JobService:
             output_format=job.output_format,
             output_size=job.output_size,
             duration=job.duration,
+            segment_count=job.segment_count,
+            segment_cache_hits=job.segment_cache_hits,
             error_message=job.error_message,
             retry_count=job.retry_count,
             max_retries=job.max_retries,
@@ -145,6 +184,128 @@ class JobService:
             logging.error(f"Failed to update status for job {job_id}: {e}")
             return False
     
+    async def start_job(self, db: AsyncSession, job_id: str) -> Optional[Job]:
+        """
+        Claim a queued job for processing.
+        
+        Returns:
+            Job: The claimed job, or None if it is no longer queued (deleted or cancelled)
+        """
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+            .values(
+                status=JobStatus.PROCESSING,
+                started_at=now,
+                updated_at=now,
+                progress=0.0,
+                current_step="Starting"
+            )
+        )
+        await db.commit()
+        
+        if result.rowcount != 1:
+            return None
+        return await db.get(Job, job_id, populate_existing=True)
+    
+    async def update_progress(
+        self, db: AsyncSession, job_id: str, progress: float, current_step: Optional[str]
+    ) -> None:
+        """Record progress for a processing job."""
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.PROCESSING)
+            .values(progress=progress, current_step=current_step, updated_at=datetime.utcnow())
+        )
+        await db.commit()
+    
+    async def complete_job(
+        self,
+        db: AsyncSession,
+        job_id: str,
+        output_path: Path,
+        output_format: str,
+        duration: Optional[float] = None,
+        render_stats: Optional[Dict[str, int]] = None
+    ) -> None:
+        """Mark a job completed and record its output and render statistics."""
+        render_stats = render_stats or {}
+        now = datetime.utcnow()
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status=JobStatus.COMPLETED,
+                progress=100.0,
+                current_step="Completed",
+                output_file=str(output_path),
+                output_format=output_format,
+                output_size=output_path.stat().st_size,
+                duration=duration,
+                segment_count=render_stats.get("segments"),
+                segment_cache_hits=render_stats.get("segment_cache_hits"),
+                updated_at=now,
+                completed_at=now
+            )
+        )
+        await db.commit()
+    
+    async def fail_job(
+        self,
+        db: AsyncSession,
+        job_id: str,
+        error_message: str,
+        error_details: Optional[str] = None
+    ) -> None:
+        """Mark a job failed and record the error."""
+        now = datetime.utcnow()
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status=JobStatus.FAILED,
+                error_message=error_message,
+                error_details=error_details,
+                updated_at=now,
+                completed_at=now
+            )
+        )
+        await db.commit()
+    
+    async def fail_jobs(
+        self, db: AsyncSession, job_ids: Sequence[str], error_message: str
+    ) -> None:
+        """Mark several jobs failed with the same error."""
+        now = datetime.utcnow()
+        await db.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids))
+            .values(
+                status=JobStatus.FAILED,
+                error_message=error_message,
+                updated_at=now,
+                completed_at=now
+            )
+        )
+        await db.commit()
+    
+    async def requeue_job(self, db: AsyncSession, job_id: str, reason: str) -> None:
+        """Put an interrupted job back in the queued state, counting the retry."""
+        await db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(
+                status=JobStatus.QUEUED,
+                retry_count=Job.retry_count + 1,
+                progress=0.0,
+                current_step=reason,
+                started_at=None,
+                updated_at=datetime.utcnow()
+            )
+        )
+        await db.commit()
+    
     async def delete_job(self, db: AsyncSession, job_id: str, api_key: str) -> bool:
         """Delete a job and all associated resources."""
         try:
@@ -168,6 +329,11 @@ class JobService:
             logging.error(f"Failed to delete job {job_id}: {e}")
             return False
     
+    async def delete_jobs(self, db: AsyncSession, job_ids: Sequence[str]) -> None:
+        """Delete several jobs that never started."""
+        await db.execute(delete(Job).where(Job.id.in_(job_ids)))
+        await db.commit()
+    
     async def cleanup_expired_jobs(self, db: AsyncSession):
         """Clean up expired jobs from the database."""
         expired_jobs = await db.execute(
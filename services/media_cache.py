@@ -0,0 +1,226 @@
+"""
+Persistent on-disk cache for downloaded media sources.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import aiofiles
+import aiohttp
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MediaCache:
+    """
+    Content-addressed download cache with LRU eviction.
+
+    Blobs are stored once per SHA-256 of their content; a small JSON index
+    entry per URL records which blob it resolved to plus the validators
+    (ETag/Last-Modified) used to revalidate it with conditional requests.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.cache_dir = cache_dir or settings.media_cache_dir
+        self.max_bytes = settings.media_cache_max_bytes if max_bytes is None else max_bytes
+        self.blob_dir = self.cache_dir / "blobs"
+        self.index_dir = self.cache_dir / "index"
+        self.tmp_dir = self.cache_dir / "tmp"
+        for directory in (self.blob_dir, self.index_dir, self.tmp_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._eviction_lock = asyncio.Lock()
+
+    @staticmethod
+    def url_key(url: str) -> str:
+        """Get the index key for a URL."""
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def _index_path(self, url: str) -> Path:
+        return self.index_dir / f"{self.url_key(url)}.json"
+
+    def _blob_path(self, content_hash: str, extension: str) -> Path:
+        return self.blob_dir / content_hash[:2] / f"{content_hash}{extension}"
+
+    def get_entry(self, url: str) -> Optional[Dict]:
+        """Get the index entry for a URL if its blob is still cached."""
+        try:
+            entry = json.loads(self._index_path(url).read_text())
+        except (OSError, json.JSONDecodeError):
+            return None
+        if not Path(entry.get("path", "")).exists():
+            return None
+        return entry
+
+    def _save_entry(self, url: str, entry: Dict) -> None:
+        index_path = self._index_path(url)
+        temp_path = index_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temp_path.write_text(json.dumps(entry))
+        os.replace(temp_path, index_path)
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        """Mark a blob as recently used for LRU eviction."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _freshness(headers) -> float:
+        """Get how long a response may be reused without revalidation."""
+        cache_control = headers.get("cache-control", "").lower()
+        directives = [directive.strip() for directive in cache_control.split(",")]
+        if "no-cache" in directives or "no-store" in directives:
+            return 0
+        for directive in directives:
+            if directive.startswith("max-age="):
+                try:
+                    return max(0, int(directive[len("max-age="):]))
+                except ValueError:
+                    break
+        return settings.media_cache_fresh_seconds
+
+    @staticmethod
+    def _extension(url: str, content_type: str) -> str:
+        """Pick a file extension from the content type or URL path."""
+        mime_type = content_type.split(";")[0].strip()
+        extension = mimetypes.guess_extension(mime_type) if mime_type else None
+        if not extension:
+            extension = Path(urlparse(url).path).suffix.lower()
+        return extension or ".tmp"
+
+    async def fetch(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        budget=None
+    ) -> Path:
+        """
+        Get a local path for a URL, downloading or revalidating as needed.
+
+        Args:
+            session: HTTP session used for network requests
+            url: Source URL
+            budget: Optional download budget charged for network bytes
+
+        Returns:
+            Path to the cached blob
+        """
+        entry = self.get_entry(url)
+        now = time.time()
+
+        if entry and now - entry["validated_at"] < entry["fresh_for"]:
+            self._touch(Path(entry["path"]))
+            return Path(entry["path"])
+
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and entry:
+                entry["validated_at"] = now
+                entry["fresh_for"] = self._freshness(response.headers)
+                self._save_entry(url, entry)
+                self._touch(Path(entry["path"]))
+                return Path(entry["path"])
+
+            if response.status != 200:
+                raise ValueError(f"Failed to download from {url}: HTTP {response.status}")
+
+            extension = self._extension(url, response.headers.get("content-type", ""))
+            temp_path = self.tmp_dir / f"{uuid.uuid4().hex}{extension}"
+            sha256_hash = hashlib.sha256()
+            size = 0
+
+            try:
+                async with aiofiles.open(temp_path, "wb") as f:
+                    async for chunk in response.content.iter_chunked(65536):
+                        if budget:
+                            budget.consume(len(chunk))
+                        sha256_hash.update(chunk)
+                        size += len(chunk)
+                        await f.write(chunk)
+            except BaseException:
+                temp_path.unlink(missing_ok=True)
+                raise
+
+            content_hash = sha256_hash.hexdigest()
+            blob_path = self._blob_path(content_hash, extension)
+            if blob_path.exists():
+                # Same content already cached under another URL or version
+                temp_path.unlink(missing_ok=True)
+                self._touch(blob_path)
+            else:
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, blob_path)
+
+            self._save_entry(url, {
+                "url": url,
+                "path": str(blob_path),
+                "content_hash": content_hash,
+                "size": size,
+                "content_type": response.headers.get("content-type"),
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "validated_at": now,
+                "fresh_for": self._freshness(response.headers),
+            })
+
+        await self.evict()
+        return blob_path
+
+    def _evict_sync(self) -> int:
+        """Delete least recently used blobs until the cache fits its budget."""
+        blobs = []
+        total = 0
+        for path in self.blob_dir.rglob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file():
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if not self.max_bytes or total <= self.max_bytes:
+            return 0
+
+        # Blobs used within the job timeout may still be read by a running render
+        protected_since = time.time() - settings.job_timeout
+        freed = 0
+        for mtime, size, path in sorted(blobs):
+            if total - freed <= self.max_bytes or mtime >= protected_since:
+                break
+            try:
+                path.unlink()
+                freed += size
+            except OSError:
+                continue
+        return freed
+
+    async def evict(self) -> int:
+        """Evict least recently used blobs; returns bytes freed."""
+        async with self._eviction_lock:
+            freed = await asyncio.to_thread(self._evict_sync)
+        if freed:
+            logger.info(f"Evicted {freed} bytes from media cache")
+        return freed
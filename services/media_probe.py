@@ -0,0 +1,168 @@
+"""
+Media probing with ffprobe.
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.settings import settings
+
+
+class MediaProbe:
+    """Read stream information with ffprobe instead of opening a decoder."""
+
+    def __init__(self, ffprobe_binary: Optional[str] = None):
+        self.ffprobe_binary = (
+            ffprobe_binary
+            or settings.ffprobe_binary
+            or self.ffprobe_for(settings.ffmpeg_binary)
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @staticmethod
+    def ffprobe_for(ffmpeg_binary: str) -> str:
+        """Get the ffprobe binary that sits next to an ffmpeg binary."""
+        path = Path(ffmpeg_binary)
+        name = path.name.replace("ffmpeg", "ffprobe", 1) if "ffmpeg" in path.name else "ffprobe"
+        if str(path.parent) == ".":
+            return name
+        return str(path.with_name(name))
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Limit concurrently running ffprobe processes."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.probe_max_concurrency)
+        return self._semaphore
+
+    async def _run(self, *args: str) -> Dict[str, Any]:
+        """Run ffprobe with JSON output and parse the result."""
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                self.ffprobe_binary, "-v", "error", "-print_format", "json", *args,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(), timeout=settings.probe_timeout
+                )
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise ValueError(f"ffprobe timed out after {settings.probe_timeout}s")
+
+        if process.returncode != 0:
+            raise ValueError(f"ffprobe failed: {stderr.decode(errors='ignore').strip()}")
+        return json.loads(stdout or b"{}")
+
+    @staticmethod
+    def _parse_rate(rate: Optional[str]) -> Optional[float]:
+        """Parse an ffprobe frame rate such as ``30000/1001``."""
+        if not rate:
+            return None
+        numerator, _, denominator = rate.partition("/")
+        try:
+            value = float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            return None
+        return round(value, 3) if value > 0 else None
+
+    @staticmethod
+    def _parse_number(value: Any, cast=float) -> Optional[Any]:
+        try:
+            return cast(value) if value not in (None, "N/A") else None
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _rotation(cls, stream: Dict[str, Any]) -> int:
+        """Get display rotation from the stream tags or display matrix."""
+        rotation = cls._parse_number(stream.get("tags", {}).get("rotate"), int)
+        if rotation is None:
+            for side_data in stream.get("side_data_list", []):
+                if "rotation" in side_data:
+                    rotation = cls._parse_number(side_data["rotation"], int)
+                    break
+        return (rotation or 0) % 360
+
+    async def _keyframe_interval(self, file_path: Path) -> Optional[float]:
+        """Estimate the keyframe interval from packets in the first seconds of video."""
+        result = await self._run(
+            "-select_streams", "v:0",
+            "-read_intervals", f"%+{settings.probe_keyframe_window}",
+            "-show_entries", "packet=pts_time,flags",
+            str(file_path)
+        )
+        keyframes: List[float] = []
+        for packet in result.get("packets", []):
+            pts_time = self._parse_number(packet.get("pts_time"))
+            if pts_time is not None and "K" in packet.get("flags", ""):
+                keyframes.append(pts_time)
+
+        if len(keyframes) < 2:
+            return None
+        keyframes.sort()
+        return round((keyframes[-1] - keyframes[0]) / (len(keyframes) - 1), 3)
+
+    async def probe(self, file_path: Path) -> Dict[str, Any]:
+        """
+        Probe a media file.
+
+        Returns:
+            dict: Container and stream information; keys for missing streams are omitted
+        """
+        result = await self._run("-show_format", "-show_streams", str(file_path))
+        container = result.get("format", {})
+        streams = result.get("streams", [])
+
+        metadata: Dict[str, Any] = {
+            "format": container.get("format_name"),
+            "duration": self._parse_number(container.get("duration")),
+            "bit_rate": self._parse_number(container.get("bit_rate"), int),
+        }
+
+        video = next(
+            (
+                stream for stream in streams
+                if stream.get("codec_type") == "video"
+                and not stream.get("disposition", {}).get("attached_pic")
+            ),
+            None
+        )
+        if video:
+            metadata.update({
+                "width": video.get("width"),
+                "height": video.get("height"),
+                "video_codec": video.get("codec_name"),
+                "pixel_format": video.get("pix_fmt"),
+                "fps": self._parse_rate(video.get("avg_frame_rate"))
+                or self._parse_rate(video.get("r_frame_rate")),
+                "video_bit_rate": self._parse_number(video.get("bit_rate"), int),
+                "rotation": self._rotation(video),
+            })
+            if metadata["duration"] is None:
+                metadata["duration"] = self._parse_number(video.get("duration"))
+            try:
+                metadata["keyframe_interval"] = await self._keyframe_interval(file_path)
+            except ValueError:
+                metadata["keyframe_interval"] = None
+
+        audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+        if audio:
+            metadata.update({
+                "audio_codec": audio.get("codec_name"),
+                "audio_channels": audio.get("channels"),
+                "sample_rate": self._parse_number(audio.get("sample_rate"), int),
+                "audio_bit_rate": self._parse_number(audio.get("bit_rate"), int),
+            })
+            if metadata["duration"] is None:
+                metadata["duration"] = self._parse_number(audio.get("duration"))
+
+        return {key: value for key, value in metadata.items() if value is not None}
+
+
+# Shared probe so the concurrency limit applies process-wide
+media_probe = MediaProbe()
@@ -0,0 +1,199 @@
+"""
+Live job progress kept in Redis and flushed to the database in batches.
+"""
+
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.events import job_events
+from core.api_keys import api_key_index
+from core.redis import redis_manager
+from core.settings import settings
+from models.api import JobResponse, JobStatus
+from models.database import Job
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FIELDS = ("progress", "current_step", "total_steps", "updated_at")
+
+# Progress columns written by a flush; only processing jobs are touched so a
+# late flush cannot overwrite the outcome of a job that already finished
+_jobs = Job.__table__
+FLUSH_STATEMENT = (
+    update(_jobs)
+    .where(_jobs.c.id == bindparam("b_job_id"), _jobs.c.status == JobStatus.PROCESSING)
+    .values(
+        progress=bindparam("b_progress"),
+        current_step=bindparam("b_current_step"),
+        total_steps=bindparam("b_total_steps"),
+        updated_at=bindparam("b_updated_at"),
+    )
+)
+
+
+class JobProgressStore:
+    """
+    Hot copy of job state for workers to update and pollers to read.
+
+    Each job being rendered has a hash at ``<prefix>:<job_id>`` holding a
+    snapshot of its ``JobResponse`` plus the latest progress fields. Workers
+    write progress there on every callback and mark the job dirty; dirty
+    jobs are written to the ``jobs`` table in one batched UPDATE per flush
+    interval, and immediately before any status transition.
+
+    Every write is also published to the job's event channel: ``progress``
+    events with the progress fields, and on status transitions an event
+    named after the new status (``completed``, ``failed``, ...) carrying
+    the full job.
+    """
+
+    def __init__(self, prefix: Optional[str] = None):
+        self.prefix = prefix or settings.job_progress_prefix
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:{job_id}"
+
+    @property
+    def dirty_name(self) -> str:
+        """Set of jobs with progress not yet written to the database."""
+        return f"{self.prefix}:dirty"
+
+    @staticmethod
+    def _owner(api_key: str) -> str:
+        return api_key_index.context(api_key).key_hash
+
+    async def _client(self) -> Redis:
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        return redis_manager.redis
+
+    async def snapshot(self, job: Job) -> None:
+        """Replace the hot copy of a job, e.g. after a status transition."""
+        redis = await self._client()
+        key = self._key(job.id)
+        response = JobResponse.model_validate(job, from_attributes=True)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={
+                "job": response.model_dump_json(),
+                "owner": self._owner(job.api_key),
+            })
+            pipe.expire(key, settings.job_progress_ttl)
+            pipe.srem(self.dirty_name, job.id)
+            pipe.publish(
+                job_events.channel(job.id),
+                job_events.message(response.status.value, response.model_dump(mode="json"))
+            )
+            await pipe.execute()
+
+    async def record(
+        self,
+        job_id: str,
+        progress: float,
+        current_step: Optional[str] = None,
+        total_steps: Optional[int] = None
+    ) -> None:
+        """Record progress for a running job; it reaches the database on the next flush."""
+        fields = {
+            "progress": progress,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        if current_step is not None:
+            fields["current_step"] = current_step
+        if total_steps is not None:
+            fields["total_steps"] = total_steps
+
+        redis = await self._client()
+        key = self._key(job_id)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, settings.job_progress_ttl)
+            pipe.sadd(self.dirty_name, job_id)
+            pipe.publish(job_events.channel(job_id), job_events.message("progress", fields))
+            await pipe.execute()
+
+    async def get(self, job_id: str, api_key: str) -> Optional[JobResponse]:
+        """
+        Read a job from its hot copy.
+
+        Returns:
+            JobResponse: Current job state, or None if there is no hot copy
+            for this API key (the caller should fall back to the database)
+        """
+        redis = await self._client()
+        data = await redis.hgetall(self._key(job_id))
+        if "job" not in data or data.get("owner") != self._owner(api_key):
+            return None
+
+        job = JobResponse.model_validate_json(data["job"])
+        updates = {field: data[field] for field in PROGRESS_FIELDS if field in data}
+        if not updates:
+            return job
+        return JobResponse.model_validate({**job.model_dump(), **updates})
+
+    async def discard(self, job_id: str) -> None:
+        """Drop the hot copy of a job without flushing it."""
+        redis = await self._client()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._key(job_id))
+            pipe.srem(self.dirty_name, job_id)
+            await pipe.execute()
+
+    async def flush(self, db: AsyncSession, job_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Write pending progress to the database in one batched UPDATE.
+
+        Args:
+            db: Database session
+            job_ids: Flush only these jobs (before a transition); by default
+                up to ``job_progress_flush_batch`` dirty jobs are taken
+
+        Returns:
+            int: Number of jobs written
+        """
+        redis = await self._client()
+        if job_ids is None:
+            job_ids = await redis.spop(self.dirty_name, settings.job_progress_flush_batch) or []
+        else:
+            job_ids = list(job_ids)
+            if job_ids:
+                await redis.srem(self.dirty_name, *job_ids)
+        if not job_ids:
+            return 0
+
+        async with redis.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hmget(self._key(job_id), *PROGRESS_FIELDS)
+            values = await pipe.execute()
+
+        rows = []
+        for job_id, (progress, current_step, total_steps, updated_at) in zip(job_ids, values):
+            if progress is None:
+                continue  # Hot copy expired or discarded
+            rows.append({
+                "b_job_id": job_id,
+                "b_progress": float(progress),
+                "b_current_step": current_step,
+                "b_total_steps": int(total_steps) if total_steps is not None else None,
+                "b_updated_at": datetime.fromisoformat(updated_at),
+            })
+        if not rows:
+            return 0
+
+        try:
+            await db.execute(FLUSH_STATEMENT, rows)
+            await db.commit()
+        except Exception:
+            # Mark the jobs dirty again so the next flush retries them
+            await redis.sadd(self.dirty_name, *[row["b_job_id"] for row in rows])
+            raise
+        return len(rows)
+
+
+# Shared progress store instance
+progress_store = JobProgressStore()
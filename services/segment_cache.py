@@ -0,0 +1,164 @@
+"""
+On-disk cache of rendered scene segments shared between jobs.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when segment encoding changes in a way the command line does not show
+CACHE_FORMAT_VERSION = 1
+
+
+class SegmentCache:
+    """
+    Rendered segments keyed by everything that determines their bytes.
+
+    A segment's key hashes its ffmpeg arguments (trim points, filters,
+    transitions, resolution, fps and encoder settings) with every input
+    path replaced by the SHA-256 of the input's content, so the same scene
+    rendered by different jobs maps to the same entry. Entries are
+    evicted least recently used first once the cache exceeds its budget.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self.cache_dir = cache_dir or settings.segment_cache_dir
+        self.max_bytes = settings.segment_cache_max_bytes if max_bytes is None else max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._eviction_lock = asyncio.Lock()
+        # Content hashes by (path, size, mtime) so sources are read once
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether segments should be cached at all."""
+        return self.max_bytes > 0
+
+    def _entry_path(self, key: str, extension: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{extension}"
+
+    def _digest_sync(self, path: Path) -> str:
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            sha256_hash = hashlib.sha256()
+            with open(path, "rb") as source:
+                while chunk := source.read(1024 * 1024):
+                    sha256_hash.update(chunk)
+            digest = sha256_hash.hexdigest()
+            if len(self._digests) >= 4096:
+                self._digests.clear()
+            self._digests[memo_key] = digest
+        return digest
+
+    async def digest(self, path: Path) -> str:
+        """Get the SHA-256 of a source file's content."""
+        return await asyncio.to_thread(self._digest_sync, path)
+
+    @staticmethod
+    def key(arguments: Sequence[str], digests: Dict[str, str]) -> str:
+        """
+        Derive a cache key from segment encoder arguments.
+
+        Args:
+            arguments: ffmpeg arguments without the binary, output path or
+                thread count
+            digests: Content hash for each input path in the arguments
+        """
+        canonical = [digests.get(argument, argument) for argument in arguments]
+        encoded = json.dumps([CACHE_FORMAT_VERSION, canonical], separators=(",", ":"))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    @staticmethod
+    def _link(source: Path, destination: Path) -> None:
+        """Hard-link a file, copying where links are not possible."""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def _get_sync(self, key: str, destination: Path) -> bool:
+        entry_path = self._entry_path(key, destination.suffix)
+        try:
+            self._link(entry_path, destination)
+        except OSError:
+            return False
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return True
+
+    async def get(self, key: str, destination: Path) -> bool:
+        """
+        Place a cached segment at ``destination``.
+
+        The segment is linked rather than referenced so eviction cannot
+        remove it while a job is joining it.
+
+        Returns:
+            bool: True on a cache hit
+        """
+        return await asyncio.to_thread(self._get_sync, key, destination)
+
+    def _put_sync(self, key: str, segment_path: Path) -> None:
+        entry_path = self._entry_path(key, segment_path.suffix)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = entry_path.with_name(f"{entry_path.name}.{uuid.uuid4().hex}.tmp")
+        self._link(segment_path, temp_path)
+        os.replace(temp_path, entry_path)
+
+    async def put(self, key: str, segment_path: Path) -> None:
+        """Add a freshly rendered segment to the cache."""
+        try:
+            await asyncio.to_thread(self._put_sync, key, segment_path)
+        except OSError as e:
+            logger.warning(f"Failed to cache segment {segment_path.name}: {e}")
+
+    def _evict_sync(self) -> int:
+        """Delete least recently used segments until the cache fits its budget."""
+        entries = []
+        total = 0
+        for path in self.cache_dir.rglob("*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if path.is_file() and not path.name.endswith(".tmp"):
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                freed += size
+            except OSError:
+                continue
+        return freed
+
+    async def evict(self) -> int:
+        """Evict least recently used segments; returns bytes freed."""
+        async with self._eviction_lock:
+            freed = await asyncio.to_thread(self._evict_sync)
+        if freed:
+            logger.info(f"Evicted {freed} bytes from segment cache")
+        return freed
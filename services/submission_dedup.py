@@ -0,0 +1,209 @@
+"""
+Deduplication of repeated composition submissions.
+"""
+
+import hashlib
+import json
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.api_keys import api_key_index
+from core.redis import redis_manager
+from core.settings import settings
+from models.api import VideoCompositionRequest
+from models.database import UploadedFile
+from services.video_service import VideoCompositionService
+
+
+class SubmissionDeduplicator:
+    """
+    Map repeated composition submissions onto the job they first created.
+
+    A submission is identified by a fingerprint of everything that affects
+    the rendered output. Uploaded-file sources are resolved to their content
+    hash so re-uploads of the same file match; URL sources are identified
+    by URL. Fields that do not change the output (scene names, priority,
+    webhook, metadata) are ignored. Fingerprints are scoped per API key and
+    remembered for ``compose_dedup_ttl`` seconds.
+
+    Clients may also send an ``Idempotency-Key``: retries with the same key
+    return the original job for ``idempotency_key_ttl`` seconds, whatever
+    its outcome, and reusing a key for a different request is rejected.
+    A key is only recorded once its submission has a job that was queued
+    or reused, so a refused submission can be retried with the same key.
+    """
+
+    def __init__(self, prefix: Optional[str] = None):
+        self.prefix = prefix or settings.compose_dedup_prefix
+
+    @staticmethod
+    def _owner(api_key: str) -> str:
+        return api_key_index.context(api_key).tenant_id
+
+    def _fingerprint_key(self, api_key: str, fingerprint: str) -> str:
+        return f"{self.prefix}:request:{self._owner(api_key)}:{fingerprint}"
+
+    def _idempotency_key(self, api_key: str, idempotency_key: str) -> str:
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return f"{self.prefix}:idempotency:{self._owner(api_key)}:{digest}"
+
+    async def _client(self) -> Redis:
+        if not redis_manager.redis:
+            await redis_manager.initialize()
+        return redis_manager.redis
+
+    async def _content_hashes(
+        self, db: AsyncSession, api_key: str, request: VideoCompositionRequest
+    ) -> Dict[str, str]:
+        """Resolve uploaded-file sources to their content hashes."""
+        file_ids = {
+            scene.source for scene in request.scenes.values()
+            if not scene.source.startswith(("http://", "https://"))
+        }
+        if not file_ids:
+            return {}
+        result = await db.execute(
+            select(UploadedFile.id, UploadedFile.sha256_hash).where(
+                UploadedFile.id.in_(file_ids),
+                UploadedFile.api_key == self._owner(api_key)
+            )
+        )
+        return {file_id: sha256_hash for file_id, sha256_hash in result.all() if sha256_hash}
+
+    async def fingerprint(
+        self, db: AsyncSession, api_key: str, request: VideoCompositionRequest
+    ) -> str:
+        """Get the canonical hash of the output a request would render."""
+        content_hashes = await self._content_hashes(db, api_key, request)
+        composition_settings = request.composition_settings.model_dump(mode="json")
+        composition_settings["render_engine"] = VideoCompositionService.get_render_engine(
+            request.composition_settings
+        ).value
+        canonical = {
+            "scenes": [
+                {
+                    "source": (
+                        f"sha256:{content_hashes[scene.source]}"
+                        if scene.source in content_hashes else scene.source
+                    ),
+                    "media_type": scene.media_type.value,
+                    "duration": float(scene.duration),
+                    "transition": scene.transition.value,
+                }
+                for scene in request.scenes.values()
+            ],
+            "output_format": request.output_format.value,
+            "quality": request.quality.value,
+            "fps": request.fps,
+            "composition_settings": composition_settings,
+        }
+        encoded = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    async def find(
+        self, api_key: str, fingerprint: str, idempotency_key: Optional[str] = None
+    ) -> Tuple[Optional[str], bool]:
+        """
+        Find the job an earlier identical submission created.
+
+        Returns:
+            tuple: (job_id, replay) where job_id is None for a new submission
+            and replay is True when it was found by idempotency key
+
+        Raises:
+            HTTPException: If the idempotency key was used for a different request
+        """
+        redis = await self._client()
+        if idempotency_key:
+            stored = await redis.get(self._idempotency_key(api_key, idempotency_key))
+            if stored:
+                entry = json.loads(stored)
+                if entry["fingerprint"] != fingerprint:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="Idempotency-Key was already used for a different request"
+                    )
+                return entry["job_id"], True
+        return await redis.get(self._fingerprint_key(api_key, fingerprint)), False
+
+    async def claim(self, api_key: str, fingerprint: str, job_id: str) -> str:
+        """
+        Record a new job for a submission.
+
+        Claims are first-writer-wins, so when identical submissions race
+        all of them settle on one job.
+
+        Returns:
+            str: The job ID that owns the submission; if it is not
+            ``job_id``, the caller's job is a duplicate
+        """
+        redis = await self._client()
+        key = self._fingerprint_key(api_key, fingerprint)
+        if await redis.set(key, job_id, ex=settings.compose_dedup_ttl, nx=True):
+            return job_id
+        return await redis.get(key) or job_id
+
+    async def remember(
+        self, api_key: str, idempotency_key: str, fingerprint: str, job_id: str
+    ) -> str:
+        """
+        Map an idempotency key onto the job that was queued or reused for it.
+
+        Returns:
+            str: The job ID the key maps to, which is an earlier one if a
+            racing request with the same key recorded it first
+        """
+        redis = await self._client()
+        key = self._idempotency_key(api_key, idempotency_key)
+        entry = json.dumps({"job_id": job_id, "fingerprint": fingerprint})
+        if await redis.set(key, entry, ex=settings.idempotency_key_ttl, nx=True):
+            return job_id
+        stored = await redis.get(key)
+        return json.loads(stored)["job_id"] if stored else job_id
+
+    async def _delete_if(self, key: str, matches: Callable[[str], bool]) -> None:
+        """Delete a key unless it was changed to a value ``matches`` rejects."""
+        redis = await self._client()
+        async with redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(key)
+                stored = await pipe.get(key)
+                if stored is None or not matches(stored):
+                    return
+                pipe.multi()
+                pipe.delete(key)
+                await pipe.execute()
+            except WatchError:
+                pass  # Rewritten meanwhile, so it no longer refers to the job
+
+    async def forget(
+        self,
+        api_key: str,
+        fingerprint: str,
+        job_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None
+    ) -> None:
+        """
+        Drop the entries of a job that can no longer be reused.
+
+        With ``job_id``, only entries still pointing at that job are
+        dropped; the idempotency key entry is dropped only when given.
+        """
+        await self._delete_if(
+            self._fingerprint_key(api_key, fingerprint),
+            lambda stored: job_id is None or stored == job_id
+        )
+        if idempotency_key:
+            await self._delete_if(
+                self._idempotency_key(api_key, idempotency_key),
+                lambda stored: job_id is None or json.loads(stored)["job_id"] == job_id
+            )
+
+
+# Shared deduplicator instance
+submission_dedup = SubmissionDeduplicator()
@@ -0,0 +1,124 @@
+"""
+Service for API usage queries, answered from the per-minute rollups.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.api import EndpointUsage, UsagePeriod, UsageResponse, UsageStats
+from models.database import USAGE_LATENCY_BUCKETS, ApiKeyUsageRollup
+
+TOTAL_COLUMNS = (
+    "request_count", "error_count", "server_error_count", "response_time_total",
+    *(column for _, column in USAGE_LATENCY_BUCKETS),
+    "uploaded_bytes", "processing_time_total",
+)
+HISTOGRAM_LABELS = {
+    column: "inf" if math.isinf(bound) else f"{bound:g}" for bound, column in USAGE_LATENCY_BUCKETS
+}
+
+
+def _utc(value: datetime) -> datetime:
+    """Treat naive datetimes (as SQLite returns them) as UTC."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+class UsageService:
+    """Service for reading API usage of a tenant."""
+
+    @staticmethod
+    def _sums():
+        return [
+            func.coalesce(func.sum(getattr(ApiKeyUsageRollup, column)), 0).label(column)
+            for column in TOTAL_COLUMNS
+        ]
+
+    @staticmethod
+    def _add(totals: Dict[str, Any], row: Any) -> None:
+        for column in TOTAL_COLUMNS:
+            totals[column] = totals.get(column, 0) + getattr(row, column)
+
+    @staticmethod
+    def _stats(totals: Dict[str, Any]) -> Dict[str, Any]:
+        requests = int(totals.get("request_count", 0))
+        return {
+            "requests": requests,
+            "errors": int(totals.get("error_count", 0)),
+            "server_errors": int(totals.get("server_error_count", 0)),
+            "average_response_time": totals.get("response_time_total", 0.0) / requests if requests else 0.0,
+            "latency_histogram": {
+                label: int(totals.get(column, 0)) for column, label in HISTOGRAM_LABELS.items()
+            },
+            "uploaded_bytes": int(totals.get("uploaded_bytes", 0)),
+            "processing_seconds": float(totals.get("processing_time_total", 0.0)),
+        }
+
+    async def get_usage(
+        self,
+        db: AsyncSession,
+        tenant_id: str,
+        start: datetime,
+        end: datetime,
+        interval_minutes: int = 60,
+        endpoint: Optional[str] = None
+    ) -> UsageResponse:
+        """
+        Get a tenant's usage per endpoint and per interval between ``start`` and ``end``.
+
+        Only the rollup table is read, so the cost depends on the number of
+        endpoints and minutes in the period, not on the number of requests.
+        """
+        start, end = _utc(start), _utc(end)
+        filters = [
+            ApiKeyUsageRollup.api_key == tenant_id,
+            ApiKeyUsageRollup.minute >= start,
+            ApiKeyUsageRollup.minute < end,
+        ]
+        if endpoint:
+            filters.append(ApiKeyUsageRollup.endpoint == endpoint)
+
+        by_endpoint = await db.execute(
+            select(ApiKeyUsageRollup.endpoint, ApiKeyUsageRollup.method, *self._sums())
+            .where(*filters)
+            .group_by(ApiKeyUsageRollup.endpoint, ApiKeyUsageRollup.method)
+            .order_by(ApiKeyUsageRollup.endpoint, ApiKeyUsageRollup.method)
+        )
+        totals: Dict[str, Any] = {}
+        endpoints: List[EndpointUsage] = []
+        for row in by_endpoint:
+            row_totals: Dict[str, Any] = {}
+            self._add(row_totals, row)
+            self._add(totals, row)
+            endpoints.append(
+                EndpointUsage(endpoint=row.endpoint, method=row.method, **self._stats(row_totals))
+            )
+
+        by_minute = await db.execute(
+            select(ApiKeyUsageRollup.minute, *self._sums())
+            .where(*filters)
+            .group_by(ApiKeyUsageRollup.minute)
+            .order_by(ApiKeyUsageRollup.minute)
+        )
+        interval = timedelta(minutes=interval_minutes)
+        periods: Dict[datetime, Dict[str, Any]] = {}
+        for row in by_minute:
+            period = start + ((_utc(row.minute) - start) // interval) * interval
+            self._add(periods.setdefault(period, {}), row)
+
+        return UsageResponse(
+            success=True,
+            tenant=tenant_id,
+            start=start,
+            end=end,
+            interval_minutes=interval_minutes,
+            totals=UsageStats(**self._stats(totals)),
+            endpoints=endpoints,
+            series=[
+                UsagePeriod(start=period, **self._stats(period_totals))
+                for period, period_totals in periods.items()
+            ],
+        )
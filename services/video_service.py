@@ -3,27 +3,79 @@ Service for video composition with URL and file support.
 """
 
 import asyncio
-import hashlib
-import mimetypes
+import logging
 import os
+import shutil
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
 
-import aiofiles
-import aiohttp
 from moviepy.editor import (
     AudioFileClip, CompositeVideoClip, ImageClip, VideoFileClip,
     concatenate_videoclips
 )
 from PIL import Image
+from proglog import ProgressBarLogger
 
+from core.executor import render_executor
+from core.http import HTTPClientManager, http_manager
+from core.redis import redis_manager
 from core.settings import settings
 from models.api import (
-    CompositionSettings, MediaType, SceneData, TransitionType, VideoFormat,
-    VideoQuality
+    CompositionSettings, MediaType, RenderEngine, SceneData, TransitionType,
+    VideoFormat, VideoQuality
 )
+from services.ffmpeg_engine import FFmpegRenderEngine
+from services.media_cache import MediaCache
+from services.segment_cache import SegmentCache
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadBudget:
+    """Account for bytes downloaded on behalf of one job."""
+    
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self.used = 0
+    
+    def consume(self, size: int) -> None:
+        """Record downloaded bytes, failing once the limit is exceeded."""
+        self.used += size
+        if self.limit and self.used > self.limit:
+            raise ValueError(f"Job sources exceed the download limit of {self.limit} bytes")
+
+
+class _RenderProgressLogger(ProgressBarLogger):
+    """Forward moviepy frame progress to a progress reporter."""
+    
+    def __init__(
+        self,
+        report: Callable[[str, float], None],
+        message: str,
+        progress_range: Tuple[float, float]
+    ):
+        super().__init__()
+        self.report = report
+        self.message = message
+        self.progress_range = progress_range
+        self.last_reported = None
+    
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if attr != "index":
+            return
+        total = self.bars[bar].get("total")
+        if not total:
+            return
+        
+        start, end = self.progress_range
+        progress = start + (end - start) * min(value / total, 1.0)
+        # Report whole-percent steps only to avoid flooding the event loop
+        if self.last_reported is None or int(progress) != int(self.last_reported):
+            self.last_reported = progress
+            self.report(self.message, progress)
 
 
 class VideoCompositionService:
@@ -42,35 +94,75 @@ class VideoCompositionService:
         VideoQuality.ULTRA: (3840, 2160),
     }
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[HTTPClientManager] = None):
+        self.http_client = http_client or http_manager
         self.temp_dir = Path(tempfile.gettempdir()) / "video_composition"
         self.temp_dir.mkdir(exist_ok=True)
+        self.ffmpeg_engine = FFmpegRenderEngine()
+        self.media_cache = MediaCache()
+        self.segment_cache = SegmentCache()
+        # Concurrent requests for the same URL share one download
+        self._downloads = SingleFlight()
+        # Download slots per remote host, shared by all jobs in this process
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
     
-    async def download_media_from_url(self, url: str) -> Path:
-        """Download media from URL to temporary file."""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        raise ValueError(f"Failed to download from {url}: HTTP {response.status}")
-                    
-                    # Get content type and determine file extension
-                    content_type = response.headers.get('content-type', '')
-                    extension = mimetypes.guess_extension(content_type) or '.tmp'
-                    
-                    # Create temporary file
-                    url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-                    temp_file = self.temp_dir / f"download_{url_hash}{extension}"
-                    
-                    # Download and save file
-                    async with aiofiles.open(temp_file, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            await f.write(chunk)
-                    
-                    return temp_file
-                    
-            except Exception as e:
-                raise ValueError(f"Failed to download media from {url}: {str(e)}")
+    async def download_media_from_url(
+        self, url: str, budget: Optional[DownloadBudget] = None
+    ) -> Path:
+        """
+        Download media from URL into the shared media cache.
+        
+        Callers of the same URL share one download, so it runs under the
+        per-job limit alone; each caller's budget is then charged with the
+        bytes it took.
+        """
+        try:
+            path, downloaded = await self._downloads.do(url, lambda: self._fetch_to_cache(url))
+            if budget:
+                budget.consume(downloaded)
+            return path
+        except Exception as e:
+            raise ValueError(f"Failed to download media from {url}: {str(e)}")
+    
+    async def _fetch_to_cache(self, url: str) -> Tuple[Path, int]:
+        """
+        Fetch a URL through the media cache, serialised across nodes if shared.
+        
+        Returns:
+            tuple: Local path and the number of bytes downloaded for it
+        """
+        session = await self.http_client.get_session()
+        budget = DownloadBudget(settings.download_max_total_bytes)
+        
+        if not settings.media_cache_shared:
+            # Served from the media cache when fresh or revalidated
+            return await self.media_cache.fetch(session, url, budget), budget.used
+        
+        # Another node may be downloading the same URL into the shared cache;
+        # once its lock is released the fetch below is a cache hit.
+        lock = None
+        try:
+            if not redis_manager.redis:
+                await redis_manager.initialize()
+            lock = redis_manager.redis.lock(
+                f"media_cache:lock:{self.media_cache.url_key(url)}",
+                timeout=settings.media_cache_lock_timeout,
+                blocking_timeout=settings.media_cache_lock_timeout
+            )
+            if not await lock.acquire():
+                lock = None
+        except Exception as e:
+            logger.warning(f"Download lock unavailable for {url}, fetching without it: {e}")
+            lock = None
+        
+        try:
+            return await self.media_cache.fetch(session, url, budget), budget.used
+        finally:
+            if lock:
+                try:
+                    await lock.release()
+                except Exception:
+                    pass  # Lock expired; nothing to release
     
     def is_url(self, source: str) -> bool:
         """Check if source is a URL."""
@@ -92,16 +184,100 @@ class VideoCompositionService:
             # This would need API key context - simplified for now
             return Path(source)  # Placeholder
     
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Get the download semaphore for a URL's host."""
+        host = urlparse(url).netloc.lower()
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(settings.download_max_per_host)
+        return self._host_semaphores[host]
+    
+    def prefetch_sources(
+        self,
+        sources: Iterable[str],
+        budget: Optional[DownloadBudget] = None
+    ) -> Dict[str, "asyncio.Task[Path]"]:
+        """
+        Start resolving all sources concurrently.
+        
+        Downloads are bounded per job and per host. Each source gets its own
+        task, so callers can start decoding a scene as soon as its source lands.
+        
+        Returns:
+            dict: Source to task resolving to its local media path
+        """
+        job_semaphore = asyncio.Semaphore(settings.download_max_concurrency)
+        
+        async def fetch(source: str) -> Path:
+            if not self.is_url(source):
+                return await self.get_media_path(source)
+            async with job_semaphore, self._host_semaphore(source):
+                return await self.download_media_from_url(source, budget)
+        
+        tasks = {}
+        for source in sources:
+            if source not in tasks:
+                tasks[source] = asyncio.create_task(fetch(source))
+        return tasks
+    
+    @staticmethod
+    def cancel_prefetch(tasks: Dict[str, "asyncio.Task[Path]"]) -> None:
+        """Cancel source downloads that are still running."""
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+    
+    def is_image_source(self, media_path: Path, media_type: MediaType) -> bool:
+        """Check whether a scene source should be treated as a still image."""
+        if media_type == MediaType.IMAGE:
+            return True
+        if media_type == MediaType.VIDEO:
+            return False
+        
+        # image/video sources are images only if PIL can read them
+        try:
+            with Image.open(media_path) as img:
+                img.verify()
+            return True
+        except Exception:
+            return False
+    
+    @staticmethod
+    def get_render_engine(composition_settings: CompositionSettings) -> RenderEngine:
+        """Resolve the render engine for a job (per-job override or server default)."""
+        if composition_settings.render_engine:
+            return composition_settings.render_engine
+        try:
+            return RenderEngine(settings.render_engine.lower())
+        except ValueError:
+            return RenderEngine.MOVIEPY
+    
     async def create_clip_from_scene(
         self, 
         scene_name: str, 
         scene_data: SceneData, 
         target_resolution: Tuple[int, int],
-        target_fps: int
+        target_fps: int,
+        media_path: Optional[Path] = None
     ) -> VideoFileClip:
         """Create a video clip from scene data."""
-        media_path = await self.get_media_path(scene_data.source)
+        if media_path is None:
+            media_path = await self.get_media_path(scene_data.source)
         
+        # Probing and decoding the source blocks, so load it in the render executor
+        return await render_executor.run(
+            self._load_clip, scene_name, scene_data, media_path,
+            target_resolution, target_fps
+        )
+    
+    def _load_clip(
+        self,
+        scene_name: str,
+        scene_data: SceneData,
+        media_path: Path,
+        target_resolution: Tuple[int, int],
+        target_fps: int
+    ) -> VideoFileClip:
+        """Load a scene source as a resized clip (blocking)."""
         try:
             if scene_data.media_type in [MediaType.IMAGE, MediaType.IMAGE_VIDEO]:
                 # Try to load as image first
@@ -187,7 +363,8 @@ class VideoCompositionService:
         quality: VideoQuality,
         fps: int,
         composition_settings: CompositionSettings,
-        progress_callback: Optional[callable] = None
+        progress_callback: Optional[callable] = None,
+        render_stats: Optional[Dict[str, int]] = None
     ) -> Path:
         """
         Compose video from scenes.
@@ -199,6 +376,8 @@ class VideoCompositionService:
             fps: Frames per second
             composition_settings: Composition settings
             progress_callback: Optional callback for progress updates
+            render_stats: Optional dict that receives ``segments`` and
+                ``segment_cache_hits`` for segmented renders
         
         Returns:
             Path to the composed video file
@@ -207,119 +386,277 @@ class VideoCompositionService:
             # Get target resolution
             target_resolution = self.QUALITY_RESOLUTIONS.get(quality, (1920, 1080))
             
-            if progress_callback:
-                await progress_callback("Creating clips from scenes", 10)
+            render_engine = self.get_render_engine(composition_settings)
             
-            # Create clips for each scene
-            clips = []
-            scene_items = list(scenes.items())
+            # Resolve every source up front so downloads overlap each other
+            budget = DownloadBudget(settings.download_max_total_bytes)
+            sources = [scene.source for scene in scenes.values()]
+            if composition_settings.watermark_url and render_engine != RenderEngine.MOVIEPY:
+                # Only the FFmpeg engines draw the watermark
+                sources.append(composition_settings.watermark_url)
+            source_tasks = self.prefetch_sources(sources, budget)
             
-            for i, (scene_name, scene_data) in enumerate(scene_items):
+            try:
+                if render_engine != RenderEngine.MOVIEPY:
+                    return await self._compose_with_ffmpeg(
+                        scenes, output_format, target_resolution, fps,
+                        composition_settings, source_tasks, progress_callback,
+                        segmented=render_engine == RenderEngine.FFMPEG_SEGMENTED,
+                        render_stats=render_stats
+                    )
+                
                 if progress_callback:
-                    progress = 10 + (i / len(scene_items)) * 50
-                    await progress_callback(f"Processing scene: {scene_name}", progress)
+                    await progress_callback("Creating clips from scenes", 10)
                 
-                clip = await self.create_clip_from_scene(
-                    scene_name, scene_data, target_resolution, fps
+                clips = await self._load_scene_clips(
+                    scenes, target_resolution, fps, source_tasks, progress_callback
                 )
-                clips.append((clip, scene_data.transition))
-            
-            if progress_callback:
-                await progress_callback("Applying transitions", 70)
-            
-            # Apply transitions between clips
-            final_clips = []
-            for i, (clip, transition) in enumerate(clips):
-                if i == 0:
-                    final_clips.append(clip)
-                else:
-                    prev_clip = final_clips[-1]
-                    if transition != TransitionType.NONE:
-                        # Apply transition between previous and current clip
-                        transitioned = self.apply_transition(prev_clip, clip, transition)
-                        final_clips[-1] = transitioned
-                    else:
-                        final_clips.append(clip)
-            
-            if progress_callback:
-                await progress_callback("Concatenating video", 80)
-            
-            # Concatenate all clips
-            if len(final_clips) == 1:
-                final_video = final_clips[0]
-            else:
-                final_video = concatenate_videoclips(final_clips, method="compose")
-            
-            # Apply composition settings
-            if composition_settings.background_color != "black":
-                # This would require more complex implementation for background colors
-                pass
-            
-            if progress_callback:
-                await progress_callback("Rendering final video", 90)
+            finally:
+                self.cancel_prefetch(source_tasks)
+                logger.debug(f"Downloaded {budget.used} bytes of scene sources")
             
             # Generate output filename
             output_filename = f"composition_{os.urandom(6).hex()}.{output_format.value}"
             output_path = settings.output_dir / output_filename
             
-            # Set up codec and quality settings
-            codec_settings = {
-                VideoFormat.MP4: {
-                    "codec": "libx264",
-                    "audio_codec": "aac",
-                    "preset": "medium"
-                },
-                VideoFormat.WEBM: {
-                    "codec": "libvpx-vp9",
-                    "audio_codec": "libvorbis"
-                },
-                VideoFormat.AVI: {
-                    "codec": "libxvid",
-                    "audio_codec": "mp3"
-                },
-                VideoFormat.MOV: {
-                    "codec": "libx264",
-                    "audio_codec": "aac"
-                },
-                VideoFormat.GIF: {
-                    "program": "ffmpeg",
-                    "fps": min(fps, 15)  # Limit GIF FPS
-                }
-            }
-            
-            settings_for_format = codec_settings.get(output_format, codec_settings[VideoFormat.MP4])
-            
-            # Write video file
-            if output_format == VideoFormat.GIF:
-                final_video.write_gif(
-                    str(output_path),
-                    fps=settings_for_format["fps"],
-                    program=settings_for_format["program"]
-                )
-            else:
-                final_video.write_videofile(
-                    str(output_path),
-                    fps=fps,
-                    **settings_for_format
-                )
+            # Transitions, concatenation and encoding block, so they run in
+            # the render executor instead of on the event loop
+            await render_executor.run(
+                self._render_with_moviepy,
+                clips,
+                output_path,
+                output_format,
+                fps,
+                composition_settings,
+                render_executor.progress_reporter(progress_callback)
+            )
             
             if progress_callback:
                 await progress_callback("Video composition complete", 100)
             
-            # Clean up clips
-            for clip, _ in clips:
-                clip.close()
-            final_video.close()
-            
             return output_path
             
         except Exception as e:
             raise ValueError(f"Video composition failed: {str(e)}")
     
+    async def _load_scene_clips(
+        self,
+        scenes: Dict[str, SceneData],
+        target_resolution: Tuple[int, int],
+        fps: int,
+        source_tasks: Dict[str, "asyncio.Task[Path]"],
+        progress_callback: Optional[callable] = None
+    ) -> List[Tuple[VideoFileClip, TransitionType]]:
+        """Decode each scene as soon as its source has been downloaded."""
+        loaded = 0
+        
+        async def load(scene_name: str, scene_data: SceneData) -> VideoFileClip:
+            nonlocal loaded
+            try:
+                media_path = await source_tasks[scene_data.source]
+            except Exception as e:
+                raise ValueError(f"Failed to create clip from {scene_name}: {str(e)}")
+            clip = await self.create_clip_from_scene(
+                scene_name, scene_data, target_resolution, fps, media_path
+            )
+            loaded += 1
+            if progress_callback:
+                progress = 10 + (loaded / len(scenes)) * 50
+                await progress_callback(f"Processed scene: {scene_name}", progress)
+            return clip
+        
+        results = await asyncio.gather(
+            *(load(scene_name, scene_data) for scene_name, scene_data in scenes.items()),
+            return_exceptions=True
+        )
+        
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for result in results:
+                if not isinstance(result, BaseException):
+                    result.close()
+            raise errors[0]
+        
+        return [
+            (clip, scene_data.transition)
+            for clip, scene_data in zip(results, scenes.values())
+        ]
+    
+    def _render_with_moviepy(
+        self,
+        clips: List[Tuple[VideoFileClip, TransitionType]],
+        output_path: Path,
+        output_format: VideoFormat,
+        fps: int,
+        composition_settings: CompositionSettings,
+        report: Callable[[str, float], None]
+    ) -> None:
+        """Apply transitions and encode the final video (blocking)."""
+        report("Applying transitions", 70)
+        
+        # Apply transitions between clips
+        final_clips = []
+        for i, (clip, transition) in enumerate(clips):
+            if i == 0:
+                final_clips.append(clip)
+            else:
+                prev_clip = final_clips[-1]
+                if transition != TransitionType.NONE:
+                    # Apply transition between previous and current clip
+                    transitioned = self.apply_transition(prev_clip, clip, transition)
+                    final_clips[-1] = transitioned
+                else:
+                    final_clips.append(clip)
+        
+        report("Concatenating video", 80)
+        
+        # Concatenate all clips
+        if len(final_clips) == 1:
+            final_video = final_clips[0]
+        else:
+            final_video = concatenate_videoclips(final_clips, method="compose")
+        
+        # Apply composition settings
+        if composition_settings.background_color != "black":
+            # This would require more complex implementation for background colors
+            pass
+        
+        report("Rendering final video", 90)
+        
+        # Set up codec and quality settings
+        codec_settings = {
+            VideoFormat.MP4: {
+                "codec": "libx264",
+                "audio_codec": "aac",
+                "preset": "medium"
+            },
+            VideoFormat.WEBM: {
+                "codec": "libvpx-vp9",
+                "audio_codec": "libvorbis"
+            },
+            VideoFormat.AVI: {
+                "codec": "libxvid",
+                "audio_codec": "mp3"
+            },
+            VideoFormat.MOV: {
+                "codec": "libx264",
+                "audio_codec": "aac"
+            },
+            VideoFormat.GIF: {
+                "program": "ffmpeg",
+                "fps": min(fps, 15)  # Limit GIF FPS
+            }
+        }
+        
+        settings_for_format = codec_settings.get(output_format, codec_settings[VideoFormat.MP4])
+        
+        # Write video file
+        logger = _RenderProgressLogger(report, "Rendering final video", (90, 99))
+        if output_format == VideoFormat.GIF:
+            final_video.write_gif(
+                str(output_path),
+                fps=settings_for_format["fps"],
+                program=settings_for_format["program"],
+                logger=logger
+            )
+        else:
+            final_video.write_videofile(
+                str(output_path),
+                fps=fps,
+                logger=logger,
+                **settings_for_format
+            )
+        
+        # Clean up clips
+        for clip, _ in clips:
+            clip.close()
+        final_video.close()
+    
+    async def _compose_with_ffmpeg(
+        self,
+        scenes: Dict[str, SceneData],
+        output_format: VideoFormat,
+        target_resolution: Tuple[int, int],
+        fps: int,
+        composition_settings: CompositionSettings,
+        source_tasks: Dict[str, "asyncio.Task[Path]"],
+        progress_callback: Optional[callable] = None,
+        segmented: bool = False,
+        render_stats: Optional[Dict[str, int]] = None
+    ) -> Path:
+        """
+        Compose video with ffmpeg instead of moviepy.
+        
+        By default the whole timeline is one filtergraph. In segmented mode each
+        scene is rendered as its own segment in parallel and the segments are
+        joined without re-encoding; segments rendered earlier by any job are
+        taken from the segment cache. GIF output always uses a single graph.
+        """
+        if progress_callback:
+            await progress_callback("Resolving scene sources", 10)
+        
+        scene_inputs = []
+        scene_items = list(scenes.items())
+        for i, (scene_name, scene_data) in enumerate(scene_items):
+            if progress_callback:
+                progress = 10 + (i / len(scene_items)) * 40
+                await progress_callback(f"Processing scene: {scene_name}", progress)
+            
+            try:
+                media_path = await source_tasks[scene_data.source]
+            except Exception as e:
+                raise ValueError(f"Failed to create clip from {scene_name}: {str(e)}")
+            is_image = await render_executor.run(
+                self.is_image_source, media_path, scene_data.media_type
+            )
+            scene_inputs.append((media_path, scene_data, is_image))
+        
+        watermark_path = None
+        if composition_settings.watermark_url:
+            watermark_path = await source_tasks[composition_settings.watermark_url]
+        
+        output_filename = f"composition_{os.urandom(6).hex()}.{output_format.value}"
+        output_path = settings.output_dir / output_filename
+        
+        if progress_callback:
+            await progress_callback("Rendering with ffmpeg", 50)
+        
+        if segmented and output_format != VideoFormat.GIF:
+            work_dir = self.temp_dir / f"segments_{os.urandom(6).hex()}"
+            work_dir.mkdir(parents=True)
+            try:
+                hits, total = await self.ffmpeg_engine.render_segmented(
+                    scene_inputs, output_path, output_format, target_resolution, fps,
+                    composition_settings, work_dir, watermark_path,
+                    progress_callback, progress_range=(50, 99),
+                    segment_cache=self.segment_cache
+                )
+                logger.info(f"Reused {hits} of {total} segments from the segment cache")
+                if render_stats is not None:
+                    render_stats.update(segments=total, segment_cache_hits=hits)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            command, total_duration = self.ffmpeg_engine.build_command(
+                scene_inputs, output_path, output_format, target_resolution, fps,
+                composition_settings, watermark_path
+            )
+            await self.ffmpeg_engine.run(
+                command, total_duration, progress_callback, progress_range=(50, 99)
+            )
+        
+        if progress_callback:
+            await progress_callback("Video composition complete", 100)
+        
+        return output_path
+    
     async def cleanup_temp_files(self):
-        """Clean up temporary downloaded files."""
+        """Clean up temporary files and trim the media cache to its budget."""
         try:
             for file_path in self.temp_dir.glob("download_*"):
                 file_path.unlink()
         except Exception:
             pass  # Ignore cleanup errors
+        
+        # Cached downloads are shared between jobs; only evict beyond the budget
+        await self.media_cache.evict()
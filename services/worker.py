@@ -0,0 +1,334 @@
+"""
+Worker that renders queued composition jobs.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from typing import Dict, Optional, Tuple
+
+from core.api_keys import api_key_index
+from core.database import db_manager
+from core.http import http_manager
+from core.settings import settings
+from core.usage import record_processing
+from models.api import JobPriority, VideoCompositionRequest
+from models.database import Job
+from services.cost_model import cost_model
+from services.job_queue import JobQueue, LeasedJob
+from services.job_service import JobService
+from services.progress_store import JobProgressStore, progress_store
+from services.video_service import VideoCompositionService
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Consume the job queue, rendering up to ``concurrency`` jobs at a time.
+
+    Jobs are leased rather than popped: the worker renews its leases while
+    rendering, and every worker also reaps leases left behind by workers
+    that died, requeueing those jobs until they run out of retries. A share
+    of the slots (``urgent_reserved_fraction``) only takes urgent jobs.
+
+    Progress goes to the Redis progress store on every callback; workers
+    flush it to the database in batches and before each status transition.
+
+    Besides the slot count, jobs are admitted against CPU and memory budgets
+    using their estimated render cost, so a few large renders cannot
+    overload the node. A job that exceeds the budgets on its own still runs
+    when the worker is otherwise idle.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        video_service: Optional[VideoCompositionService] = None,
+        job_service: Optional[JobService] = None,
+        queue: Optional[JobQueue] = None,
+        progress: Optional[JobProgressStore] = None
+    ):
+        self.concurrency = max(1, concurrency or settings.max_concurrent_jobs)
+        self.video_service = video_service or VideoCompositionService(http_client=http_manager)
+        self.job_service = job_service or JobService()
+        self.queue = queue or JobQueue()
+        self.progress = progress or progress_store
+        self.reserved_slots = min(
+            self.concurrency - 1, int(self.concurrency * settings.urgent_reserved_fraction)
+        )
+        self.cores = os.cpu_count() or 1
+        self.cpu_budget = settings.worker_cpu_budget or 600.0 * self.cores
+        self.memory_budget = settings.worker_memory_budget or self._default_memory_budget()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._admitted: Dict[str, LeasedJob] = {}
+
+    @staticmethod
+    def _default_memory_budget() -> Optional[int]:
+        """Get 75% of physical memory, or None where it cannot be determined."""
+        try:
+            return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 0.75)
+        except (AttributeError, ValueError, OSError):
+            return None
+
+    def _remaining_budget(self) -> Tuple[Optional[float], Optional[int]]:
+        """Get the (cpu, memory) budget left for another job; None means unlimited."""
+        if not self._admitted:
+            return None, None
+        cpu = self.cpu_budget - sum(job.cost for job in self._admitted.values())
+        memory = None
+        if self.memory_budget is not None:
+            memory = self.memory_budget - sum(job.memory for job in self._admitted.values())
+        return max(0.0, cpu), None if memory is None else max(0, memory)
+
+    def stop(self) -> None:
+        """Stop taking new jobs; running jobs are allowed to finish."""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """Process jobs until ``stop`` is called."""
+        slots = asyncio.Semaphore(self.concurrency)
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+        await self.queue.register_worker(self.worker_id, self.cores)
+        maintenance = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reaper_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+        try:
+            while not self._stopping.is_set():
+                await slots.acquire()
+                # Only the reserved slots are left: keep them for urgent work
+                priorities = None
+                if len(self._running) >= self.concurrency - self.reserved_slots:
+                    priorities = [JobPriority.URGENT]
+                max_cost, max_memory = self._remaining_budget()
+                try:
+                    job = await self.queue.lease(
+                        self.worker_id,
+                        timeout=settings.worker_poll_timeout,
+                        priorities=priorities,
+                        max_cost=max_cost,
+                        max_memory=max_memory
+                    )
+                except Exception as e:
+                    slots.release()
+                    logger.error(f"Failed to read job queue: {e}")
+                    await asyncio.sleep(settings.worker_poll_timeout)
+                    continue
+
+                if not job:
+                    slots.release()
+                    continue
+
+                self._admitted[job.job_id] = job
+                task = asyncio.create_task(self._run_job(job))
+                self._running[job.job_id] = task
+                task.add_done_callback(lambda _, job_id=job.job_id: self._running.pop(job_id, None))
+                task.add_done_callback(lambda _, job_id=job.job_id: self._admitted.pop(job_id, None))
+                task.add_done_callback(lambda _: slots.release())
+
+            if self._running:
+                logger.info(f"Waiting for {len(self._running)} running jobs to finish")
+                await asyncio.gather(*self._running.values(), return_exceptions=True)
+        finally:
+            for task in maintenance:
+                task.cancel()
+            await asyncio.gather(*maintenance, return_exceptions=True)
+            try:
+                async with db_manager.get_session() as db:
+                    await self.progress.flush(db)
+            except Exception as e:
+                logger.warning(f"Failed to flush job progress: {e}")
+            try:
+                await self.queue.unregister_worker(self.worker_id)
+            except Exception as e:
+                logger.warning(f"Failed to unregister worker: {e}")
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    async def _run_job(self, job: LeasedJob) -> None:
+        try:
+            await self.process_job(job.job_id)
+        except Exception as e:
+            logger.exception(f"Unexpected error processing job {job.job_id}: {e}")
+        finally:
+            try:
+                await self.queue.ack(self.worker_id, job)
+            except Exception as e:
+                logger.error(f"Failed to acknowledge job {job.job_id}: {e}")
+
+    async def _heartbeat_loop(self) -> None:
+        """Renew the leases of running jobs and advertise this worker as live."""
+        while True:
+            await asyncio.sleep(settings.job_lease_heartbeat)
+            try:
+                await self.queue.renew(list(self._running))
+                await self.queue.register_worker(self.worker_id, self.cores)
+            except Exception as e:
+                logger.warning(f"Failed to renew job leases: {e}")
+
+    async def _reaper_loop(self) -> None:
+        """Periodically requeue jobs whose worker stopped renewing its lease."""
+        while True:
+            try:
+                await self.reap_expired_leases()
+            except Exception as e:
+                logger.warning(f"Failed to reap expired job leases: {e}")
+            await asyncio.sleep(settings.job_reaper_interval)
+
+    async def _flush_loop(self) -> None:
+        """Write buffered job progress to the database in batches."""
+        while True:
+            await asyncio.sleep(settings.job_progress_interval)
+            try:
+                async with db_manager.get_session() as db:
+                    while await self.progress.flush(db) >= settings.job_progress_flush_batch:
+                        pass
+            except Exception as e:
+                logger.warning(f"Failed to flush job progress: {e}")
+
+    async def _flush_job(self, db, job_id: str) -> None:
+        """Flush a job's buffered progress ahead of a status transition."""
+        try:
+            await self.progress.flush(db, [job_id])
+        except Exception as e:
+            logger.warning(f"Failed to flush progress for job {job_id}: {e}")
+
+    async def _publish(self, job_id: str) -> None:
+        """Refresh a job's hot copy after a status transition."""
+        try:
+            async with db_manager.get_session() as db:
+                job = await db.get(Job, job_id)
+                if job is not None:
+                    await self.progress.snapshot(job)
+        except Exception as e:
+            logger.warning(f"Failed to publish state of job {job_id}: {e}")
+
+    async def reap_expired_leases(self) -> int:
+        """
+        Requeue or fail jobs whose lease expired.
+
+        Returns:
+            int: Number of jobs reclaimed
+        """
+        reclaimed = 0
+        for job_id in await self.queue.expired_leases():
+            owner = await self.queue.take_expired_lease(job_id)
+            if owner is None:
+                continue  # Renewed or handled by another reaper
+
+            async with db_manager.get_session() as db:
+                job = await db.get(Job, job_id)
+                if job is None or job.is_finished:
+                    await self.queue.release(job_id, owner)
+                    reclaimed += 1
+                    continue
+
+                await self._flush_job(db, job_id)
+                if job.retry_count < job.max_retries:
+                    await self.job_service.requeue_job(
+                        db, job_id, f"Requeued after worker {owner} stopped responding"
+                    )
+                    await self.queue.release(
+                        job_id, owner, job.priority, job.api_key, self._estimate(job)
+                    )
+                    logger.warning(f"Requeued job {job_id} abandoned by worker {owner}")
+                else:
+                    await self.job_service.fail_job(
+                        db, job_id,
+                        f"Worker stopped responding; gave up after {job.retry_count} retries"
+                    )
+                    await self.queue.release(job_id, owner)
+                    logger.error(f"Failed job {job_id} after exhausting retries")
+            await self._publish(job_id)
+            reclaimed += 1
+        return reclaimed
+
+    @staticmethod
+    def _estimate(job: Job):
+        """Re-estimate a stored job's render cost for requeueing."""
+        try:
+            request = VideoCompositionRequest.model_validate(json.loads(job.composition_config))
+            return cost_model.estimate(request)
+        except Exception:
+            return None
+
+    def _progress_callback(self, job_id: str, total_steps: int):
+        """Create a progress callback that records to the progress store."""
+        async def progress_callback(message: str, progress: float):
+            try:
+                await self.progress.record(job_id, progress, message, total_steps)
+            except Exception as e:
+                logger.warning(f"Failed to record progress for job {job_id}: {e}")
+
+        return progress_callback
+
+    async def _record_processing(self, job: Job, started: float) -> None:
+        """Charge a job's render time to the usage of the API key that submitted it."""
+        try:
+            async with db_manager.get_session() as db:
+                await record_processing(
+                    db, api_key_index.context(job.api_key).tenant_id, time.monotonic() - started
+                )
+        except Exception as e:
+            logger.warning(f"Failed to record processing time of job {job.id}: {e}")
+
+    async def process_job(self, job_id: str) -> None:
+        """Render a single queued job and record the outcome."""
+        async with db_manager.get_session() as db:
+            job = await self.job_service.start_job(db, job_id)
+        if job is None:
+            logger.info(f"Skipping job {job_id}: no longer queued")
+            return
+        await self._publish(job_id)
+
+        logger.info(f"Processing job {job_id}")
+        started = time.monotonic()
+        try:
+            request = VideoCompositionRequest.model_validate(json.loads(job.composition_config))
+            render_stats: Dict[str, int] = {}
+            output_path = await asyncio.wait_for(
+                self.video_service.compose_video(
+                    scenes=request.scenes,
+                    output_format=request.output_format,
+                    quality=request.quality,
+                    fps=request.fps,
+                    composition_settings=request.composition_settings,
+                    progress_callback=self._progress_callback(job_id, len(request.scenes)),
+                    render_stats=render_stats
+                ),
+                timeout=settings.job_timeout
+            )
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                message = f"Job timed out after {settings.job_timeout}s"
+            else:
+                message = str(e)
+            logger.error(f"Job {job_id} failed: {message}")
+            async with db_manager.get_session() as db:
+                await self._flush_job(db, job_id)
+                await self.job_service.fail_job(db, job_id, message, traceback.format_exc())
+            await self._publish(job_id)
+            await self._record_processing(job, started)
+            return
+
+        async with db_manager.get_session() as db:
+            await self._flush_job(db, job_id)
+            await self.job_service.complete_job(
+                db, job_id, output_path, request.output_format.value,
+                request.get_total_duration(), render_stats
+            )
+        await self._publish(job_id)
+        await self._record_processing(job, started)
+        logger.info(f"Job {job_id} completed: {output_path}")
+        if render_stats.get("segments"):
+            ratio = render_stats["segment_cache_hits"] / render_stats["segments"]
+            logger.info(f"Job {job_id} segment cache hit ratio: {ratio:.0%}")
@@ -0,0 +1,87 @@
+"""
+Tests for the API key index.
+"""
+
+import asyncio
+import hashlib
+
+import pytest
+
+from core.api_keys import ApiKeyIndex
+from core.redis import redis_manager
+from core.settings import settings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_keys_resolve_to_precomputed_contexts(monkeypatch):
+    """Test configured keys carry their hashes and quotas and unknown keys do not resolve."""
+    monkeypatch.setattr(settings, "api_keys", ["alpha", "beta"])
+    monkeypatch.setattr(settings, "tenant_weights", {"beta": 3.0})
+    index = ApiKeyIndex(prefix="test:keys")
+
+    alpha = index.resolve("alpha")
+    assert alpha.key_hash == hashlib.sha256(b"alpha").hexdigest()
+    assert alpha.tenant_id == alpha.key_hash[:16]
+    assert alpha.rate_limit == settings.rate_limit_requests
+    assert index.resolve("beta").weight == 3.0
+    assert index.resolve("gamma") is None
+    # Keys outside the index still get a context for bookkeeping
+    assert index.context("gamma").tenant_id == hashlib.sha256(b"gamma").hexdigest()[:16]
+
+
+def test_keys_stored_in_redis_are_hot_reloaded(monkeypatch):
+    """Test keys added or revoked in Redis reach every index on reload."""
+    monkeypatch.setattr(settings, "api_keys", ["alpha"])
+
+    async def scenario():
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        writer = ApiKeyIndex(prefix="test:keys")
+        reader = ApiKeyIndex(prefix="test:keys")
+        await reader.reload(force=True)
+        assert not await reader.reload()
+
+        await writer.store("gamma", {"rate_limit": 500, "active_job_limit": 5})
+        await writer.store("alpha", {"weight": 2})
+        assert await reader.reload()
+        gamma, alpha = reader.resolve("gamma"), reader.resolve("alpha")
+        fields = set(await redis_manager.redis.hkeys("test:keys"))
+
+        await writer.revoke("gamma")
+        await writer.revoke("alpha")
+        await reader.reload()
+        return gamma, alpha, fields, reader.resolve("gamma"), reader.resolve("alpha")
+
+    gamma, alpha, fields, revoked, configured = asyncio.run(scenario())
+
+    # Redis only ever sees the hashes of the keys
+    assert fields == {hashlib.sha256(b"gamma").hexdigest(), hashlib.sha256(b"alpha").hexdigest()}
+    assert gamma.api_key == "gamma"
+    assert gamma.tenant_id == hashlib.sha256(b"gamma").hexdigest()[:16]
+    assert (gamma.rate_limit, gamma.active_job_limit) == (500, 5)
+    assert alpha.weight == 2
+    assert revoked is None
+    # Configured keys stay valid, with their configured quota
+    assert configured.weight == 1.0
+
+
+def test_plaintext_keys_left_in_redis_still_resolve_until_rewritten(monkeypatch):
+    """Test keys stored before hashing stay valid and are replaced by their hash when stored again."""
+    monkeypatch.setattr(settings, "api_keys", [])
+
+    async def scenario():
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        await redis_manager.redis.hset("test:keys", "legacy", '{"rate_limit": 7}')
+        index = ApiKeyIndex(prefix="test:keys")
+        await index.reload(force=True)
+        legacy = index.resolve("legacy")
+
+        await index.store("legacy", {"rate_limit": 8})
+        await index.reload()
+        return legacy, index.resolve("legacy"), await redis_manager.redis.hgetall("test:keys")
+
+    legacy, rewritten, stored = asyncio.run(scenario())
+
+    assert legacy.api_key == "legacy" and legacy.rate_limit == 7
+    assert rewritten.rate_limit == 8
+    assert stored == {hashlib.sha256(b"legacy").hexdigest(): '{"rate_limit": 8}'}
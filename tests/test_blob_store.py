@@ -0,0 +1,148 @@
+"""
+Tests for content-addressed upload storage.
+"""
+
+import asyncio
+import hashlib
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.database import Base
+from models.database import StoredBlob
+from services.blob_store import BlobStore
+
+
+def _stage(store: BlobStore, name: str, content: bytes):
+    path = store.temp_path(name)
+    path.write_bytes(content)
+    return path, hashlib.sha256(content).hexdigest()
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    """Test repeated content is stored once and unlinked with its last reference."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        store = BlobStore(tmp_path / "uploads")
+
+        async with sessions() as db:
+            first_path, sha256_hash = _stage(store, "a.png", b"logo")
+            first, created = await store.acquire(db, first_path, sha256_hash, 4)
+            await db.commit()
+            assert created
+
+            second_path, _ = _stage(store, "b.png", b"logo")
+            second, created = await store.acquire(db, second_path, sha256_hash, 4)
+            await db.commit()
+            assert not created
+            assert second.file_path == first.file_path
+            assert second.ref_count == 2
+            assert not first_path.exists() and not second_path.exists()
+
+            assert await store.release(db, sha256_hash, first.file_path) is None
+            await db.commit()
+            assert list((tmp_path / "uploads" / "blobs").rglob("*.png"))
+            assert (await db.get(StoredBlob, sha256_hash)).ref_count == 1
+
+            released = await store.release(db, sha256_hash, first.file_path)
+            await db.commit()
+            assert released == first.file_path
+            assert await db.get(StoredBlob, sha256_hash) is None
+            await store.purge(db, sha256_hash, released)
+            assert not list((tmp_path / "uploads" / "blobs").rglob("*.png"))
+            await store.purge(db, sha256_hash, released)  # Already gone
+
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_release_unlinks_files_stored_before_blob_store(tmp_path):
+    """Test files without a blob row are deleted directly."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        store = BlobStore(tmp_path / "uploads")
+        legacy = tmp_path / "uploads" / "legacy.png"
+        legacy.write_bytes(b"old")
+
+        sha256_hash = hashlib.sha256(b"old").hexdigest()
+        async with async_sessionmaker(engine)() as db:
+            released = await store.release(db, sha256_hash, str(legacy))
+            await db.commit()
+            await store.purge(db, sha256_hash, released)
+
+        assert released == str(legacy)
+        assert not legacy.exists()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_release_keeps_the_blob(tmp_path):
+    """Test a blob stays on disk until the transaction dropping its last reference commits."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        store = BlobStore(tmp_path / "uploads")
+
+        async with sessions() as db:
+            staged, sha256_hash = _stage(store, "a.png", b"logo")
+            blob, _ = await store.acquire(db, staged, sha256_hash, 4)
+            await db.commit()
+
+            assert await store.release(db, sha256_hash, blob.file_path) == blob.file_path
+            await db.rollback()
+            kept = await db.get(StoredBlob, sha256_hash, populate_existing=True)
+
+            # Purging a path whose blob is registered leaves it alone
+            await store.purge(db, sha256_hash, blob.file_path)
+
+        await engine.dispose()
+        return blob.file_path, kept
+
+    file_path, kept = asyncio.run(scenario())
+
+    assert kept is not None and kept.ref_count == 1
+    assert Path(file_path).exists()
+
+
+def test_upload_racing_a_purge_keeps_its_file(tmp_path):
+    """Test content uploaded while a released blob awaits its purge gets a file of its own."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        store = BlobStore(tmp_path / "uploads")
+
+        async with sessions() as db:
+            staged, sha256_hash = _stage(store, "a.png", b"logo")
+            old, _ = await store.acquire(db, staged, sha256_hash, 4)
+            await db.commit()
+            released = await store.release(db, sha256_hash, old.file_path)
+            await db.commit()
+
+        # A new upload registers the content before the release is purged,
+        # and commits only after the purge ran
+        async with sessions() as uploading:
+            staged, _ = _stage(store, "b.png", b"logo")
+            new, created = await store.acquire(uploading, staged, sha256_hash, 4)
+            async with sessions() as db:
+                await store.purge(db, sha256_hash, released)
+            await uploading.commit()
+
+        await engine.dispose()
+        return old.file_path, new.file_path, created
+
+    old_path, new_path, created = asyncio.run(scenario())
+
+    assert created and new_path != old_path
+    assert not Path(old_path).exists()
+    assert Path(new_path).read_bytes() == b"logo"
@@ -0,0 +1,135 @@
+"""
+Tests for batch composition submission.
+"""
+
+import asyncio
+from types import MappingProxyType
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.api_keys import AuthContext, api_key_index
+from core.database import Base, get_db
+from core.redis import redis_manager
+from core.settings import settings
+from main import app
+from models.api import JobStatus
+from models.database import Job
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _composition(source: str = "https://example.com/a.png") -> dict:
+    return {"scenes": {"A": {"source": source, "media_type": "image", "duration": 2}}}
+
+
+def _client(tmp_path, monkeypatch, quota=None):
+    """Client for the app with one API key, fake Redis and a fresh database."""
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_manager, "redis", redis)
+    monkeypatch.setattr(app.state, "redis", redis, raising=False)
+    auth = AuthContext.build("batch-key", quota)
+    monkeypatch.setattr(api_key_index, "_keys", MappingProxyType({auth.key_hash: auth}))
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    return TestClient(app), {"Authorization": f"Bearer {auth.api_key}"}, sessions
+
+
+def test_batch_is_charged_per_composition(tmp_path, monkeypatch):
+    """Test a batch only admits what a full rate limit bucket pays for, and spends it."""
+    monkeypatch.setattr("api.endpoints.jobs.composition_cost", lambda cpu_seconds: 4.0)
+    client, headers, _ = _client(tmp_path, monkeypatch, {"rate_limit": 10, "active_job_limit": 100})
+
+    response = client.post(
+        "/compose/batch", json={"compositions": [_composition() for _ in range(3)]}, headers=headers
+    )
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["submitted"] == 2 and body["failed"] == 1
+    assert [result["success"] for result in body["results"]] == [True, True, False]
+    assert "rate limit" in body["results"][2]["error"]
+
+    # The two admitted compositions used 8 of the 10 tokens
+    again = client.post("/compose/batch", json={"compositions": [_composition()]}, headers=headers)
+    assert again.status_code == 429
+
+
+def _jobs(sessions):
+    async def load():
+        async with sessions() as db:
+            return (await db.execute(select(Job))).scalars().all()
+
+    return asyncio.run(load())
+
+
+def test_invalid_entries_are_reported_next_to_accepted_ones(tmp_path, monkeypatch):
+    """Test each entry is validated on its own and the valid ones are queued."""
+    client, headers, sessions = _client(tmp_path, monkeypatch, {"active_job_limit": 100})
+
+    response = client.post("/compose/batch", json={"compositions": [
+        _composition("https://example.com/a.png"),
+        {"scenes": {"A": {"source": "https://example.com/b.png", "media_type": "image", "duration": -1}}},
+        {"scenes": {}},
+        _composition("https://example.com/c.png"),
+    ]}, headers=headers)
+    body = response.json()
+
+    assert response.status_code == 200
+    assert body["submitted"] == 2 and body["failed"] == 2
+    assert [result["index"] for result in body["results"]] == [0, 1, 2, 3]
+    assert [result["success"] for result in body["results"]] == [True, False, False, True]
+    assert "duration" in body["results"][1]["error"]
+    assert "At least one scene is required" in body["results"][2]["error"]
+    queued = {result["job"]["id"] for result in body["results"] if result["success"]}
+    jobs = _jobs(sessions)
+    assert {job.id for job in jobs} == queued
+    assert all(job.status == JobStatus.QUEUED for job in jobs)
+
+
+def test_unavailable_queue_fails_the_batch_jobs(tmp_path, monkeypatch):
+    """Test jobs created for a batch the queue cannot take are marked failed."""
+    client, headers, sessions = _client(tmp_path, monkeypatch, {"active_job_limit": 100})
+
+    async def enqueue_many(entries):
+        raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr("api.endpoints.jobs.job_queue.enqueue_many", enqueue_many)
+    response = client.post(
+        "/compose/batch", json={"compositions": [_composition() for _ in range(2)]}, headers=headers
+    )
+
+    assert response.status_code == 503
+    jobs = _jobs(sessions)
+    assert len(jobs) == 2
+    assert all(job.status == JobStatus.FAILED for job in jobs)
+    assert all(job.error_message == "Job queue unavailable" for job in jobs)
+
+
+def test_batches_over_the_item_cap_are_refused(tmp_path, monkeypatch):
+    """Test a batch with too many entries is rejected before anything is created."""
+    monkeypatch.setattr(settings, "compose_batch_max_items", 2)
+    client, headers, sessions = _client(tmp_path, monkeypatch)
+
+    response = client.post(
+        "/compose/batch", json={"compositions": [_composition() for _ in range(3)]}, headers=headers
+    )
+
+    assert response.status_code == 413
+    assert "At most 2 compositions" in response.json()["message"]
+    assert _jobs(sessions) == []
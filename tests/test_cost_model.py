@@ -0,0 +1,64 @@
+"""
+Tests for render cost estimation.
+"""
+
+from core.settings import settings
+from models.api import VideoCompositionRequest
+from services.cost_model import RenderCostModel
+
+
+def _request(**overrides) -> VideoCompositionRequest:
+    config = {
+        "scenes": {"Scene 1": {"source": "https://example.com/a.jpg", "media_type": "image", "duration": 5}},
+        "output_format": "mp4",
+        "quality": "720p",
+        "fps": 30,
+        "composition_settings": {"render_engine": "ffmpeg"},
+    }
+    config.update(overrides)
+    return VideoCompositionRequest.model_validate(config)
+
+
+def test_cost_scales_with_pixels_and_duration():
+    """Test larger and longer outputs are estimated as more expensive."""
+    model = RenderCostModel()
+    base = model.estimate(_request())
+    uhd = model.estimate(_request(quality="4k"))
+    longer = model.estimate(_request(scenes={
+        "Scene 1": {"source": "https://example.com/a.jpg", "media_type": "image", "duration": 50}
+    }))
+
+    assert base.frames == 150
+    assert uhd.cpu_seconds > base.cpu_seconds * 8
+    assert uhd.memory_bytes > base.memory_bytes
+    assert longer.cpu_seconds > base.cpu_seconds * 9
+
+
+def test_video_sources_transitions_and_codec_add_cost():
+    """Test decoding, transitions and slower codecs raise the estimate."""
+    model = RenderCostModel()
+    base = model.estimate(_request())
+    video = model.estimate(_request(scenes={
+        "Scene 1": {"source": "https://example.com/a.mp4", "media_type": "video", "duration": 5}
+    }))
+    faded = model.estimate(_request(scenes={
+        "Scene 1": {"source": "https://example.com/a.jpg", "media_type": "image", "duration": 5, "transition": "fade"}
+    }))
+    webm = model.estimate(_request(output_format="webm"))
+
+    assert video.cpu_seconds > base.cpu_seconds
+    assert faded.cpu_seconds > base.cpu_seconds and faded.transitions == 1
+    assert webm.cpu_seconds > base.cpu_seconds
+
+
+def test_server_default_engine_is_resolved_leniently(monkeypatch):
+    """Test a differently cased or unknown RENDER_ENGINE does not break estimation."""
+    model = RenderCostModel()
+    default = _request(composition_settings={})
+    ffmpeg = model.estimate(_request())
+    moviepy = model.estimate(_request(composition_settings={"render_engine": "moviepy"}))
+
+    monkeypatch.setattr(settings, "render_engine", "FFmpeg")
+    assert model.estimate(default) == ffmpeg
+    monkeypatch.setattr(settings, "render_engine", "gpu")
+    assert model.estimate(default) == moviepy
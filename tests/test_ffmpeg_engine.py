@@ -0,0 +1,220 @@
+"""
+Tests for the ffmpeg filtergraph render engine.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from core.settings import settings
+from models.api import CompositionSettings, SceneData, VideoFormat
+from services.ffmpeg_engine import FFmpegRenderEngine
+
+engine = FFmpegRenderEngine(ffmpeg_binary="ffmpeg")
+
+
+def make_scene(duration: float, transition: str = "none") -> SceneData:
+    return SceneData(
+        source="https://example.com/image.jpg",
+        media_type="image",
+        duration=duration,
+        transition=transition
+    )
+
+
+def get_filtergraph(command: list) -> str:
+    return command[command.index("-filter_complex") + 1]
+
+
+def test_single_scene_command():
+    """Test a single image scene compiles to one looped input."""
+    command, duration = engine.build_command(
+        [(Path("a.jpg"), make_scene(3.0), True)],
+        Path("out.mp4"), VideoFormat.MP4, (1920, 1080), 30, CompositionSettings()
+    )
+    assert duration == 3.0
+    assert command.count("-i") == 1
+    assert "-loop" in command
+    assert "libx264" in command
+    graph = get_filtergraph(command)
+    assert "scale=1920:1080" in graph
+    assert graph.endswith("[out]")
+
+
+def test_hard_cuts_are_batched_into_one_concat():
+    """Test consecutive scenes without overlap share a single concat filter."""
+    scenes = [(Path(f"{i}.jpg"), make_scene(2.0), True) for i in range(3)]
+    command, duration = engine.build_command(
+        scenes, Path("out.mp4"), VideoFormat.MP4, (1280, 720), 30, CompositionSettings()
+    )
+    graph = get_filtergraph(command)
+    assert duration == 6.0
+    assert graph.count("concat=n=3") == 1
+    assert "xfade" not in graph
+
+
+def test_crossfade_overlaps_scenes():
+    """Test overlapping transitions use xfade and shorten the timeline."""
+    scenes = [
+        (Path("a.jpg"), make_scene(3.0), True),
+        (Path("b.jpg"), make_scene(3.0, "crossfade"), True),
+    ]
+    command, duration = engine.build_command(
+        scenes, Path("out.mp4"), VideoFormat.MP4, (1280, 720), 30, CompositionSettings()
+    )
+    graph = get_filtergraph(command)
+    assert "xfade=transition=fade:duration=0.5:offset=2.5" in graph
+    assert duration == 5.5
+
+
+def test_fade_transition_uses_fade_filters():
+    """Test fade transitions fade out the previous scene and fade in the next."""
+    scenes = [
+        (Path("a.jpg"), make_scene(2.0), True),
+        (Path("b.jpg"), make_scene(2.0, "fade"), True),
+    ]
+    command, duration = engine.build_command(
+        scenes, Path("out.mp4"), VideoFormat.MP4, (1280, 720), 30, CompositionSettings()
+    )
+    graph = get_filtergraph(command)
+    assert "fade=t=out:st=1.5:d=0.5" in graph
+    assert "fade=t=in:st=0:d=0.5" in graph
+    assert duration == 4.0
+
+
+def test_watermark_and_background():
+    """Test watermark overlay and background padding color."""
+    composition_settings = CompositionSettings(
+        background_color="#fff",
+        watermark_url="https://example.com/logo.png",
+        watermark_position="top-left",
+        watermark_opacity=0.25
+    )
+    command, _ = engine.build_command(
+        [(Path("a.jpg"), make_scene(2.0), True)],
+        Path("out.mp4"), VideoFormat.MP4, (1280, 720), 30, composition_settings,
+        watermark_path=Path("logo.png")
+    )
+    graph = get_filtergraph(command)
+    assert "color=#ffffff" in graph
+    assert "colorchannelmixer=aa=0.25" in graph
+    assert "overlay=20:20" in graph
+    assert command.count("-i") == 2
+
+
+def test_gif_output_uses_palette():
+    """Test GIF output generates a palette and caps the frame rate."""
+    command, _ = engine.build_command(
+        [(Path("a.jpg"), make_scene(2.0), True)],
+        Path("out.gif"), VideoFormat.GIF, (640, 480), 30, CompositionSettings()
+    )
+    graph = get_filtergraph(command)
+    assert "palettegen" in graph
+    assert "fps=15" in graph
+
+
+def test_segments_own_outgoing_overlap(tmp_path):
+    """Test segments split the timeline so concatenation matches the full graph."""
+    scenes = [
+        (Path("a.mp4"), make_scene(3.0), False),
+        (Path("b.mp4"), make_scene(3.0, "crossfade"), False),
+        (Path("c.jpg"), make_scene(2.0, "fade"), True),
+    ]
+    segments = engine.build_segment_commands(
+        scenes, tmp_path, VideoFormat.MP4, (1280, 720), 30, CompositionSettings(), threads=2
+    )
+    _, full_duration = engine.build_command(
+        scenes, tmp_path / "out.mp4", VideoFormat.MP4, (1280, 720), 30, CompositionSettings()
+    )
+    assert [duration for _, _, duration in segments] == [3.0, 2.5, 2.0]
+    assert sum(duration for _, _, duration in segments) == full_duration
+
+    first, second, third = (command for command, _, _ in segments)
+    # The first segment renders the crossfade with the head of the second scene
+    assert first.count("-i") == 2
+    assert "xfade=transition=fade:duration=0.5:offset=2.5" in get_filtergraph(first)
+    assert first[first.index("-threads") + 1] == "2"
+    # The second segment skips the head consumed by the crossfade
+    assert second[second.index("-ss") + 1] == "0.5"
+    assert "fade=t=out:st=2:d=0.5" in get_filtergraph(second)
+    assert "fade=t=in:st=0:d=0.5" in get_filtergraph(third)
+
+
+def test_concat_command_copies_streams(tmp_path):
+    """Test segment joining uses the concat demuxer without re-encoding."""
+    segment_paths = [tmp_path / "segment_00000.mp4", tmp_path / "segment_00001.mp4"]
+    list_path = tmp_path / "segments.txt"
+    command = engine.build_concat_command(segment_paths, list_path, tmp_path / "out.mp4")
+    assert command[command.index("-c") + 1] == "copy"
+    assert command[command.index("-f") + 1] == "concat"
+    assert list_path.read_text().count("file '") == 2
+
+
+def test_cancelled_run_kills_the_process(monkeypatch):
+    """Test a cancelled render (job timeout, shutdown) does not leave ffmpeg running."""
+    processes = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def spawn(*args, **kwargs):
+        process = await create_subprocess_exec(*args, **kwargs)
+        processes.append(process)
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", spawn)
+    # Stands in for ffmpeg: reports progress once, then keeps running
+    command = [
+        sys.executable, "-c",
+        "import time; print('out_time_us=1000000', flush=True); time.sleep(60)"
+    ]
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def progress(message, value):
+            started.set()
+
+        task = asyncio.create_task(engine.run(command, 10, progress))
+        await asyncio.wait_for(started.wait(), 10)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert processes[0].returncode is not None
+    with pytest.raises(ProcessLookupError):
+        os.kill(processes[0].pid, 0)
+
+
+def test_failed_segment_stops_its_siblings(tmp_path, monkeypatch):
+    """Test the other segments have exited by the time a segment failure propagates."""
+    monkeypatch.setattr(settings, "render_segment_workers", 3)
+    segmented = FFmpegRenderEngine(ffmpeg_binary="ffmpeg")
+    scenes = [(Path(f"{name}.jpg"), make_scene(2.0), True) for name in "abc"]
+    running = set()
+
+    async def run(command, total_duration, progress_callback=None, progress_range=(0, 100)):
+        segment = Path(command[-1]).name
+        if segment == "segment_00000.mp4":
+            await asyncio.sleep(0.05)
+            raise ValueError("ffmpeg exited with code 1")
+        running.add(segment)
+        try:
+            await asyncio.sleep(60)
+        finally:
+            running.discard(segment)
+
+    monkeypatch.setattr(segmented, "run", run)
+
+    async def scenario():
+        with pytest.raises(ValueError, match="code 1"):
+            await segmented.render_segmented(
+                scenes, tmp_path / "out.mp4", VideoFormat.MP4, (1280, 720), 30,
+                CompositionSettings(), tmp_path
+            )
+        return set(running)
+
+    assert asyncio.run(scenario()) == set()
@@ -0,0 +1,103 @@
+"""
+Tests for file uploads.
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+from starlette.requests import Request
+
+from api.endpoints.files import MULTIPART_OVERHEAD, _upload_form
+from core.settings import settings
+from services.file_service import FileService
+
+
+def _request(chunks, headers=()):
+    """Request whose body arrives in ``chunks``, recording how many were read."""
+    received = []
+
+    async def receive():
+        received.append(len(received))
+        index = len(received) - 1
+        body = chunks[index] if index < len(chunks) else b""
+        return {"type": "http.request", "body": body, "more_body": index < len(chunks) - 1}
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=x"), *headers],
+    }
+    return Request(scope, receive), received
+
+
+def test_save_file_hashes_and_counts_in_chunks(tmp_path, monkeypatch):
+    """Test an upload is copied in chunks with its size and hashes computed on the way."""
+    monkeypatch.setattr(settings, "upload_dir", tmp_path)
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    service = FileService()
+    content = b"0123456789abcdef!"
+
+    path, md5, sha256, size = asyncio.run(service._save_file(
+        UploadFile(io.BytesIO(content), filename="logo.PNG"), "file-1", max_size=100
+    ))
+
+    assert path.name == "file-1.png" and path.read_bytes() == content
+    assert size == len(content)
+    assert md5 == hashlib.md5(content).hexdigest()
+    assert sha256 == hashlib.sha256(content).hexdigest()
+
+
+def test_save_file_removes_the_partial_file_when_too_large(tmp_path, monkeypatch):
+    """Test an upload over the limit is refused with 413 and leaves nothing behind."""
+    monkeypatch.setattr(settings, "upload_dir", tmp_path)
+    monkeypatch.setattr(settings, "upload_chunk_size", 4)
+    service = FileService()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(service._save_file(
+            UploadFile(io.BytesIO(b"x" * 20), filename="big.png"), "file-2", max_size=10
+        ))
+
+    assert error.value.status_code == 413
+    assert not service.blob_store.temp_path("file-2.png").exists()
+
+
+def test_oversized_upload_is_refused_before_the_body_is_read(monkeypatch):
+    """Test a Content-Length over the limit is refused without reading the body."""
+    monkeypatch.setattr(settings, "upload_max_size", 10)
+    limit = 10 + MULTIPART_OVERHEAD
+    request, received = _request([b"x"], headers=[(b"content-length", str(limit + 1).encode())])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_upload_form(request, max_files=1))
+
+    assert error.value.status_code == 413
+    assert received == []
+
+
+def test_upload_without_content_length_is_refused(monkeypatch):
+    """Test uploads must declare their size, which the rate limit charges by."""
+    request, received = _request([b"x"])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_upload_form(request, max_files=1))
+
+    assert error.value.status_code == 411
+    assert received == []
+
+
+def test_understated_upload_is_cut_off_while_streaming(monkeypatch):
+    """Test a body larger than announced stops being read once it passes the limit."""
+    monkeypatch.setattr(settings, "upload_max_size", 10)
+    chunk = b"x" * (MULTIPART_OVERHEAD // 2)
+    head = b'--x\r\nContent-Disposition: form-data; name="file"; filename="a.png"\r\n\r\n'
+    request, received = _request([head] + [chunk] * 10, headers=[(b"content-length", b"100")])
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(_upload_form(request, max_files=1))
+
+    assert error.value.status_code == 413
+    assert len(received) == 3  # The head and two chunks pass the limit
@@ -0,0 +1,29 @@
+"""
+Tests for the shared HTTP client.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from core.http import HTTPClientManager
+
+
+def test_concurrent_first_calls_create_one_session(monkeypatch):
+    """Test callers racing for the session before it exists all get the same one."""
+    manager = HTTPClientManager()
+    created = []
+
+    async def initialize():
+        await asyncio.sleep(0.01)
+        manager.session = SimpleNamespace(closed=False)
+        created.append(manager.session)
+
+    monkeypatch.setattr(manager, "initialize", initialize)
+
+    async def scenario():
+        return await asyncio.gather(*(manager.get_session() for _ in range(5)))
+
+    sessions = asyncio.run(scenario())
+
+    assert len(created) == 1
+    assert all(session is created[0] for session in sessions)
@@ -0,0 +1,93 @@
+"""
+Tests for job event fan-out.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.requests import Request
+
+from core.database import Base
+from core.events import JobEventBroker
+from core.redis import redis_manager
+from models.api import JobStatus
+from models.database import Job
+from services.progress_store import JobProgressStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_watchers_receive_progress_and_completion(monkeypatch):
+    """Test progress and status changes written by a worker reach every watcher of the job."""
+    async def scenario():
+        # Created inside the loop: pub/sub connections bind to it
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        broker = JobEventBroker()
+        monkeypatch.setattr("services.progress_store.job_events", broker)
+        store = JobProgressStore(prefix="test:progress")
+        job = Job(
+            id="job-1", api_key="key", status=JobStatus.PROCESSING, priority="normal",
+            progress=0.0, retry_count=0, max_retries=3, webhook_sent=False,
+            composition_config=json.dumps({}), created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
+
+        first = await broker.subscribe("job-1")
+        second = await broker.subscribe("job-1")
+        other = await broker.subscribe("job-2")
+
+        await store.record("job-1", 40, "Rendering", total_steps=2)
+        job.status = JobStatus.COMPLETED
+        job.output_format = "mp4"
+        job.output_size = 1024
+        await store.snapshot(job)
+
+        received = []
+        for queue in (first, second):
+            events = [await asyncio.wait_for(queue.get(), 5) for _ in range(2)]
+            received.append(events)
+        assert other.empty()
+
+        await broker.unsubscribe("job-1", first)
+        await broker.unsubscribe("job-1", second)
+        await broker.unsubscribe("job-2", other)
+        await broker.close()
+        return received
+
+    for progress, completed in asyncio.run(scenario()):
+        assert progress["event"] == "progress"
+        assert progress["data"]["progress"] == 40 and progress["data"]["current_step"] == "Rendering"
+        assert completed["event"] == "completed"
+        assert completed["data"]["output_size"] == 1024
+
+
+def test_event_stream_does_not_hold_a_database_connection(tmp_path, monkeypatch):
+    """Test a stream read from the database returns its connection before streaming."""
+    from api.endpoints.jobs import stream_job_events
+
+    async def scenario():
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        broker = JobEventBroker()
+        monkeypatch.setattr("api.endpoints.jobs.job_events", broker)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            # Queued jobs have no live copy in Redis, so they are read from the database
+            db.add(Job(id="job-1", api_key="key", status=JobStatus.QUEUED, composition_config=json.dumps({})))
+            await db.commit()
+            response = await stream_job_events("job-1", Request({"type": "http"}), "key", {}, db)
+            in_transaction = db.in_transaction()
+
+        await broker.close()
+        await engine.dispose()
+        return response, in_transaction
+
+    response, in_transaction = asyncio.run(scenario())
+
+    assert response.media_type == "text/event-stream"
+    assert not in_transaction
@@ -0,0 +1,245 @@
+"""
+Tests for job queue scheduling.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core.redis import redis_manager
+from core.settings import settings
+from models.api import JobPriority, RenderCostEstimate
+from services.job_queue import JobQueue
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Job queue backed by an in-memory Redis."""
+    monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+    return JobQueue()
+
+
+async def _drain(queue: JobQueue, count: int, **kwargs):
+    jobs = []
+    for _ in range(count):
+        job = await queue.lease("worker", **kwargs)
+        jobs.append(job.job_id if job else None)
+    return jobs
+
+
+def test_tenants_share_a_priority_by_weight(queue, monkeypatch):
+    """Test a tenant with a deep backlog cannot starve others."""
+    monkeypatch.setattr(settings, "tenant_weights", {"big": 1.0, "vip": 2.0})
+
+    async def scenario():
+        for index in range(20):
+            await queue.enqueue(f"big-{index}", JobPriority.NORMAL, "big")
+        for index in range(4):
+            await queue.enqueue(f"small-{index}", JobPriority.NORMAL, "small")
+            await queue.enqueue(f"vip-{index}", JobPriority.NORMAL, "vip")
+        return await _drain(queue, 8)
+
+    jobs = asyncio.run(scenario())
+
+    assert sum(job.startswith("vip") for job in jobs) == 4
+    assert sum(job.startswith("small") for job in jobs) == 2
+    assert sum(job.startswith("big") for job in jobs) == 2
+    # Each tenant's own jobs stay in submission order
+    assert [job for job in jobs if job.startswith("big")] == ["big-0", "big-1"]
+
+
+def test_higher_priority_first_until_lower_priority_ages(queue, monkeypatch):
+    """Test waiting normal jobs are promoted once they exceed the aging threshold."""
+    monkeypatch.setattr(settings, "job_aging_seconds", 60)
+
+    async def scenario():
+        await queue.enqueue("normal", JobPriority.NORMAL, "a")
+        await queue.enqueue("high", JobPriority.HIGH, "b")
+        first = await _drain(queue, 1)
+
+        await queue.enqueue("high-2", JobPriority.HIGH, "b")
+        # Pretend the normal job was submitted two minutes ago
+        await redis_manager.redis.zadd(
+            f"{settings.job_queue_prefix}:normal:waiting", {"normal": (time.time() - 121) * 1000}
+        )
+        return first + await _drain(queue, 2)
+
+    assert asyncio.run(scenario()) == ["high", "normal", "high-2"]
+
+
+def test_reserved_slots_only_take_urgent_jobs(queue):
+    """Test restricting a lease to urgent jobs leaves other work queued."""
+    async def scenario():
+        await queue.enqueue("normal", JobPriority.NORMAL, "a")
+        urgent_only = await _drain(queue, 1, priorities=[JobPriority.URGENT])
+        await queue.enqueue("urgent", JobPriority.URGENT, "a")
+        return urgent_only + await _drain(queue, 2, priorities=[JobPriority.URGENT]), await queue.depths()
+
+    jobs, depths = asyncio.run(scenario())
+
+    assert jobs == [None, "urgent", None]
+    assert depths["normal"] == 1
+
+
+def test_jobs_over_the_remaining_budget_wait_for_headroom(queue):
+    """Test a worker without enough budget leaves a large job for another worker."""
+    async def scenario():
+        big = RenderCostEstimate(cpu_seconds=500, memory_bytes=1, frames=1, output_pixels=1)
+        await queue.enqueue("big", JobPriority.NORMAL, "a", big)
+        blocked = await queue.lease("busy", max_cost=100, max_memory=10)
+        leased = await queue.lease("idle", max_cost=1000, max_memory=10)
+        return blocked, leased
+
+    blocked, leased = asyncio.run(scenario())
+
+    assert blocked is None
+    assert leased.job_id == "big" and leased.cost == 500
+
+
+def test_oversize_head_job_does_not_idle_a_busy_worker(queue):
+    """Test a worker skips a job it cannot fit and takes smaller work from other tenants."""
+    async def scenario():
+        big = RenderCostEstimate(cpu_seconds=500, memory_bytes=1, frames=1, output_pixels=1)
+        small = RenderCostEstimate(cpu_seconds=10, memory_bytes=1, frames=1, output_pixels=1)
+        await queue.enqueue("big", JobPriority.HIGH, "a", big)
+        await queue.enqueue("small", JobPriority.HIGH, "b", small)
+        await queue.enqueue("lower", JobPriority.NORMAL, "a", small)
+        busy = await _drain(queue, 3, max_cost=100, max_memory=10)
+        idle = await _drain(queue, 1, max_cost=1000, max_memory=10)
+        return busy, idle, await queue.depths()
+
+    busy, idle, depths = asyncio.run(scenario())
+
+    assert busy == ["small", "lower", None]
+    # The skipped tenant kept its place for a worker with enough headroom
+    assert idle == ["big"]
+    assert sum(depths.values()) == 0
+
+
+def test_batch_enqueue_matches_individual_enqueues(queue):
+    """Test jobs enqueued in one pipeline are scheduled like jobs enqueued one by one."""
+    async def scenario():
+        await queue.enqueue_many([
+            ("a-0", JobPriority.NORMAL, "a", RenderCostEstimate(
+                cpu_seconds=5, memory_bytes=1, frames=1, output_pixels=1
+            )),
+            ("a-1", JobPriority.NORMAL, "a", None),
+            ("b-0", JobPriority.NORMAL, "b", None),
+            ("urgent", JobPriority.URGENT, "b", None),
+        ])
+        return await _drain(queue, 5)
+
+    jobs = asyncio.run(scenario())
+
+    assert jobs[0] == "urgent"
+    assert set(jobs[1:3]) == {"a-0", "b-0"}
+    assert jobs[3:] == ["a-1", None]
+
+
+def test_active_job_limit_is_enforced_atomically(queue, monkeypatch):
+    """Test concurrent submissions stop at the limit and finished jobs free their slot."""
+    monkeypatch.setattr(settings, "max_active_jobs_per_key", 3)
+    monkeypatch.setattr(settings, "tenant_active_job_limits", {"vip": 0})
+
+    async def scenario():
+        admitted = await asyncio.gather(*(
+            queue.enqueue(f"a-{index}", JobPriority.NORMAL, "a") for index in range(10)
+        ))
+        unlimited = await queue.enqueue_many(
+            [(f"vip-{index}", JobPriority.NORMAL, "vip", None) for index in range(5)]
+        )
+        first = await queue.lease("worker", priorities=[JobPriority.NORMAL])
+        while first.job_id.startswith("vip"):
+            await queue.ack("worker", first)
+            first = await queue.lease("worker", priorities=[JobPriority.NORMAL])
+        still_full = await queue.enqueue("a-late", JobPriority.NORMAL, "a")
+        await queue.ack("worker", first)
+        after_ack = await queue.enqueue_many([
+            ("a-late", JobPriority.NORMAL, "a", None), ("a-later", JobPriority.NORMAL, "a", None)
+        ])
+        return admitted, unlimited, still_full, after_ack
+
+    admitted, unlimited, still_full, after_ack = asyncio.run(scenario())
+
+    assert sum(admitted) == 3
+    assert all(unlimited)
+    assert not still_full
+    assert after_ack == [True, False]
+
+
+def test_expired_leases_are_reclaimed_once_and_requeued(queue, monkeypatch):
+    """Test an abandoned job is taken over by a single reaper and retried first."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    monkeypatch.setattr(settings, "job_lease_timeout", 30)
+
+    async def scenario():
+        await queue.enqueue("abandoned", JobPriority.NORMAL, "a")
+        await queue.enqueue("next", JobPriority.NORMAL, "a")
+        leased = await queue.lease("dead-worker")
+
+        now[0] += 10
+        early = await queue.expired_leases(), await queue.take_expired_lease(leased.job_id)
+
+        now[0] += 21
+        expired = await queue.expired_leases()
+        owner = await queue.take_expired_lease(leased.job_id)
+        second_reaper = await queue.take_expired_lease(leased.job_id)
+
+        await queue.release(leased.job_id, owner, JobPriority.NORMAL, "a")
+        processing = await redis_manager.redis.lrange(queue.processing_name("dead-worker"), 0, -1)
+        retried = await queue.lease("live-worker")
+        return early, expired, owner, second_reaper, processing, retried
+
+    early, expired, owner, second_reaper, processing, retried = asyncio.run(scenario())
+
+    assert early == ([], None)
+    assert expired == ["abandoned"]
+    assert owner == "dead-worker" and second_reaper is None
+    assert processing == []
+    # The requeued job goes ahead of the tenant's other waiting work
+    assert retried.job_id == "abandoned"
+
+
+def test_renewed_leases_do_not_expire(queue, monkeypatch):
+    """Test a worker renewing its lease keeps the job from being reclaimed."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    monkeypatch.setattr(settings, "job_lease_timeout", 30)
+
+    async def scenario():
+        await queue.enqueue("rendering", JobPriority.NORMAL, "a")
+        leased = await queue.lease("worker")
+        now[0] += 20
+        await queue.renew([leased.job_id])
+        now[0] += 20
+        renewed = await queue.expired_leases(), await queue.take_expired_lease(leased.job_id)
+        now[0] += 11
+        return renewed, await queue.expired_leases()
+
+    renewed, later = asyncio.run(scenario())
+
+    assert renewed == ([], None)
+    assert later == ["rendering"]
+
+
+def test_stats_break_down_only_the_requested_tenant(queue):
+    """Test a tenant's stats show queue-wide totals but no other tenant's jobs."""
+    async def scenario():
+        for index in range(3):
+            await queue.enqueue(f"a-{index}", JobPriority.NORMAL, "a")
+        await queue.enqueue("b-0", JobPriority.NORMAL, "b")
+        await queue.enqueue("b-1", JobPriority.HIGH, "b")
+        return await queue.stats(), await queue.stats(tenant=queue.tenant_id("a"))
+
+    everyone, scoped = asyncio.run(scenario())
+
+    tenant = queue.tenant_id("a")
+    assert set(everyone["normal"]["tenants"]) == {tenant, queue.tenant_id("b")}
+    assert scoped["normal"]["depth"] == 4 and scoped["high"]["depth"] == 1
+    assert set(scoped["normal"]["tenants"]) == {tenant}
+    assert scoped["normal"]["tenants"][tenant]["depth"] == 3
+    assert scoped["high"]["tenants"] == {}
@@ -0,0 +1,52 @@
+"""
+Tests for job records.
+"""
+
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.database import Base
+from models.api import JobPriority, JobStatus
+from models.database import Job
+from services.job_service import JobService
+
+
+def test_create_jobs_inserts_all_rows_in_one_transaction(tmp_path):
+    """Test a batch of jobs is created queued with a single commit."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with sessions() as db:
+            commits = []
+            commit = db.commit
+
+            async def counting_commit():
+                commits.append(db.new.copy())
+                await commit()
+
+            db.commit = counting_commit
+            created = await JobService().create_jobs(db, "key", [
+                {"composition_config": {"scenes": {}}, "title": "First"},
+                {"composition_config": {"scenes": {}}, "priority": JobPriority.HIGH},
+                {"composition_config": {"scenes": {}}, "webhook_url": "https://example.com/hook"},
+            ])
+
+        async with sessions() as db:
+            rows = (await db.execute(select(Job).order_by(Job.title))).scalars().all()
+        await engine.dispose()
+        return commits, created, rows
+
+    commits, created, rows = asyncio.run(scenario())
+
+    assert len(commits) == 1 and len(commits[0]) == 3
+    assert len({job.id for job in created}) == 3
+    assert {row.id for row in rows} == {job.id for job in created}
+    assert all(row.status == JobStatus.QUEUED and row.api_key == "key" for row in rows)
+    assert [job.title for job in created] == ["First", "Untitled Composition", "Untitled Composition"]
+    assert created[1].priority == JobPriority.HIGH
+    assert created[2].webhook_url == "https://example.com/hook"
@@ -0,0 +1,133 @@
+"""
+Tests for conditional and long-polling job status requests.
+"""
+
+import asyncio
+import json
+import time
+from types import MappingProxyType
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.api_keys import AuthContext, api_key_index
+from core.database import Base, get_db
+from core.events import JobEventBroker
+from core.redis import redis_manager
+from main import app
+from models.api import JobStatus
+from models.database import Job
+from services.progress_store import progress_store
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _status_scenario(tmp_path, monkeypatch, requests):
+    """Run ``requests(client, headers)`` against the app with one job being rendered."""
+    auth = AuthContext.build("status-key")
+    monkeypatch.setattr(api_key_index, "_keys", MappingProxyType({auth.key_hash: auth}))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+
+    async def scenario():
+        # Created inside the loop: pub/sub connections bind to it
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        monkeypatch.setattr(redis_manager, "redis", redis)
+        monkeypatch.setattr(app.state, "redis", redis, raising=False)
+        broker = JobEventBroker()
+        monkeypatch.setattr("api.endpoints.jobs.job_events", broker)
+        monkeypatch.setattr("services.progress_store.job_events", broker)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        job = Job(
+            id="job-1", api_key=auth.api_key, status=JobStatus.PROCESSING, progress=10.0,
+            composition_config=json.dumps({})
+        )
+        async with sessions() as db:
+            db.add(job)
+            await db.commit()
+        await progress_store.snapshot(job)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            result = await requests(client, {"Authorization": f"Bearer {auth.api_key}"})
+        await broker.close()
+        await engine.dispose()
+        return result
+
+    return asyncio.run(scenario())
+
+
+def test_unchanged_job_answers_not_modified(tmp_path, monkeypatch):
+    """Test If-None-Match in its exact, weak, list and wildcard forms until progress changes the ETag."""
+    async def requests(client, headers):
+        first = await client.get("/jobs/job-1", headers=headers)
+        etag = first.headers["ETag"]
+        conditional = {}
+        for name, value in {
+            "exact": etag,
+            "strong": etag.removeprefix("W/"),
+            "list": f'"stale", {etag}',
+            "wildcard": "*",
+            "other": '"stale"',
+        }.items():
+            response = await client.get("/jobs/job-1", headers={**headers, "If-None-Match": value})
+            conditional[name] = response.status_code, response.headers.get("ETag")
+
+        await progress_store.record("job-1", 50, "Rendering")
+        changed = await client.get("/jobs/job-1", headers={**headers, "If-None-Match": etag})
+        return first, etag, conditional, changed
+
+    first, etag, conditional, changed = _status_scenario(tmp_path, monkeypatch, requests)
+
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "private, no-cache"
+    for name in ("exact", "strong", "list", "wildcard"):
+        assert conditional[name] == (304, etag), name
+    assert conditional["other"] == (200, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["progress"] == 50 and changed.json()["current_step"] == "Rendering"
+
+
+def test_wait_returns_on_change_or_times_out_unmodified(tmp_path, monkeypatch):
+    """Test a long poll answers as soon as the job changes and with 304 when it does not."""
+    async def requests(client, headers):
+        etag = (await client.get("/jobs/job-1", headers=headers)).headers["ETag"]
+        conditional = {**headers, "If-None-Match": etag}
+
+        async def progress_later():
+            await asyncio.sleep(0.2)
+            await progress_store.record("job-1", 60, "Rendering")
+
+        started = time.monotonic()
+        changed, _ = await asyncio.gather(
+            client.get("/jobs/job-1", params={"wait": 10}, headers=conditional),
+            progress_later()
+        )
+        changed_after = time.monotonic() - started
+
+        conditional["If-None-Match"] = changed.headers["ETag"]
+        started = time.monotonic()
+        unchanged = await client.get("/jobs/job-1", params={"wait": 0.3}, headers=conditional)
+        unchanged_after = time.monotonic() - started
+        return etag, changed, changed_after, unchanged, unchanged_after
+
+    etag, changed, changed_after, unchanged, unchanged_after = _status_scenario(
+        tmp_path, monkeypatch, requests
+    )
+
+    assert changed.status_code == 200 and changed.json()["progress"] == 60
+    assert changed.headers["ETag"] != etag
+    assert changed_after < 5
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == changed.headers["ETag"]
+    assert unchanged_after >= 0.3
@@ -0,0 +1,55 @@
+"""
+Tests for the downloaded media cache.
+"""
+
+import asyncio
+import os
+import time
+
+from core.settings import settings
+from services.media_cache import MediaCache
+
+
+def test_freshness_from_cache_control():
+    """Test Cache-Control directives override the default freshness window."""
+    assert MediaCache._freshness({"cache-control": "public, max-age=60"}) == 60
+    assert MediaCache._freshness({"cache-control": "no-cache"}) == 0
+    assert MediaCache._freshness({}) == settings.media_cache_fresh_seconds
+
+
+def test_extension_falls_back_to_url_path():
+    """Test blob extensions come from the content type, then the URL."""
+    assert MediaCache._extension("https://cdn.example.com/a", "image/png; charset=binary") == ".png"
+    assert MediaCache._extension("https://cdn.example.com/clip.MP4", "") == ".mp4"
+    assert MediaCache._extension("https://cdn.example.com/a", "") == ".tmp"
+
+
+def test_evicts_least_recently_used_blobs(tmp_path):
+    """Test eviction removes the oldest blobs until the cache fits its budget."""
+    cache = MediaCache(tmp_path, max_bytes=250)
+    old_time = time.time() - settings.job_timeout - 60
+
+    blobs = []
+    for index in range(3):
+        path = cache._blob_path(f"{index:02d}" + "0" * 62, ".png")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (old_time + index, old_time + index))
+        blobs.append(path)
+
+    freed = asyncio.run(cache.evict())
+
+    assert freed == 100
+    assert not blobs[0].exists()
+    assert blobs[1].exists() and blobs[2].exists()
+
+
+def test_recently_used_blobs_are_not_evicted(tmp_path):
+    """Test blobs that a running job may still read are protected."""
+    cache = MediaCache(tmp_path, max_bytes=50)
+    path = cache._blob_path("ab" + "0" * 62, ".png")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * 100)
+
+    assert asyncio.run(cache.evict()) == 0
+    assert path.exists()
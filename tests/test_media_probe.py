@@ -0,0 +1,27 @@
+"""
+Tests for ffprobe output parsing.
+"""
+
+from services.media_probe import MediaProbe
+
+
+def test_ffprobe_sits_next_to_ffmpeg():
+    """Test the ffprobe binary is derived from the ffmpeg binary path."""
+    assert MediaProbe.ffprobe_for("ffmpeg") == "ffprobe"
+    assert MediaProbe.ffprobe_for("/opt/ffmpeg/bin/ffmpeg") == "/opt/ffmpeg/bin/ffprobe"
+    assert MediaProbe.ffprobe_for("/usr/local/bin/ffmpeg-6.1") == "/usr/local/bin/ffprobe-6.1"
+
+
+def test_parse_frame_rate():
+    """Test rational frame rates are parsed and invalid ones ignored."""
+    assert MediaProbe._parse_rate("30000/1001") == 29.97
+    assert MediaProbe._parse_rate("25/1") == 25.0
+    assert MediaProbe._parse_rate("0/0") is None
+    assert MediaProbe._parse_rate(None) is None
+
+
+def test_rotation_from_tags_and_display_matrix():
+    """Test rotation is read from legacy tags or display matrix side data."""
+    assert MediaProbe._rotation({"tags": {"rotate": "90"}}) == 90
+    assert MediaProbe._rotation({"side_data_list": [{"rotation": -90}]}) == 270
+    assert MediaProbe._rotation({}) == 0
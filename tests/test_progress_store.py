@@ -0,0 +1,68 @@
+"""
+Tests for live job progress.
+"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.database import Base
+from core.redis import redis_manager
+from models.api import JobStatus
+from models.database import Job
+from services.progress_store import JobProgressStore
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_progress_is_served_from_redis_and_flushed_in_batches(tmp_path, monkeypatch):
+    """Test progress updates skip the database until a flush writes the latest values."""
+    monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        store = JobProgressStore(prefix="test:progress")
+
+        async with sessions() as db:
+            jobs = [
+                Job(id=f"job-{index}", api_key="key", status=JobStatus.PROCESSING,
+                    composition_config=json.dumps({}))
+                for index in range(3)
+            ]
+            db.add_all(jobs)
+            await db.commit()
+            for job in jobs:
+                await store.snapshot(job)
+
+            for progress in range(0, 60, 10):
+                await store.record("job-0", progress, f"Step {progress}", total_steps=4)
+            await store.record("job-1", 25, "Rendering")
+
+            live = await store.get("job-0", "key")
+            assert live.progress == 50 and live.current_step == "Step 50" and live.total_steps == 4
+            assert await store.get("job-0", "other-key") is None
+            assert (await db.get(Job, "job-0", populate_existing=True)).progress == 0
+
+            assert await store.flush(db) == 2
+            assert await store.flush(db) == 0
+            stored = await db.get(Job, "job-0", populate_existing=True)
+            assert stored.progress == 50 and stored.current_step == "Step 50"
+            assert (await db.get(Job, "job-1", populate_existing=True)).progress == 25
+
+            # A finished job is not overwritten by a late flush
+            await store.record("job-2", 80, "Encoding")
+            stored = await db.get(Job, "job-2")
+            stored.status = JobStatus.COMPLETED
+            stored.progress = 100
+            await db.commit()
+            await store.flush(db)
+            assert (await db.get(Job, "job-2", populate_existing=True)).progress == 100
+
+        await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,106 @@
+"""
+Tests for the Redis token bucket rate limiter.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from core.redis import check_token_bucket
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_concurrent_requests_cannot_overshoot_the_limit():
+    """Test a burst larger than the limit is cut off at exactly the limit."""
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        results = await asyncio.gather(*(
+            check_token_bucket(client, "rate_limit:key", 10, 3600) for _ in range(25)
+        ))
+        return results, await client.pttl("rate_limit:key")
+
+    results, ttl = asyncio.run(scenario())
+
+    allowed = [result for result in results if result.allowed]
+    denied = [result for result in results if not result.allowed]
+    assert len(allowed) == 10
+    assert sorted(result.remaining for result in allowed) == list(range(10))
+    # One token comes back every window / limit seconds
+    assert all(0 < result.retry_after <= 360 for result in denied)
+    assert all(result.reset_after == pytest.approx(3600, abs=1) for result in denied)
+    assert 0 < ttl <= 3601 * 1000
+
+
+def test_tokens_refill_over_the_window(monkeypatch):
+    """Test spent tokens come back gradually rather than at a window boundary."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        for _ in range(4):
+            await check_token_bucket(client, "rate_limit:key", 4, 60)
+        denied = await check_token_bucket(client, "rate_limit:key", 4, 60)
+        now[0] += 15
+        refilled = await check_token_bucket(client, "rate_limit:key", 4, 60)
+        costly = await check_token_bucket(client, "rate_limit:key", 4, 60, cost=2)
+        return denied, refilled, costly
+
+    denied, refilled, costly = asyncio.run(scenario())
+
+    assert not denied.allowed and denied.retry_after == 15
+    assert refilled.allowed and refilled.remaining == 0
+    assert not costly.allowed and costly.retry_after == 30
+
+
+def test_requests_are_weighted_by_what_they_cost():
+    """Test reads are nearly free while uploads and renders are charged by size."""
+    from starlette.requests import Request
+
+    from services.auth import composition_cost, request_cost
+
+    def request(method: str, size: int = 0) -> Request:
+        headers = [(b"content-length", str(size).encode())] if size else []
+        return Request({"type": "http", "method": method, "headers": headers})
+
+    assert request_cost(request("GET")) < 0.1
+    assert request_cost(request("DELETE")) == 1
+    assert request_cost(request("POST", 200 * 1024 * 1024)) == pytest.approx(20)
+    assert composition_cost(0.2) == 1
+    assert composition_cost(120) == 120
+
+
+def test_rate_limited_response_carries_retry_after(monkeypatch):
+    """Test a real 429 response tells the client when a token is available again."""
+    from types import MappingProxyType
+
+    from fastapi.testclient import TestClient
+
+    from core.api_keys import AuthContext, api_key_index
+    from core.settings import settings
+    from main import app
+
+    monkeypatch.setattr(settings, "rate_limit_requests", 4)
+    monkeypatch.setattr(settings, "rate_limit_window", 60)
+    auth = AuthContext.build("retry-after-key")
+    monkeypatch.setattr(api_key_index, "_keys", MappingProxyType({auth.key_hash: auth}))
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(app.state, "redis", client, raising=False)
+
+    async def exhaust():
+        for _ in range(4):
+            await check_token_bucket(client, f"rate_limit:{auth.tenant_id}", 4, 60)
+
+    asyncio.run(exhaust())
+    response = TestClient(app).get("/queue/stats", headers={"Authorization": f"Bearer {auth.api_key}"})
+
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= 15
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+    assert response.json()["error_code"] == "HTTP_429"
+
+    unauthorized = TestClient(app).get("/queue/stats")
+    assert unauthorized.status_code == 401
+    assert unauthorized.headers["WWW-Authenticate"] == "Bearer"
@@ -0,0 +1,71 @@
+"""
+Tests for the rendered segment cache.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from models.api import CompositionSettings, SceneData, VideoFormat
+from services.ffmpeg_engine import FFmpegRenderEngine
+from services.segment_cache import SegmentCache
+
+
+def test_entries_are_shared_and_evicted_least_recently_used(tmp_path):
+    """Test hits link the stored segment and eviction drops the oldest entries first."""
+    async def scenario():
+        cache = SegmentCache(tmp_path / "cache", max_bytes=10)
+        digests = {"/jobs/1/a.png": "ab" * 32}
+        key = cache.key(["-i", "/jobs/1/a.png", "-t", "3"], digests)
+        # The same content under another job's path maps to the same key
+        assert key == cache.key(["-i", "/jobs/2/a.png", "-t", "3"], {"/jobs/2/a.png": "ab" * 32})
+        assert key != cache.key(["-i", "/jobs/1/a.png", "-t", "4"], digests)
+
+        destination = tmp_path / "hit.mp4"
+        assert not await cache.get(key, destination)
+
+        for name, size in (("old", 6), ("new", 6)):
+            segment = tmp_path / f"{name}.mp4"
+            segment.write_bytes(b"x" * size)
+            await cache.put(name * 22, segment)
+            os.utime(cache._entry_path(name * 22, ".mp4"), (0, 0) if name == "old" else None)
+
+        assert await cache.evict() == 6
+        assert not await cache.get("old" * 22, destination)
+        assert await cache.get("new" * 22, destination)
+        assert destination.read_bytes() == b"x" * 6
+
+    asyncio.run(scenario())
+
+
+def test_identical_scenes_are_rendered_once(tmp_path):
+    """Test a second job reuses every segment the first one rendered."""
+    imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+    engine = FFmpegRenderEngine(ffmpeg_binary=imageio_ffmpeg.get_ffmpeg_exe())
+    cache = SegmentCache(tmp_path / "cache", max_bytes=1 << 30)
+
+    async def render(job: str):
+        work_dir = tmp_path / job
+        work_dir.mkdir()
+        image = work_dir / "image.png"
+        await engine.run([
+            engine.ffmpeg_binary, "-hide_banner", "-nostdin", "-y", "-f", "lavfi",
+            "-i", "color=c=red:s=64x64", "-frames:v", "1", str(image)
+        ], 0)
+        scenes = [
+            (image, SceneData(source=f"https://example.com/{job}.png", media_type="image",
+                              duration=1.0), True),
+            (image, SceneData(source=f"https://example.com/{job}.png", media_type="image",
+                              duration=1.0, transition="fade"), True),
+        ]
+        output_path = work_dir / "out.mp4"
+        stats = await engine.render_segmented(
+            scenes, output_path, VideoFormat.MP4, (64, 64), 10, CompositionSettings(),
+            work_dir, segment_cache=cache
+        )
+        assert output_path.stat().st_size > 0
+        return stats
+
+    assert asyncio.run(render("first")) == (0, 2)
+    assert asyncio.run(render("second")) == (2, 2)
@@ -0,0 +1,147 @@
+"""
+Tests for composition submission deduplication.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.api_keys import api_key_index
+from core.database import Base
+from core.redis import redis_manager
+from models.api import FileType, VideoCompositionRequest
+from models.database import UploadedFile
+from services.submission_dedup import SubmissionDeduplicator
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _request(source: str, scene_name: str = "Intro", **overrides) -> VideoCompositionRequest:
+    config = {
+        "scenes": {scene_name: {"source": source, "media_type": "image", "duration": 3}},
+        "quality": "720p",
+    }
+    config.update(overrides)
+    return VideoCompositionRequest.model_validate(config)
+
+
+def _upload(file_id: str, sha256_hash: str) -> UploadedFile:
+    return UploadedFile(
+        id=file_id, api_key=api_key_index.context("key").tenant_id, filename=f"{file_id}.png", original_filename="logo.png",
+        file_path=f"/uploads/{file_id}.png", file_size=4, file_type=FileType.IMAGE,
+        mime_type="image/png", sha256_hash=sha256_hash
+    )
+
+
+def test_fingerprint_covers_only_what_is_rendered(tmp_path):
+    """Test names, priority and metadata are ignored while uploads match by content."""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        dedup = SubmissionDeduplicator(prefix="test")
+
+        async with sessions() as db:
+            db.add_all([_upload("first", "ab" * 32), _upload("second", "ab" * 32)])
+            await db.commit()
+
+            base = await dedup.fingerprint(db, "key", _request("first"))
+            same = await dedup.fingerprint(db, "key", _request(
+                "second", scene_name="Opening", priority="urgent", metadata={"run": 2}
+            ))
+            other_fps = await dedup.fingerprint(db, "key", _request("first", fps=24))
+            other_url = await dedup.fingerprint(db, "key", _request("https://example.com/a.png"))
+
+        await engine.dispose()
+        return base, same, other_fps, other_url
+
+    base, same, other_fps, other_url = asyncio.run(scenario())
+
+    assert base == same
+    assert len({base, other_fps, other_url}) == 3
+
+
+def test_claims_and_idempotency_keys(monkeypatch):
+    """Test racing submissions settle on one job and keys cannot be reused for other requests."""
+    async def scenario():
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        dedup = SubmissionDeduplicator(prefix="test")
+
+        assert await dedup.find("key", "fp-1") == (None, False)
+        assert await dedup.claim("key", "fp-1", "job-1") == "job-1"
+        assert await dedup.claim("key", "fp-1", "job-2") == "job-1"
+        assert await dedup.find("key", "fp-1", "retry-1") == ("job-1", False)
+        assert await dedup.remember("key", "retry-1", "fp-1", "job-1") == "job-1"
+        assert await dedup.remember("key", "retry-1", "fp-1", "job-2") == "job-1"
+        assert await dedup.find("key", "fp-1") == ("job-1", False)
+        assert await dedup.find("key", "fp-1", "retry-1") == ("job-1", True)
+        assert await dedup.find("other-key", "fp-1") == (None, False)
+
+        with pytest.raises(HTTPException) as error:
+            await dedup.find("key", "fp-2", "retry-1")
+        assert error.value.status_code == 409
+
+        # Entries are only dropped while they still point at the given job
+        await dedup.forget("key", "fp-1", "job-2", "retry-1")
+        assert await dedup.find("key", "fp-1", "retry-1") == ("job-1", True)
+        await dedup.forget("key", "fp-1", "job-1", "retry-1")
+        assert await dedup.find("key", "fp-1", "retry-1") == (None, False)
+        assert await dedup.claim("key", "fp-1", "job-3") == "job-3"
+
+    asyncio.run(scenario())
+
+
+def test_refused_submission_can_be_retried_with_the_same_idempotency_key(tmp_path, monkeypatch):
+    """Test a 429 does not pin the Idempotency-Key to the deleted job."""
+    from types import MappingProxyType
+
+    from fastapi.testclient import TestClient
+
+    from core.api_keys import AuthContext
+    from core.database import get_db
+    from main import app
+    from services.job_queue import JobQueue
+
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(redis_manager, "redis", redis)
+    monkeypatch.setattr(app.state, "redis", redis, raising=False)
+    auth = AuthContext.build("capped-key", {"active_job_limit": 1, "rate_limit": 100000})
+    monkeypatch.setattr(api_key_index, "_keys", MappingProxyType({auth.key_hash: auth}))
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with sessions() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {auth.api_key}"}
+    retry = {**headers, "Idempotency-Key": "retry-1"}
+
+    def compose(source, request_headers):
+        body = {"scenes": {"A": {"source": source, "media_type": "image", "duration": 2}}}
+        return client.post("/compose", json=body, headers=request_headers)
+
+    assert compose("https://example.com/first.png", headers).status_code == 200
+    assert compose("https://example.com/second.png", retry).status_code == 429
+    assert compose("https://example.com/second.png", retry).status_code == 429
+
+    # The first job finishes, freeing the key's only active slot
+    asyncio.run(redis.delete(JobQueue._active_name(auth.tenant_id)))
+    queued = compose("https://example.com/second.png", retry).json()
+    replayed = compose("https://example.com/second.png", retry).json()
+
+    assert not queued["deduplicated"] and queued["job"]["status"] == "queued"
+    assert replayed["deduplicated"] and replayed["job"]["id"] == queued["job"]["id"]
+    asyncio.run(engine.dispose())
@@ -0,0 +1,178 @@
+"""
+Tests for buffered API usage logging.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.api_keys import AuthContext
+from core.database import Base
+from core.settings import settings
+from core.usage import UsageLogger, UsageLoggingMiddleware
+from models.database import ApiKeyUsage, ApiKeyUsageRollup
+from services.usage_service import UsageService
+
+
+def test_middleware_buffers_authenticated_requests_and_flushes_in_bulk(tmp_path, monkeypatch):
+    """Test requests only fill the buffer and a flush writes them in batches."""
+    monkeypatch.setattr(settings, "usage_log_flush_batch", 2)
+    usage = UsageLogger(capacity=3)
+    auth = AuthContext.build("usage-key")
+
+    app = FastAPI()
+    app.add_middleware(UsageLoggingMiddleware, usage=usage)
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        request.state.auth = auth
+        return {"ok": True}
+
+    @app.post("/compose")
+    async def compose(request: Request):
+        request.state.auth = auth
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    client = TestClient(app)
+    client.get("/health")
+    client.post("/upload", content=b"x" * 10, headers={"x-forwarded-for": "10.0.0.1, 10.0.0.2"})
+    assert len(usage) == 1  # Unauthenticated requests are not recorded
+
+    client.post("/compose", json={"scenes": {}})
+    assert usage._buffer[-1][0]["file_size_uploaded"] == 0  # Only upload bodies count
+
+    for _ in range(3):
+        client.post("/upload", content=b"x")
+    assert len(usage) == 3 and usage.dropped == 2  # The oldest records were evicted
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with sessions() as db:
+            assert await usage.flush(db) == 2
+            assert await usage.flush(db) == 1
+            assert await usage.flush(db) == 0
+            rows = (await db.execute(select(ApiKeyUsage))).scalars().all()
+        await engine.dispose()
+        return rows
+
+    rows = asyncio.run(scenario())
+    assert len(rows) == 3
+    assert {row.api_key for row in rows} == {auth.tenant_id}
+    assert all(row.endpoint == "/upload" and row.method == "POST" for row in rows)
+    assert all(row.response_status == 200 and row.file_size_uploaded == 1 for row in rows)
+
+
+def test_failed_flush_keeps_records_for_the_next_one(tmp_path):
+    """Test records survive a database error and are written once it recovers."""
+    usage = UsageLogger(capacity=10)
+    app = FastAPI()
+    app.add_middleware(UsageLoggingMiddleware, usage=usage)
+
+    @app.get("/jobs")
+    async def jobs(request: Request):
+        request.state.auth = AuthContext.build("usage-key")
+        return []
+
+    client = TestClient(app)
+    for _ in range(4):
+        client.get("/jobs")
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            try:
+                await usage.flush(db)  # Table does not exist yet
+            except Exception:
+                await db.rollback()
+            else:
+                raise AssertionError("flush should fail without the table")
+        assert len(usage) == 4
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with sessions() as db:
+            assert await usage.flush(db) == 4
+            count = await db.scalar(select(func.count()).select_from(ApiKeyUsage))
+        await engine.dispose()
+        return count
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_flushes_maintain_per_minute_rollups_read_by_usage_queries(tmp_path, monkeypatch):
+    """Test rollups accumulate across flushes and usage queries are answered from them."""
+    monkeypatch.setattr(settings, "usage_log_retention_days", 1)
+    usage = UsageLogger(capacity=100)
+    auth = AuthContext.build("usage-key")
+    other = AuthContext.build("other-key")
+
+    app = FastAPI()
+    app.add_middleware(UsageLoggingMiddleware, usage=usage)
+
+    @app.get("/jobs/{job_id}")
+    async def get_job(job_id: str, request: Request):
+        request.state.auth = other if job_id == "other" else auth
+        if job_id == "missing":
+            return JSONResponse({"detail": "Job not found"}, status_code=404)
+        return {"id": job_id}
+
+    client = TestClient(app)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with sessions() as db:
+            for job_id in ("a", "b", "missing", "other"):
+                client.get(f"/jobs/{job_id}")
+            assert await usage.flush(db) == 4
+            client.get("/jobs/c")
+            assert await usage.flush(db) == 1
+
+            rollups = (await db.execute(select(ApiKeyUsageRollup))).scalars().all()
+            mine = [rollup for rollup in rollups if rollup.api_key == auth.tenant_id]
+            assert len(mine) in (1, 2)  # Two when the requests straddle a minute
+            assert {rollup.endpoint for rollup in rollups} == {"/jobs/{job_id}"}
+            assert sum(rollup.request_count for rollup in mine) == 4
+            assert sum(rollup.error_count for rollup in mine) == 1
+            assert sum(rollup.server_error_count for rollup in mine) == 0
+
+            now = datetime.now(timezone.utc)
+            report = await UsageService().get_usage(
+                db, auth.tenant_id, now - timedelta(hours=1), now + timedelta(minutes=1),
+                interval_minutes=15
+            )
+            assert report.totals.requests == 4 and report.totals.errors == 1
+            assert sum(report.totals.latency_histogram.values()) == 4
+            assert [(e.endpoint, e.method, e.requests) for e in report.endpoints] == [
+                ("/jobs/{job_id}", "GET", 4)
+            ]
+            assert sum(period.requests for period in report.series) == 4
+
+            # Raw records age out; the rollups stay
+            await db.execute(
+                ApiKeyUsage.__table__.update().values(created_at=now - timedelta(days=2))
+            )
+            await db.commit()
+            assert await usage.prune(db) == 5
+            assert await db.scalar(select(func.count()).select_from(ApiKeyUsage)) == 0
+            assert await db.scalar(select(func.count()).select_from(ApiKeyUsageRollup)) == len(rollups)
+        await engine.dispose()
+
+    asyncio.run(scenario())
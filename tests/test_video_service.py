@@ -0,0 +1,81 @@
+"""
+Tests for source downloads of the video composition service.
+"""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from models.api import CompositionSettings, RenderEngine, SceneData, VideoFormat, VideoQuality
+from services.video_service import DownloadBudget, VideoCompositionService
+
+
+class _Sessions:
+    async def get_session(self):
+        return None
+
+
+def test_shared_download_charges_every_callers_own_budget(monkeypatch):
+    """Test jobs joining one download are each charged for it against their own limit."""
+    service = VideoCompositionService(http_client=_Sessions())
+    fetches = []
+
+    async def fetch(session, url, budget=None):
+        fetches.append(url)
+        await asyncio.sleep(0.05)
+        budget.consume(150)
+        return Path("/cache/clip.mp4")
+
+    monkeypatch.setattr(service.media_cache, "fetch", fetch)
+    url = "https://cdn.example.com/clip.mp4"
+    small, large, unlimited = DownloadBudget(100), DownloadBudget(1000), DownloadBudget()
+
+    async def scenario():
+        return await asyncio.gather(
+            service.download_media_from_url(url, small),
+            service.download_media_from_url(url, large),
+            service.download_media_from_url(url, unlimited),
+            return_exceptions=True
+        )
+
+    over_limit, path, unlimited_path = asyncio.run(scenario())
+
+    assert fetches == [url]
+    assert isinstance(over_limit, ValueError) and "download limit of 100" in str(over_limit)
+    assert path == unlimited_path == Path("/cache/clip.mp4")
+    assert (small.used, large.used, unlimited.used) == (150, 150, 150)
+
+
+@pytest.mark.parametrize("engine, fetches_watermark", [
+    (RenderEngine.MOVIEPY, False),
+    (RenderEngine.FFMPEG, True),
+    (RenderEngine.FFMPEG_SEGMENTED, True),
+])
+def test_watermark_is_only_fetched_for_engines_that_draw_it(monkeypatch, engine, fetches_watermark):
+    """Test the moviepy path neither downloads nor charges for the watermark."""
+    service = VideoCompositionService(http_client=_Sessions())
+    prefetched = []
+
+    def prefetch_sources(sources, budget=None):
+        prefetched.extend(sources)
+        return {}
+
+    async def stop(*args, **kwargs):
+        raise RuntimeError("stop before rendering")
+
+    monkeypatch.setattr(service, "prefetch_sources", prefetch_sources)
+    monkeypatch.setattr(service, "_load_scene_clips", stop)
+    monkeypatch.setattr(service, "_compose_with_ffmpeg", stop)
+    scenes = {"Intro": SceneData(source="https://cdn.example.com/a.png", media_type="image", duration=2)}
+    composition_settings = CompositionSettings(
+        watermark_url="https://cdn.example.com/logo.png", render_engine=engine
+    )
+
+    with pytest.raises(ValueError, match="stop before rendering"):
+        asyncio.run(service.compose_video(
+            scenes, VideoFormat.MP4, VideoQuality.HD, 30, composition_settings
+        ))
+
+    assert ("https://cdn.example.com/logo.png" in prefetched) is fetches_watermark
+    assert "https://cdn.example.com/a.png" in prefetched
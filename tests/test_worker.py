@@ -0,0 +1,121 @@
+"""
+Tests for the job worker.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from core.api_keys import api_key_index
+from core.database import Base, db_manager
+from core.redis import redis_manager
+from core.settings import settings
+from models.api import JobPriority, JobStatus
+from models.database import ApiKeyUsageRollup, Job
+from services.job_queue import JobQueue
+from services.progress_store import JobProgressStore
+from services.worker import JobWorker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def test_reaper_requeues_abandoned_jobs_until_retries_run_out(tmp_path, monkeypatch):
+    """Test expired leases are retried until max_retries, then failed; renewed leases are left alone."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    monkeypatch.setattr(settings, "job_lease_timeout", 30)
+    monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        monkeypatch.setattr(db_manager, "session_factory", async_sessionmaker(engine, expire_on_commit=False))
+
+        queue = JobQueue()
+        worker = JobWorker(queue=queue, progress=JobProgressStore(prefix="test:progress"))
+        async with db_manager.get_session() as db:
+            db.add_all([
+                Job(id=job_id, api_key="key", status=JobStatus.PROCESSING, max_retries=1,
+                    composition_config=json.dumps({}))
+                for job_id in ("abandoned", "rendering")
+            ])
+        for job_id in ("abandoned", "rendering"):
+            await queue.enqueue(job_id, JobPriority.NORMAL, "key")
+            await queue.lease("dead-worker")
+
+        async def state(job_id):
+            async with db_manager.get_session() as db:
+                job = await db.get(Job, job_id)
+                return job.status, job.retry_count
+
+        # The live worker keeps renewing its lease; the dead one does not
+        now[0] += 20
+        await queue.renew(["rendering"])
+        now[0] += 11
+        first = await worker.reap_expired_leases()
+        after_first = await state("abandoned"), await state("rendering")
+
+        # The retry is leased again and abandoned again
+        retried = await queue.lease("dead-worker")
+        now[0] += 15
+        await queue.renew(["rendering"])
+        now[0] += 16
+        second = await worker.reap_expired_leases()
+        after_second = await state("abandoned")
+        leftover = await queue.lease("other-worker")
+
+        await engine.dispose()
+        return first, after_first, retried, second, after_second, leftover
+
+    first, after_first, retried, second, after_second, leftover = asyncio.run(scenario())
+
+    assert first == 1
+    assert after_first == ((JobStatus.QUEUED, 1), (JobStatus.PROCESSING, 0))
+    assert retried.job_id == "abandoned"
+    assert second == 1
+    assert after_second == (JobStatus.FAILED, 1)
+    assert leftover is None
+
+
+def test_render_time_is_charged_to_the_submitting_key(tmp_path, monkeypatch):
+    """Test a finished job's render seconds reach its key's usage rollups without counting a request."""
+    class Renderer:
+        async def compose_video(self, **kwargs):
+            await asyncio.sleep(0.05)
+            output = tmp_path / "out.mp4"
+            output.write_bytes(b"video")
+            return output
+
+    async def scenario():
+        monkeypatch.setattr(redis_manager, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        monkeypatch.setattr(db_manager, "session_factory", async_sessionmaker(engine, expire_on_commit=False))
+
+        config = {"scenes": {"A": {"source": "https://example.com/a.png", "media_type": "image", "duration": 2}}}
+        async with db_manager.get_session() as db:
+            db.add(Job(id="job-1", api_key="key", status=JobStatus.QUEUED, composition_config=json.dumps(config)))
+
+        worker = JobWorker(video_service=Renderer(), progress=JobProgressStore(prefix="test:progress"))
+        await worker.process_job("job-1")
+
+        async with db_manager.get_session() as db:
+            job = await db.get(Job, "job-1")
+            rollups = (await db.execute(select(ApiKeyUsageRollup))).scalars().all()
+        await engine.dispose()
+        return job, rollups
+
+    job, rollups = asyncio.run(scenario())
+
+    assert job.status == JobStatus.COMPLETED
+    assert [(rollup.api_key, rollup.endpoint, rollup.method) for rollup in rollups] == [
+        (api_key_index.context("key").tenant_id, "/compose", "POST")
+    ]
+    assert rollups[0].processing_time_total >= 0.05
+    assert rollups[0].request_count == 0
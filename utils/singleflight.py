@@ -0,0 +1,37 @@
+"""
+Single-flight helper that collapses concurrent calls for the same key.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Share one in-flight call between all concurrent callers of a key.
+
+    The shared call runs as its own task, so a caller being cancelled does not
+    cancel the work other callers are waiting on.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func`` for ``key`` unless a call for it is already in flight."""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not future.cancelled():
+            future.exception()
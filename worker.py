@@ -0,0 +1,66 @@
+"""
+Render worker entry point.
+
+Run one or more of these alongside the API to process queued jobs:
+
+    python worker.py --concurrency 2
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from core.database import close_database, create_tables
+from core.executor import close_render_executor, initialize_render_executor
+from core.http import close_http_client, initialize_http_client
+from core.redis import close_redis, initialize_redis
+from core.settings import settings
+from services.worker import JobWorker
+
+logging.basicConfig(
+    level=getattr(logging, settings.log_level.upper()),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(concurrency: int) -> None:
+    """Set up shared resources and process jobs until signalled to stop."""
+    settings.create_directories()
+    await create_tables()
+    await initialize_redis()
+    await initialize_http_client()
+    initialize_render_executor()
+
+    worker = JobWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        close_render_executor()
+        await close_http_client()
+        await close_redis()
+        await close_database()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Process queued video composition jobs.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.max_concurrent_jobs,
+        help="Jobs rendered at the same time (default: MAX_CONCURRENT_JOBS)"
+    )
+    args = parser.parse_args()
+
+    # The render thread pool is sized from this setting
+    settings.max_concurrent_jobs = args.concurrency
+    asyncio.run(run_worker(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()